@@ -0,0 +1,262 @@
+"""Benchmarks the four Data Commons tools against the local stand-in API.
+
+For every tool and payload size it records the median time spent in each
+phase (network wait, JSON decode, result walk, report formatting), the cold
+and warm end-to-end tool time, response bytes and peak Python memory, and
+writes them to a JSON file that later runs can be compared against.
+
+    python -m benchmarks.bench_tools --output bench_results.json
+    python -m benchmarks.bench_tools --compare bench_results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from datcom_agent import agent
+from datcom_agent.batching import ObservationBatcher, set_observation_batcher
+from datcom_agent.cache import (ObservationCache, PlaceCache, SeriesCache, VariableListCache,
+                                set_observation_cache, set_place_cache, set_series_cache,
+                                set_variable_list_cache)
+from datcom_agent.client import DataCommonsClient, set_client
+from datcom_agent.observations import VALUE_SELECT, VARIABLE_SELECT, _assemble, extract_observations
+from datcom_agent.output import OutputPolicy, set_output_policy
+from datcom_agent.planner import map_batches, merge_observation_responses, plan_requests
+from datcom_agent.prefetch import Prefetcher, set_prefetcher
+from datcom_agent.results import ResultStore
+from datcom_agent.search import StatVarIndex, set_statvar_index
+from datcom_agent.standin import StandInData, StandInServer
+from datcom_agent.store import LocalObservationStore, set_local_store
+from datcom_agent.streaming import VariableListingScanner
+
+TOOLS = ["get_place_dcids", "get_available_variables", "get_population_count", "get_observations"]
+DEFAULT_ENTITIES = [1, 10, 100, 1000, 10000]
+DEFAULT_VARIABLES = [1, 10, 100, 500]
+
+
+def _reset_caches():
+    set_place_cache(PlaceCache(":memory:"))
+    set_observation_cache(ObservationCache())
+    set_series_cache(SeriesCache())
+    set_variable_list_cache(VariableListCache())
+    set_statvar_index(StatVarIndex())
+    # Full responses in memory only, so timings measure the tools rather
+    # than the output budget or result files
+    set_output_policy(OutputPolicy(mode="full", max_tokens=0, handle_rows=0, store=ResultStore("")))
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def _fetch_bodies(client: DataCommonsClient, planned: list) -> list[bytes]:
+    return map_batches(
+        lambda batch: b"".join(client.stream(endpoint="observation", **batch[2])), planned)
+
+
+def _phases(tool: str, client: DataCommonsClient, entities: list[str], variables: list[str]) -> dict:
+    """Runs one uncached request with each phase timed separately."""
+    phases = {"decode_s": None}
+    if tool == "get_place_dcids":
+        names = [f"Place {int(e[6:])}" for e in entities]
+        # Large name lists go out in URL-sized batches, like the tool sends them
+        batches = agent._resolve_batches(client.url_for("resolve"), names)
+        bodies, phases["network_s"] = _timed(lambda: map_batches(
+            lambda batch: b"".join(client.stream(endpoint="resolve", method="GET",
+                                                 params=agent._resolve_params(batch))), batches))
+        data, phases["decode_s"] = _timed(
+            lambda: {"entities": [entity for body in bodies for entity in json.loads(body)["entities"]]})
+        resolved, phases["walk_s"] = _timed(lambda: agent._store_resolved(data))
+        _, phases["format_s"] = _timed(lambda: agent._place_dcids_response(names, resolved))
+
+    elif tool == "get_available_variables":
+        planned = plan_requests(client.url_for("observation"), entities, [],
+                                [("date", "LATEST")], VARIABLE_SELECT)
+        bodies, phases["network_s"] = _timed(lambda: _fetch_bodies(client, planned))
+
+        # The tool scans the body incrementally instead of decoding it
+        def scan():
+            result = {}
+            for (batch_entities, _, _), body in zip(planned, bodies):
+                scanner = VariableListingScanner(batch_entities, 30)
+                for start in range(0, len(body), 64 * 1024):
+                    if scanner.feed(body[start:start + 64 * 1024]):
+                        break
+                result.update(scanner.result)
+            return result
+
+        result, phases["walk_s"] = _timed(scan)
+        _, phases["format_s"] = _timed(lambda: agent._available_variables_response(result))
+
+    else:
+        if tool == "get_population_count":
+            variables = ["Count_Person"]
+        planned = plan_requests(client.url_for("observation"), entities, variables,
+                                [("date", "LATEST")], VALUE_SELECT)
+        bodies, phases["network_s"] = _timed(lambda: _fetch_bodies(client, planned))
+        data, phases["decode_s"] = _timed(
+            lambda: merge_observation_responses([json.loads(body) for body in bodies]))
+
+        def walk():
+            fetched = extract_observations(data)
+            cells = {(e, v): cell for e, row in fetched.items() for v, cell in row.items()}
+            return _assemble(cells, entities, variables)
+
+        result, phases["walk_s"] = _timed(walk)
+        if tool == "get_population_count":
+            _, phases["format_s"] = _timed(lambda: agent._population_response(result))
+        else:
+            _, phases["format_s"] = _timed(lambda: agent._observations_response(result))
+
+    phases["response_bytes"] = sum(len(body) for body in bodies)
+    return phases
+
+
+def _call_tool(tool: str, entities: list[str], variables: list[str]) -> dict:
+    if tool == "get_place_dcids":
+        return agent.get_place_dcids([f"Place {int(e[6:])}" for e in entities])
+    if tool == "get_available_variables":
+        return agent.get_available_variables(",".join(entities))
+    if tool == "get_population_count":
+        return agent.get_population_count(",".join(entities))
+    return agent.get_observations(entities, variables)
+
+
+def _variable_counts(tool: str, variable_sizes: list[int]) -> list[int]:
+    # Only get_observations takes a variable list
+    return variable_sizes if tool == "get_observations" else [1]
+
+
+def run(entity_sizes: list[int], variable_sizes: list[int], repeat: int, max_cells: int,
+        latency: float, tools: list[str]) -> list[dict]:
+    data = StandInData.synthetic(places=max(entity_sizes), variables=max(variable_sizes), years=1)
+    server = StandInServer(data, latency=latency).start()
+    client = DataCommonsClient(base_url=server.base_url, api_key="bench")
+    set_client(client)
+    set_local_store(LocalObservationStore())
+    # Background prefetches would overlap the timed calls, and batching
+    # would add its window to every call
+    set_prefetcher(Prefetcher(enabled=False))
+    set_observation_batcher(ObservationBatcher(window_ms=0))
+
+    results = []
+    try:
+        for tool in tools:
+            for n_entities in entity_sizes:
+                for n_variables in _variable_counts(tool, variable_sizes):
+                    if n_entities * n_variables > max_cells:
+                        continue
+                    entities = [f"geoId/{i:05d}" for i in range(n_entities)]
+                    variables = data.variable_dcids[:n_variables]
+                    runs = []
+                    for _ in range(repeat):
+                        _reset_caches()
+                        phases = _phases(tool, client, entities, variables)
+                        _reset_caches()
+                        response, phases["total_cold_s"] = _timed(
+                            lambda: _call_tool(tool, entities, variables))
+                        assert response["status"] == "success", response
+                        _, phases["total_warm_s"] = _timed(lambda: _call_tool(tool, entities, variables))
+                        runs.append(phases)
+
+                    _reset_caches()
+                    tracemalloc.start()
+                    _call_tool(tool, entities, variables)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                    row = {"tool": tool, "entities": n_entities,
+                           "variables": n_variables if tool == "get_observations" else None}
+                    for key in runs[0]:
+                        samples = [r[key] for r in runs if r[key] is not None]
+                        row[key] = statistics.median(samples) if samples else None
+                    row["peak_memory_bytes"] = peak
+                    results.append(row)
+                    print(_format_row(row))
+    finally:
+        server.stop()
+        client.close()
+    return results
+
+
+def _ms(seconds) -> str:
+    return "      -" if seconds is None else f"{seconds * 1000:7.1f}"
+
+
+def _format_row(row: dict) -> str:
+    return (f"{row['tool']:<24} e={row['entities']:<6} v={row['variables'] or '-':<4} "
+            f"net={_ms(row['network_s'])} dec={_ms(row['decode_s'])} "
+            f"walk={_ms(row['walk_s'])} fmt={_ms(row['format_s'])} "
+            f"cold={_ms(row['total_cold_s'])} warm={_ms(row['total_warm_s'])} ms "
+            f"peak={row['peak_memory_bytes'] / 1e6:.1f}MB")
+
+
+def compare(previous: list[dict], current: list[dict], threshold: float) -> list[str]:
+    """Lists rows whose cold tool time grew by more than `threshold` (e.g. 0.2 = 20%)."""
+    before = {(r["tool"], r["entities"], r["variables"]): r for r in previous}
+    regressions = []
+    for row in current:
+        old = before.get((row["tool"], row["entities"], row["variables"]))
+        if old and old["total_cold_s"] and row["total_cold_s"] > old["total_cold_s"] * (1 + threshold):
+            regressions.append(
+                f"{row['tool']} e={row['entities']} v={row['variables']}: "
+                f"{old['total_cold_s'] * 1000:.1f} -> {row['total_cold_s'] * 1000:.1f} ms")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", default=",".join(map(str, DEFAULT_ENTITIES)),
+                        help="comma-separated entity counts")
+    parser.add_argument("--variables", default=",".join(map(str, DEFAULT_VARIABLES)),
+                        help="comma-separated variable counts (get_observations only)")
+    parser.add_argument("--tools", default=",".join(TOOLS), help="comma-separated tool names")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size; medians are reported")
+    parser.add_argument("--max-cells", type=int, default=200_000,
+                        help="skip sizes with more place x variable cells than this")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in latency per response")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="regression threshold")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+
+    results = run([int(n) for n in args.entities.split(",")],
+                  [int(n) for n in args.variables.split(",")],
+                  args.repeat, args.max_cells, args.latency, args.tools.split(","))
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": _git_commit(),
+                     "python": platform.python_version(), "latency_s": args.latency,
+                     "repeat": args.repeat},
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if previous is not None:
+        regressions = compare(previous, results, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,212 @@
+import asyncio
 import datetime
+import functools
+import itertools
 from zoneinfo import ZoneInfo
 from google.adk.agents import Agent
 import requests
 from dotenv import load_dotenv
 import os
 
+from .cache import get_place_cache
+from .client import get_async_client, get_client
+from .columnar import numpy_available
+from .observations import (cached_child_observations, cached_observation_table, cached_observations,
+                           cached_series, fetch_available_variables, fetch_available_variables_async,
+                           fetch_child_observations, fetch_child_observations_async,
+                           fetch_observation_table, fetch_observation_table_async,
+                           fetch_observations, fetch_observations_async,
+                           fetch_series, fetch_series_async)
+from .output import OutputShape, get_output_policy, shaped
+from .pagination import AsyncVariableListing, VariableListing
+from .planner import map_batches, map_batches_async, plan_node_batches
+from .prefetch import get_prefetcher
+from .resilience import CircuitOpenError
+from .search import get_statvar_index
+from .telemetry import instrumented, phase, record
+
 # Load environment variables from .env file
 load_dotenv()
 
+# How each tool's data flattens into rows for the compact output modes
+PLACE_DCID_SHAPE = OutputShape(keys=("place",), fields=("dcid",))
+VARIABLE_LIST_SHAPE = OutputShape(keys=("place",), fields=("variable",), leaf="list")
+STATVAR_MATCH_SHAPE = OutputShape(fields=("dcid", "name", "score"), leaf="record")
+POPULATION_SHAPE = OutputShape(keys=("place",), fields=("population", "date"), leaf="record")
+OBSERVATION_SHAPE = OutputShape(keys=("place", "variable"), fields=("value", "date"), leaf="record")
+PLACE_OBSERVATION_SHAPE = OutputShape(keys=("place", "variable"), fields=("value", "date"),
+                                      leaf="record", section="observations")
+SERIES_SHAPE = OutputShape(keys=("place", "variable"), fields=("dates", "values"), leaf="columns",
+                           columns=("date", "value"))
+COLUMNAR_OBSERVATION_SHAPE = OutputShape(keys=("place", "variable"), fields=("values", "dates"),
+                                         leaf="matrix", columns=("value", "date"))
+
+
+def _observation_shape(response: dict) -> OutputShape:
+    data = response.get("data") if isinstance(response, dict) else None
+    # Place DCIDs never clash with the "entities" key of a columnar result
+    if isinstance(data, dict) and "entities" in data and "values" in data:
+        return COLUMNAR_OBSERVATION_SHAPE
+    return OBSERVATION_SHAPE
+
+def _resolve_params(places: list[str]) -> dict:
+    return {
+        "nodes": places,
+        "property": "<-description->dcid"
+    }
+
+
+def _resolve_batches(url: str, places: list[str]) -> list[list[str]]:
+    with phase("request_build"):
+        return plan_node_batches(url, places, [("property", "<-description->dcid")])
+
+
+def _resolve_places(places: list[str]) -> dict:
+    """Resolves place names to DCIDs in URL-sized batches and caches them."""
+    client = get_client()
+    responses = map_batches(lambda batch: client.get("resolve", _resolve_params(batch)),
+                            _resolve_batches(client.url_for("resolve"), places))
+    with phase("walk"):
+        return _store_resolved({"entities": [entity for data in responses
+                                             for entity in data.get("entities", [])]})
+
+
+async def _resolve_places_async(places: list[str]) -> dict:
+    """Async variant of _resolve_places."""
+    client = get_async_client()
+    responses = await map_batches_async(lambda batch: client.get("resolve", _resolve_params(batch)),
+                                        _resolve_batches(client.url_for("resolve"), places))
+    with phase("walk"):
+        return _store_resolved({"entities": [entity for data in responses
+                                             for entity in data.get("entities", [])]})
+
+
+def _cached_place_dcids(places: list[str]) -> tuple[dict, list[str]]:
+    """Splits places into cached resolutions and names that still need the API."""
+    cached = get_place_cache().get_many(places)
+    misses = [place for place in places if place not in cached]
+    return cached, misses
+
+
+def _store_resolved(resolve_data: dict) -> dict:
+    """Extracts name -> DCID from a /resolve response and caches it."""
+    resolved = {}
+    for entity in resolve_data.get("entities", []):
+        candidates = entity.get("candidates", [])
+        resolved[entity["node"]] = candidates[0]["dcid"] if candidates else None
+    if resolved:
+        get_place_cache().put_many(resolved)
+    return resolved
+
+
+def _stale_response(response: dict) -> dict:
+    """Marks a response built from cached data while Data Commons is unavailable."""
+    if response["status"] == "success":
+        response["stale"] = True
+        response["report"] = ("Note: Data Commons is currently unavailable, so this answer comes "
+                              "from cached data that may be out of date or incomplete.\n\n"
+                              + response["report"])
+    return response
+
+
+def _stale_place_dcids(places: list[str], resolved: dict, misses: list[str],
+                       error: CircuitOpenError) -> dict:
+    """Answers get_place_dcids from cached resolutions, expired ones included."""
+    resolved.update(get_place_cache().get_many(misses, allow_expired=True))
+    if not resolved:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching dcids: {str(error)}"
+        }
+    with phase("report_build"):
+        return _stale_response(_place_dcids_response(places, resolved))
+
+
+def _place_dcids_response(places: list[str], resolved: dict) -> dict:
+    """Builds the get_place_dcids tool response from resolved name -> DCID pairs."""
+    if not resolved:
+        return {
+            "status": "error",
+            "error_message": f"Could not find place data for any of the provided places"
+        }
+
+    # Process results for each place
+    result = {}
+    report = "DCIDs for places:\n"
 
+    for place_name in places:
+        if place_name not in resolved:
+            continue
+        dcid = resolved[place_name]
+        result[place_name] = dcid
+
+        if dcid:
+            report += f"{place_name}: {dcid}\n"
+        else:
+            report += f"{place_name}: No DCID found\n"
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result
+    }
+
+
+@instrumented
+@shaped(PLACE_DCID_SHAPE)
 def get_place_dcids(places: list[str]) -> dict:
     """Retrieves the DCIDs for specified places using Data Commons API v2.
-    
+
     Args:
         places (list[str]): List of place names to get DCIDs for.
-        
+
     Returns:
-        dict: status and dcids or error message. 
+        dict: status and dcids or error message.
     """
-    # Data Commons API v2 endpoints
-    base_url = "https://api.datacommons.org/v2"
-    api_key = os.getenv("DATCOM_API_KEY")
-    
+    # Only names missing from the resolution cache go to the API
+    resolved, misses = _cached_place_dcids(places)
+    record(entities=len(places), cache_misses=len(misses))
     try:
-        # Resolve place names to DCIDs
-        resolve_url = f"{base_url}/resolve"
-        resolve_params = {
-            "key": api_key,
-            "nodes": places,
-            "property": "<-description->dcid"
-        }
-        
-        response = requests.get(resolve_url, params=resolve_params)
-        response.raise_for_status()
-        
-        resolve_data = response.json()
-        if not resolve_data.get("entities"):
-            return {
-                "status": "error",
-                "error_message": f"Could not find place data for any of the provided places"
-            }
-            
-        # Process results for each place
-        result = {}
-        report = "DCIDs for places:\n"
-        
-        for entity in resolve_data["entities"]:
-            place_name = entity["node"]
-            candidates = entity.get("candidates", [])
-            
-            if candidates:
-                dcid = candidates[0]["dcid"]
-                result[place_name] = dcid
-                report += f"{place_name}: {dcid}\n"
-            else:
-                result[place_name] = None
-                report += f"{place_name}: No DCID found\n"
-        
+        if misses:
+            resolved.update(_resolve_places(misses))
+        # Variables and population are usually asked for next
+        get_prefetcher().schedule(resolved.values())
+        with phase("report_build"):
+            return _place_dcids_response(places, resolved)
+
+    except CircuitOpenError as e:
+        return _stale_place_dcids(places, resolved, misses, e)
+    except requests.exceptions.RequestException as e:
         return {
-            "status": "success",
-            "report": report,
-            "data": result
+            "status": "error",
+            "error_message": f"Error fetching dcids: {str(e)}"
         }
-        
+
+
+@instrumented
+@shaped(PLACE_DCID_SHAPE)
+async def get_place_dcids_async(places: list[str]) -> dict:
+    """Retrieves the DCIDs for specified places using Data Commons API v2.
+
+    Async variant of get_place_dcids that does not block the event loop.
+
+    Args:
+        places (list[str]): List of place names to get DCIDs for.
+
+    Returns:
+        dict: status and dcids or error message.
+    """
+    resolved, misses = _cached_place_dcids(places)
+    record(entities=len(places), cache_misses=len(misses))
+    try:
+        if misses:
+            resolved.update(await _resolve_places_async(misses))
+        get_prefetcher().schedule_async(resolved.values())
+        with phase("report_build"):
+            return _place_dcids_response(places, resolved)
+
+    except CircuitOpenError as e:
+        return _stale_place_dcids(places, resolved, misses, e)
     except requests.exceptions.RequestException as e:
         return {
             "status": "error",
@@ -70,70 +214,78 @@ def get_place_dcids(places: list[str]) -> dict:
         }
 
 
+def _available_variables_response(result: dict) -> dict:
+    """Builds the get_available_variables tool response from entity -> variables."""
+    # Format for human-readable output
+    report = "Available variables (limited to first 30 per place):\n"
+    for entity, vars in result.items():
+        if vars:
+            report += f"\nFor place {entity}:\n"
+            for var in vars:
+                report += f"  - {var}\n"
+        else:
+            report += f"\nNo variables found for place {entity}\n"
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result  # Include raw data for programmatic use
+    }
+
+
+@instrumented
+@shaped(VARIABLE_LIST_SHAPE)
 def get_available_variables(place_dcids: str) -> dict:
     """Retrieves available statistical variables for one or more entity DCIDs.
-    
+
     Args:
         place_dcids (str): Comma-separated DCIDs of places to query.
-        
+
     Returns:
         dict: status and available variables or error message.
               Note: Results are limited to the first 30 variables per place.
     """
-    # Data Commons API v2 endpoints
-    base_url = "https://api.datacommons.org/v2"
-    api_key = os.getenv("DATCOM_API_KEY")
-    
     # Convert comma-separated string to list
     dcid_list = [dcid.strip() for dcid in place_dcids.split(",")]
-    
+
     try:
-        # Use observation API to get available variables using GET request
-        observation_url = f"{base_url}/observation"
-        url = f"{observation_url}?key={api_key}&date=LATEST"
-        
-        # Add entity.dcids parameters, properly URL encoded
-        for dcid in dcid_list:
-            url += f"&entity.dcids={requests.utils.quote(dcid)}"
-        url += "&select=entity&select=variable"
-        
-        # Make the request
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Process the results to extract available variables
-        result = {}
-        
-        # Initialize result with empty lists for each entity
-        for entity_dcid in dcid_list:
-            result[entity_dcid] = []
-        
-        # If there's data for variables, extract them
-        if "byVariable" in data:
-            for variable_dcid, variable_data in data["byVariable"].items():
-                if "byEntity" in variable_data:
-                    for entity_dcid, entity_data in variable_data["byEntity"].items():
-                        if entity_dcid in result and len(result[entity_dcid]) < 30:
-                            result[entity_dcid].append(variable_dcid)
-        
-        # Format for human-readable output
-        report = "Available variables (limited to first 30 per place):\n"
-        for entity, vars in result.items():
-            if vars:
-                report += f"\nFor place {entity}:\n"
-                for var in vars:
-                    report += f"  - {var}\n"
-            else:
-                report += f"\nNo variables found for place {entity}\n"
-        
+        # Use observation API to get available variables, stopping the
+        # download once every place has 30
+        result = fetch_available_variables(dcid_list, limit=30)
+        # Name the listed variables for search_statistical_variables
+        get_prefetcher().schedule_names([v for variables in result.values() for v in variables])
+        with phase("report_build"):
+            return _available_variables_response(result)
+
+    except requests.exceptions.RequestException as e:
         return {
-            "status": "success",
-            "report": report,
-            "data": result  # Include raw data for programmatic use
+            "status": "error",
+            "error_message": f"Error fetching variables for {place_dcids}: {str(e)}"
         }
-        
+
+
+@instrumented
+@shaped(VARIABLE_LIST_SHAPE)
+async def get_available_variables_async(place_dcids: str) -> dict:
+    """Retrieves available statistical variables for one or more entity DCIDs.
+
+    Async variant of get_available_variables that does not block the event loop.
+
+    Args:
+        place_dcids (str): Comma-separated DCIDs of places to query.
+
+    Returns:
+        dict: status and available variables or error message.
+              Note: Results are limited to the first 30 variables per place.
+    """
+    dcid_list = [dcid.strip() for dcid in place_dcids.split(",")]
+
+    try:
+        result = await fetch_available_variables_async(dcid_list, limit=30)
+        get_prefetcher().schedule_names_async([v for variables in result.values() for v in variables])
+        with phase("report_build"):
+            return _available_variables_response(result)
+
     except requests.exceptions.RequestException as e:
         return {
             "status": "error",
@@ -141,86 +293,246 @@ def get_available_variables(place_dcids: str) -> dict:
         }
 
 
+def _variable_page_response(entities: list[str], pairs: list[tuple[str, str]], cursor) -> dict:
+    """Builds the get_available_variables_page tool response from one page of pairs."""
+    result = {entity: [] for entity in entities}
+    for entity, variable in pairs:
+        result[entity].append(variable)
+
+    report = f"Available variables ({len(pairs)} in this page):\n"
+    for entity, variables in result.items():
+        if variables:
+            report += f"\nFor place {entity}:\n"
+            for var in variables:
+                report += f"  - {var}\n"
+    if cursor:
+        report += f"\nMore variables are available. Call again with cursor=\"{cursor}\" to continue."
+    else:
+        report += "\nThis is the end of the listing."
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result,
+        "next_cursor": cursor
+    }
+
+
+@instrumented
+@shaped(VARIABLE_LIST_SHAPE)
+def get_available_variables_page(place_dcids: str, page_size: int = 100, cursor: str = "") -> dict:
+    """Lists every statistical variable with data for the given places, one page at a time.
+
+    Unlike get_available_variables, the listing is not cut at 30 variables per
+    place. Variables come back in a fixed order, so continuing with the cursor
+    never repeats or skips one.
+
+    Args:
+        place_dcids (str): Comma-separated DCIDs of places to query. Ignored when
+                           a cursor is given.
+        page_size (int, optional): Variables to return in this call. Defaults to 100.
+        cursor (str, optional): next_cursor from a previous call, to continue
+                                where it stopped.
+
+    Returns:
+        dict: status, variables per place and next_cursor (None at the end of
+              the listing), or error message.
+    """
+    try:
+        if cursor:
+            listing = VariableListing(cursor=cursor)
+        else:
+            listing = VariableListing([dcid.strip() for dcid in place_dcids.split(",")])
+        pairs = list(itertools.islice(listing, max(page_size, 1)))
+        get_prefetcher().schedule_names([variable for _, variable in pairs])
+        with phase("report_build"):
+            return _variable_page_response(listing.entities, pairs, listing.cursor)
+
+    except (ValueError, requests.exceptions.RequestException) as e:
+        return {
+            "status": "error",
+            "error_message": f"Error listing variables for {place_dcids}: {str(e)}"
+        }
+
+
+@instrumented
+@shaped(VARIABLE_LIST_SHAPE)
+async def get_available_variables_page_async(place_dcids: str, page_size: int = 100,
+                                             cursor: str = "") -> dict:
+    """Lists every statistical variable with data for the given places, one page at a time.
+
+    Async variant of get_available_variables_page that does not block the event loop.
+
+    Args:
+        place_dcids (str): Comma-separated DCIDs of places to query. Ignored when
+                           a cursor is given.
+        page_size (int, optional): Variables to return in this call. Defaults to 100.
+        cursor (str, optional): next_cursor from a previous call, to continue
+                                where it stopped.
+
+    Returns:
+        dict: status, variables per place and next_cursor (None at the end of
+              the listing), or error message.
+    """
+    try:
+        if cursor:
+            listing = AsyncVariableListing(cursor=cursor)
+        else:
+            listing = AsyncVariableListing([dcid.strip() for dcid in place_dcids.split(",")])
+        pairs = []
+        async for pair in listing:
+            pairs.append(pair)
+            if len(pairs) >= page_size:
+                break
+        get_prefetcher().schedule_names_async([variable for _, variable in pairs])
+        with phase("report_build"):
+            return _variable_page_response(listing.entities, pairs, listing.cursor)
+
+    except (ValueError, requests.exceptions.RequestException) as e:
+        return {
+            "status": "error",
+            "error_message": f"Error listing variables for {place_dcids}: {str(e)}"
+        }
+
+
+@instrumented
+@shaped(STATVAR_MATCH_SHAPE)
+def search_statistical_variables(query: str, limit: int = 10) -> dict:
+    """Finds statistical variables (statvars) matching a description, without an API call.
+
+    Searches a local index of every statvar seen so far in variable listings
+    and local data files, matching words of the query against the parts of
+    each DCID (e.g. "income" and "abroad" in
+    Count_Person_IncomeOf10000To14999USDollar_DifferentHouseAbroad) and, once
+    known, its name (e.g. "Total population").
+
+    Args:
+        query (str): What to measure, e.g. "people who moved from abroad".
+        limit (int, optional): Maximum variables to return. Defaults to 10.
+
+    Returns:
+        dict: status and matching statvar DCIDs, best match first.
+    """
+    with phase("walk"):
+        matches = get_statvar_index().search(query, limit)
+    record(variables=len(matches))
+
+    with phase("report_build"):
+        if not matches:
+            return {
+                "status": "error",
+                "error_message": (f"No known statistical variables match '{query}'. List the "
+                                  "place's variables with get_available_variables first.")
+            }
+        report = f"Statistical variables matching '{query}':\n"
+        for match in matches:
+            name = f" ({match['name']})" if match["name"] else ""
+            report += f"  - {match['dcid']}{name}\n"
+        return {
+            "status": "success",
+            "report": report,
+            "data": matches
+        }
+
+
+def _population_response(observations: dict) -> dict:
+    """Builds the get_population_count tool response from fetched observations."""
+    # Process the results to extract population counts
+    result = {}
+
+    for entity_dcid, variables in observations.items():
+        if "Count_Person" in variables:
+            result[entity_dcid] = {
+                "population": variables["Count_Person"]["value"],
+                "date": variables["Count_Person"]["date"]
+            }
+
+    # Format for human-readable output
+    report = "Population counts:\n"
+    if result:
+        for entity, data in result.items():
+            population = data.get("population")
+            obs_date = data.get("date")
+            report += f"\n{entity}: {population:,} (as of {obs_date})"
+    else:
+        report += "\nNo population data found for the requested places."
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result  # Include raw data for programmatic use
+    }
+
+
+@instrumented
+@shaped(POPULATION_SHAPE)
 def get_population_count(place_dcids: str, date: str = "LATEST") -> dict:
     """Retrieves population count (Count_Person) for one or more entity DCIDs.
-    
+
     Args:
         place_dcids (str): Comma-separated DCIDs of places to query.
         date (str, optional): Date to query. Defaults to "LATEST".
                              Can be "LATEST" or a specific year like "2020".
-        
+
     Returns:
         dict: status and population counts or error message.
     """
-    # Data Commons API v2 endpoints
-    base_url = "https://api.datacommons.org/v2"
-    api_key = os.getenv("DATCOM_API_KEY")
-    
     # Convert comma-separated string to list
     dcid_list = [dcid.strip() for dcid in place_dcids.split(",")]
-    
+
     try:
         # Use observation API to get population count
-        observation_url = f"{base_url}/observation"
-        url = f"{observation_url}?key={api_key}&date={requests.utils.quote(date)}"
-        
-        # Add entity.dcids parameters, properly URL encoded
-        for dcid in dcid_list:
-            url += f"&entity.dcids={requests.utils.quote(dcid)}"
-        
-        # Add variable.dcids parameter for Count_Person
-        url += f"&variable.dcids=Count_Person"
-        
-        # Add select parameters for entity, variable, value, and date
-        url += "&select=entity&select=variable&select=value&select=date"
-        
-        # Make the request
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Process the results to extract population counts
-        result = {}
-        
-        # Check if Count_Person data exists in the response
-        if "byVariable" in data and "Count_Person" in data["byVariable"]:
-            variable_data = data["byVariable"]["Count_Person"]
-            
-            if "byEntity" in variable_data:
-                for entity_dcid, entity_data in variable_data["byEntity"].items():
-                    if "orderedFacets" in entity_data and entity_data["orderedFacets"]:
-                        # Get the most recent observation from the first facet
-                        # (Different facets represent different data sources)
-                        facet = entity_data["orderedFacets"][0]
-                        
-                        if "observations" in facet and facet["observations"]:
-                            # Get the population and its date
-                            obs = facet["observations"][0]
-                            population = obs.get("value")
-                            obs_date = obs.get("date")
-                            
-                            result[entity_dcid] = {
-                                "population": population,
-                                "date": obs_date
-                            }
-        
-        # Format for human-readable output
-        report = "Population counts:\n"
-        if result:
-            for entity, data in result.items():
-                population = data.get("population")
-                obs_date = data.get("date")
-                report += f"\n{entity}: {population:,} (as of {obs_date})"
-        else:
-            report += "\nNo population data found for the requested places."
-        
+        observations = fetch_observations(dcid_list, ["Count_Person"], date)
+        with phase("report_build"):
+            return _population_response(observations)
+
+    except CircuitOpenError as e:
+        observations = cached_observations(dcid_list, ["Count_Person"], date)
+        if not observations:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching population for {place_dcids}: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_population_response(observations))
+    except requests.exceptions.RequestException as e:
         return {
-            "status": "success",
-            "report": report,
-            "data": result  # Include raw data for programmatic use
+            "status": "error",
+            "error_message": f"Error fetching population for {place_dcids}: {str(e)}"
         }
-        
+
+
+@instrumented
+@shaped(POPULATION_SHAPE)
+async def get_population_count_async(place_dcids: str, date: str = "LATEST") -> dict:
+    """Retrieves population count (Count_Person) for one or more entity DCIDs.
+
+    Async variant of get_population_count that does not block the event loop.
+
+    Args:
+        place_dcids (str): Comma-separated DCIDs of places to query.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+
+    Returns:
+        dict: status and population counts or error message.
+    """
+    dcid_list = [dcid.strip() for dcid in place_dcids.split(",")]
+
+    try:
+        observations = await fetch_observations_async(dcid_list, ["Count_Person"], date)
+        with phase("report_build"):
+            return _population_response(observations)
+
+    except CircuitOpenError as e:
+        observations = cached_observations(dcid_list, ["Count_Person"], date)
+        if not observations:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching population for {place_dcids}: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_population_response(observations))
     except requests.exceptions.RequestException as e:
         return {
             "status": "error",
@@ -228,90 +540,494 @@ def get_population_count(place_dcids: str, date: str = "LATEST") -> dict:
         }
 
 
-def get_observations(place_dcids: list[str], statvar_dcids: list[str], date: str = "LATEST") -> dict:
+def _observations_response(result: dict) -> dict:
+    """Builds the get_observations tool response from fetched observations."""
+    # Format for human-readable output
+    report = "Observations:\n"
+    if result:
+        for entity, variables in result.items():
+            report += f"\nFor place {entity}:\n"
+            for variable, data in variables.items():
+                value = data.get("value")
+                obs_date = data.get("date")
+                report += f"  - {variable}: {value:,} (as of {obs_date})\n"
+    else:
+        report += "\nNo observations found for the requested places and variables."
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result  # Include raw data for programmatic use
+    }
+
+
+def _columnar_response(table) -> dict:
+    """Builds the get_observations tool response for a columnar result.
+
+    The report is built from the table's per-place dicts; data holds the table
+    itself as entities, variables and values and dates matrices.
+    """
+    response = _observations_response(table.to_observations())
+    response["data"] = table.to_columns()
+    return response
+
+
+def _columnar_unavailable() -> dict:
+    return {
+        "status": "error",
+        "error_message": "Columnar observation results require numpy: pip install numpy"
+    }
+
+
+@instrumented
+@shaped(_observation_shape)
+def get_observations(place_dcids: list[str], statvar_dcids: list[str], date: str = "LATEST",
+                     columnar: bool = False) -> dict:
     """Retrieves statistical observations for given places and variables using Data Commons API v2.
-    
+
+    Cells already in the observation cache are not requested again, so adding
+    a place or variable to an earlier query only fetches the new cells.
+
     Args:
         place_dcids (list[str]): List of DCIDs for places to query.
         statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
         date (str, optional): Date to query. Defaults to "LATEST".
                              Can be "LATEST" or a specific year like "2020".
-        
+        columnar (bool, optional): Return data as a table instead of per-place
+                                   dicts: "entities" and "variables" lists, and
+                                   "values" and "dates" matrices with one row per
+                                   place and None where there is no observation.
+                                   Compact for many places and variables.
+                                   Defaults to False.
+
     Returns:
         dict: status and observations or error message.
     """
-    # Data Commons API v2 endpoints
-    base_url = "https://api.datacommons.org/v2"
-    api_key = os.getenv("DATCOM_API_KEY")
-    
+    if columnar and not numpy_available():
+        return _columnar_unavailable()
     try:
+        if columnar:
+            table = fetch_observation_table(place_dcids, statvar_dcids, date)
+            with phase("report_build"):
+                return _columnar_response(table)
         # Use observation API to get observations
-        observation_url = f"{base_url}/observation"
-        url = f"{observation_url}?key={api_key}&date={requests.utils.quote(date)}"
-        
-        # Add entity.dcids parameters, properly URL encoded
-        for dcid in place_dcids:
-            url += f"&entity.dcids={requests.utils.quote(dcid)}"
-        
-        # Add variable.dcids parameters, properly URL encoded
-        for dcid in statvar_dcids:
-            url += f"&variable.dcids={requests.utils.quote(dcid)}"
-        
-        # Add select parameters for entity, variable, value, and date
-        url += "&select=entity&select=variable&select=value&select=date"
-        
-        # Make the request
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Process the results to extract observations
-        result = {}
-        
-        # Check if we have any variable data in the response
-        if "byVariable" in data:
-            for variable_dcid, variable_data in data["byVariable"].items():
-                if "byEntity" in variable_data:
-                    for entity_dcid, entity_data in variable_data["byEntity"].items():
-                        if "orderedFacets" in entity_data and entity_data["orderedFacets"]:
-                            # Get the most recent observation from the first facet
-                            # (Different facets represent different data sources)
-                            facet = entity_data["orderedFacets"][0]
-                            
-                            if "observations" in facet and facet["observations"]:
-                                # Get the value and its date
-                                obs = facet["observations"][0]
-                                value = obs.get("value")
-                                obs_date = obs.get("date")
-                                
-                                # Initialize result structure if needed
-                                if entity_dcid not in result:
-                                    result[entity_dcid] = {}
-                                
-                                result[entity_dcid][variable_dcid] = {
-                                    "value": value,
-                                    "date": obs_date
-                                }
-        
-        # Format for human-readable output
-        report = "Observations:\n"
-        if result:
-            for entity, variables in result.items():
-                report += f"\nFor place {entity}:\n"
-                for variable, data in variables.items():
-                    value = data.get("value")
-                    obs_date = data.get("date")
-                    report += f"  - {variable}: {value:,} (as of {obs_date})\n"
+        result = fetch_observations(place_dcids, statvar_dcids, date)
+        with phase("report_build"):
+            return _observations_response(result)
+
+    except CircuitOpenError as e:
+        return _stale_observations(place_dcids, statvar_dcids, date, columnar, e)
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+@instrumented
+@shaped(_observation_shape)
+async def get_observations_async(place_dcids: list[str], statvar_dcids: list[str], date: str = "LATEST",
+                                 columnar: bool = False) -> dict:
+    """Retrieves statistical observations for given places and variables using Data Commons API v2.
+
+    Async variant of get_observations that does not block the event loop.
+
+    Args:
+        place_dcids (list[str]): List of DCIDs for places to query.
+        statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+        columnar (bool, optional): Return data as a table instead of per-place
+                                   dicts: "entities" and "variables" lists, and
+                                   "values" and "dates" matrices with one row per
+                                   place and None where there is no observation.
+                                   Compact for many places and variables.
+                                   Defaults to False.
+
+    Returns:
+        dict: status and observations or error message.
+    """
+    if columnar and not numpy_available():
+        return _columnar_unavailable()
+    try:
+        if columnar:
+            table = await fetch_observation_table_async(place_dcids, statvar_dcids, date)
+            with phase("report_build"):
+                return _columnar_response(table)
+        result = await fetch_observations_async(place_dcids, statvar_dcids, date)
+        with phase("report_build"):
+            return _observations_response(result)
+
+    except CircuitOpenError as e:
+        return _stale_observations(place_dcids, statvar_dcids, date, columnar, e)
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+def _stale_observations(place_dcids: list[str], statvar_dcids: list[str], date: str,
+                        columnar: bool, error: Exception) -> dict:
+    """Answers get_observations from cached cells while the circuit breaker is open."""
+    result = cached_observations(place_dcids, statvar_dcids, date)
+    if not result:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(error)}"
+        }
+    with phase("report_build"):
+        if columnar:
+            return _stale_response(_columnar_response(
+                cached_observation_table(place_dcids, statvar_dcids, date)))
+        return _stale_response(_observations_response(result))
+
+
+def _is_place_dcid(place: str) -> bool:
+    # Names never contain "/", DCIDs such as "geoId/06" and "country/USA" do
+    return "/" in place and not any(c.isspace() for c in place)
+
+
+def _is_statvar_dcid(term: str) -> bool:
+    if any(c.isspace() for c in term):
+        return False
+    return "_" in term or "/" in term or term in get_statvar_index()
+
+
+def _split_places(places: list[str]) -> tuple[dict, list[str]]:
+    """Splits places into those already given as DCIDs and names to resolve."""
+    given = {place: place for place in places if _is_place_dcid(place)}
+    return given, [place for place in places if place not in given]
+
+
+def _match_variables(variables: list[str]) -> tuple[dict, list[str]]:
+    """Maps each variable DCID to itself and each keyword to its best indexed statvar.
+
+    Returns:
+        tuple: {term: statvar DCID}, and the keywords nothing matched yet.
+    """
+    index = get_statvar_index()
+    chosen = {}
+    unmatched = []
+    for term in dict.fromkeys(variables):
+        if _is_statvar_dcid(term):
+            chosen[term] = term
+            continue
+        matches = index.search(term, 1)
+        if matches:
+            chosen[term] = matches[0]["dcid"]
         else:
-            report += "\nNo observations found for the requested places and variables."
-        
+            unmatched.append(term)
+    return chosen, unmatched
+
+
+def _match_listed_variables(keywords: list[str], listings: dict) -> dict:
+    """Matches keywords against the places' variable listings (now in the index).
+
+    Variables the places actually have are preferred over other matches.
+    """
+    available = {variable for variables in listings.values() for variable in variables}
+    index = get_statvar_index()
+    chosen = {}
+    for keyword in keywords:
+        matches = index.search(keyword, 50)
+        listed = [match for match in matches if match["dcid"] in available]
+        if listed or matches:
+            chosen[keyword] = (listed or matches)[0]["dcid"]
+    return chosen
+
+
+def _keywords_without_data(chosen: dict, result: dict) -> list[str]:
+    """Returns the keywords whose matched variable has no observation for any of the places."""
+    found = {variable for cells in result.values() for variable in cells}
+    return [term for term, variable in chosen.items() if term != variable and variable not in found]
+
+
+def _rematch(keywords: list[str], listings: dict, chosen: dict, result: dict) -> list[str]:
+    """Matches keywords again against the places' listings, updating chosen.
+
+    Returns:
+        list[str]: Newly chosen variables whose observations are still to fetch.
+    """
+    listed = _match_listed_variables(keywords, listings)
+    chosen.update(listed)
+    found = {variable for cells in result.values() for variable in cells}
+    return [variable for variable in dict.fromkeys(listed.values()) if variable not in found]
+
+
+def _merge_observations(result: dict, fetched: dict):
+    for entity, cells in fetched.items():
+        result.setdefault(entity, {}).update(cells)
+
+
+def _place_observations_response(places: list[str], resolved: dict, variables: list[str],
+                                 chosen: dict, result: dict) -> dict:
+    """Builds the get_place_observations tool response."""
+    if not any(resolved.values()):
         return {
-            "status": "success",
-            "report": report,
-            "data": result  # Include raw data for programmatic use
+            "status": "error",
+            "error_message": "Could not find place data for any of the provided places"
+        }
+    if not chosen:
+        return {
+            "status": "error",
+            "error_message": (f"No statistical variables match {', '.join(variables)}. List the "
+                              "places' variables with get_available_variables first.")
+        }
+
+    report = "Places:\n"
+    for place in places:
+        report += f"  - {place}: {resolved.get(place) or 'No DCID found'}\n"
+    report += "\nVariables:\n"
+    for term in dict.fromkeys(variables):
+        if term not in chosen:
+            report += f"  - {term}: No matching variable found\n"
+        elif chosen[term] != term:
+            report += f"  - {term}: {chosen[term]}\n"
+        else:
+            report += f"  - {term}\n"
+    report += "\n" + _observations_response(result)["report"]
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": {
+            "places": {place: resolved.get(place) for place in places},
+            "variables": chosen,
+            "observations": result
+        }
+    }
+
+
+def _stale_place_observations(places: list[str], resolved: dict, variables: list[str],
+                              date: str, error: CircuitOpenError) -> dict:
+    """Answers get_place_observations from cached resolutions and observations."""
+    names = [place for place in places if place not in resolved]
+    resolved.update(get_place_cache().get_many(names, allow_expired=True))
+    chosen, _ = _match_variables(variables)
+    dcids = list(dict.fromkeys(resolved[place] for place in places if resolved.get(place)))
+    result = cached_observations(dcids, list(dict.fromkeys(chosen.values())), date)
+    if not result:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(error)}"
+        }
+    with phase("report_build"):
+        return _stale_response(_place_observations_response(places, resolved, variables, chosen, result))
+
+
+@instrumented
+@shaped(PLACE_OBSERVATION_SHAPE)
+def get_place_observations(places: list[str], variables: list[str], date: str = "LATEST") -> dict:
+    """Looks up places by name and returns their observations in one call.
+
+    Combines get_place_dcids, search_statistical_variables and get_observations,
+    so a typical question needs one tool call instead of three. Place names are
+    resolved to DCIDs, and variables may be statvar DCIDs or short descriptions
+    such as "median age" or "unemployment rate"; the report shows which statvar
+    each description was matched to. A description matched to a variable the
+    places have no data for is matched again among the places' own variables.
+
+    Args:
+        places (list[str]): Place names such as "California", or place DCIDs.
+        variables (list[str]): Statvar DCIDs such as "Count_Person", or descriptions.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+
+    Returns:
+        dict: status, the DCID of each place and variable, and observations,
+              or error message.
+    """
+    resolved, names = _split_places(places)
+    record(entities=len(places), variables=len(variables))
+    try:
+        cached, misses = _cached_place_dcids(names)
+        resolved.update(cached)
+        if misses:
+            resolved.update(_resolve_places(misses))
+        dcids = list(dict.fromkeys(resolved[place] for place in places if resolved.get(place)))
+
+        chosen, unmatched = _match_variables(variables)
+        result = {}
+        if dcids and chosen:
+            result = fetch_observations(dcids, list(dict.fromkeys(chosen.values())), date)
+        # Only descriptions the index cannot match, or matched to a variable these
+        # places have no data for, need the places' listings
+        retry = unmatched + _keywords_without_data(chosen, result)
+        if dcids and retry:
+            new = _rematch(retry, fetch_available_variables(dcids), chosen, result)
+            if new:
+                _merge_observations(result, fetch_observations(dcids, new, date))
+        with phase("report_build"):
+            return _place_observations_response(places, resolved, variables, chosen, result)
+
+    except CircuitOpenError as e:
+        return _stale_place_observations(places, resolved, variables, date, e)
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+@instrumented
+@shaped(PLACE_OBSERVATION_SHAPE)
+async def get_place_observations_async(places: list[str], variables: list[str],
+                                       date: str = "LATEST") -> dict:
+    """Looks up places by name and returns their observations in one call.
+
+    Async variant of get_place_observations. Observations for variables
+    already known are fetched while the places' listings are searched for
+    the descriptions that still need them.
+
+    Args:
+        places (list[str]): Place names such as "California", or place DCIDs.
+        variables (list[str]): Statvar DCIDs such as "Count_Person", or descriptions.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+
+    Returns:
+        dict: status, the DCID of each place and variable, and observations,
+              or error message.
+    """
+    resolved, names = _split_places(places)
+    record(entities=len(places), variables=len(variables))
+    try:
+        cached, misses = _cached_place_dcids(names)
+        resolved.update(cached)
+        if misses:
+            resolved.update(await _resolve_places_async(misses))
+        dcids = list(dict.fromkeys(resolved[place] for place in places if resolved.get(place)))
+
+        chosen, unmatched = _match_variables(variables)
+        known = list(dict.fromkeys(chosen.values()))
+        result = {}
+        if dcids and unmatched:
+            async def match_and_fetch():
+                listings = await fetch_available_variables_async(dcids)
+                new = [variable for variable in _rematch(unmatched, listings, chosen, {})
+                       if variable not in known]
+                return await fetch_observations_async(dcids, new, date) if new else {}
+
+            fetches = [match_and_fetch()]
+            if known:
+                fetches.append(fetch_observations_async(dcids, known, date))
+            for fetched in await asyncio.gather(*fetches):
+                _merge_observations(result, fetched)
+        elif dcids and known:
+            result = await fetch_observations_async(dcids, known, date)
+        # Descriptions matched to a variable these places have no data for are
+        # matched again against the listings
+        retry = [term for term in _keywords_without_data(chosen, result) if term not in unmatched]
+        if dcids and retry:
+            new = _rematch(retry, await fetch_available_variables_async(dcids), chosen, result)
+            if new:
+                _merge_observations(result, await fetch_observations_async(dcids, new, date))
+        with phase("report_build"):
+            return _place_observations_response(places, resolved, variables, chosen, result)
+
+    except CircuitOpenError as e:
+        return _stale_place_observations(places, resolved, variables, date, e)
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+def _series_response(series: dict) -> dict:
+    """Builds the get_observation_series tool response from fetched time series."""
+    result = {}
+    report = "Time series:\n"
+    for entity, variables in series.items():
+        result[entity] = {}
+        report += f"\nFor place {entity}:\n"
+        for variable, points in variables.items():
+            result[entity][variable] = points.to_dict()
+            report += f"  - {variable} ({points.dates[0]} to {points.dates[-1]}, {len(points)} points):\n"
+            for obs_date, value in zip(points.dates, result[entity][variable]["values"]):
+                report += f"      {obs_date}: {value:,}\n"
+    if not result:
+        report += "\nNo observations found for the requested places, variables and dates."
+
+    return {
+        "status": "success",
+        "report": report,
+        "data": result  # {place: {statvar: {"dates": [...], "values": [...]}}}
+    }
+
+
+@instrumented
+@shaped(SERIES_SHAPE)
+def get_observation_series(place_dcids: list[str], statvar_dcids: list[str],
+                           start_date: str = "", end_date: str = "") -> dict:
+    """Retrieves every observation over time for given places and variables, for trend questions.
+
+    One call returns all dates, so there is no need to query year by year.
+    Series are cached, so narrowing or widening the date range later is
+    answered locally.
+
+    Args:
+        place_dcids (list[str]): List of DCIDs for places to query.
+        statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
+        start_date (str, optional): First date to include, e.g. "2015". Defaults to the earliest.
+        end_date (str, optional): Last date to include, e.g. "2020". Defaults to the latest.
+
+    Returns:
+        dict: status and dates and values per place and variable, or error message.
+    """
+    try:
+        series = fetch_series(place_dcids, statvar_dcids, start_date or None, end_date or None)
+        with phase("report_build"):
+            return _series_response(series)
+
+    except CircuitOpenError as e:
+        series = cached_series(place_dcids, statvar_dcids, start_date or None, end_date or None)
+        if not series:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching observations: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_series_response(series))
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
         }
-        
+
+
+@instrumented
+@shaped(SERIES_SHAPE)
+async def get_observation_series_async(place_dcids: list[str], statvar_dcids: list[str],
+                                       start_date: str = "", end_date: str = "") -> dict:
+    """Retrieves every observation over time for given places and variables, for trend questions.
+
+    Async variant of get_observation_series that does not block the event loop.
+
+    Args:
+        place_dcids (list[str]): List of DCIDs for places to query.
+        statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
+        start_date (str, optional): First date to include, e.g. "2015". Defaults to the earliest.
+        end_date (str, optional): Last date to include, e.g. "2020". Defaults to the latest.
+
+    Returns:
+        dict: status and dates and values per place and variable, or error message.
+    """
+    try:
+        series = await fetch_series_async(place_dcids, statvar_dcids, start_date or None, end_date or None)
+        with phase("report_build"):
+            return _series_response(series)
+
+    except CircuitOpenError as e:
+        series = cached_series(place_dcids, statvar_dcids, start_date or None, end_date or None)
+        if not series:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching observations: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_series_response(series))
     except requests.exceptions.RequestException as e:
         return {
             "status": "error",
@@ -319,6 +1035,208 @@ def get_observations(place_dcids: list[str], statvar_dcids: list[str], date: str
         }
 
 
+@instrumented
+@shaped(OBSERVATION_SHAPE)
+def get_child_place_observations(parent_dcid: str, child_place_type: str, statvar_dcids: list[str],
+                                 date: str = "LATEST") -> dict:
+    """Retrieves observations for every place of a type within a parent place, in one request.
+
+    Use this to compare all counties in a state, all states in a country, etc.,
+    without looking up each child place's DCID first.
+
+    Args:
+        parent_dcid (str): DCID of the containing place, e.g. "geoId/06" for California.
+        child_place_type (str): Type of the child places, e.g. "County", "State" or "City".
+        statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+
+    Returns:
+        dict: status and observations per child place or error message.
+    """
+    try:
+        result = fetch_child_observations(parent_dcid, child_place_type, statvar_dcids, date)
+        with phase("report_build"):
+            return _observations_response(result)
+
+    except CircuitOpenError as e:
+        result = cached_child_observations(parent_dcid, child_place_type, statvar_dcids, date)
+        if not result:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching observations: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_observations_response(result))
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+@instrumented
+@shaped(OBSERVATION_SHAPE)
+async def get_child_place_observations_async(parent_dcid: str, child_place_type: str,
+                                             statvar_dcids: list[str], date: str = "LATEST") -> dict:
+    """Retrieves observations for every place of a type within a parent place, in one request.
+
+    Async variant of get_child_place_observations that does not block the event loop.
+
+    Args:
+        parent_dcid (str): DCID of the containing place, e.g. "geoId/06" for California.
+        child_place_type (str): Type of the child places, e.g. "County", "State" or "City".
+        statvar_dcids (list[str]): List of DCIDs for statistical variables to query.
+        date (str, optional): Date to query. Defaults to "LATEST".
+                             Can be "LATEST" or a specific year like "2020".
+
+    Returns:
+        dict: status and observations per child place or error message.
+    """
+    try:
+        result = await fetch_child_observations_async(parent_dcid, child_place_type, statvar_dcids, date)
+        with phase("report_build"):
+            return _observations_response(result)
+
+    except CircuitOpenError as e:
+        result = cached_child_observations(parent_dcid, child_place_type, statvar_dcids, date)
+        if not result:
+            return {
+                "status": "error",
+                "error_message": f"Error fetching observations: {str(e)}"
+            }
+        with phase("report_build"):
+            return _stale_response(_observations_response(result))
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error_message": f"Error fetching observations: {str(e)}"
+        }
+
+
+def _unknown_handle(handle: str) -> dict:
+    return {
+        "status": "error",
+        "error_message": (f"No stored result for handle {handle}; it may have expired. "
+                          "Repeat the original call.")
+    }
+
+
+@instrumented
+def get_more_output(handle: str, offset: int = 0) -> dict:
+    """Reads more of a tool result that was too large to return in one piece.
+
+    Truncated results carry a "truncated" entry with a handle and the
+    next_offset to continue from. Results stored under a handle can be read
+    in order this way too.
+
+    Args:
+        handle (str): The handle from the truncated result.
+        offset (int, optional): Where to continue, from next_offset. Defaults to 0.
+
+    Returns:
+        dict: The next part of the result, or error message.
+    """
+    with phase("report_build"):
+        response = get_output_policy().page(handle, max(offset, 0))
+    if response is None:
+        return _unknown_handle(handle)
+    return response
+
+
+@instrumented
+def query_result(handle: str, filters: str = "", sort_by: str = "", descending: bool = False,
+                 offset: int = 0, limit: int = 50) -> dict:
+    """Filters, sorts and pages the rows of a stored result, without fetching again.
+
+    Large results are returned as a summary with a handle; use this to read
+    only the rows needed, e.g. the 10 places with the highest value.
+
+    Args:
+        handle (str): The handle from the stored result.
+        filters (str, optional): ";"-separated conditions on columns, e.g.
+                                 "variable=Count_Person; value>1000000". Operators
+                                 are =, !=, >, >=, <, <= and ~ (contains).
+        sort_by (str, optional): Column to sort by, e.g. "value".
+        descending (bool, optional): Sort largest first. Defaults to False.
+        offset (int, optional): Matching rows to skip. Defaults to 0.
+        limit (int, optional): Rows to return. Defaults to 50.
+
+    Returns:
+        dict: status, the matching rows and next_offset, or error message.
+    """
+    policy = get_output_policy()
+    result = policy.result_set(handle)
+    if result is None:
+        return _unknown_handle(handle)
+    offset, limit = max(offset, 0), max(limit, 1)
+    try:
+        with phase("walk"):
+            result = result.filter(filters).sort(sort_by, descending)
+            rows, next_offset = result.page(offset, limit)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error_message": f"Error querying result {handle}: {str(e)}"
+        }
+    record(rows=len(rows.rows))
+    with phase("report_build"):
+        text = f"Rows {offset + 1}-{offset + len(rows.rows)} of {len(result.rows)} matching"
+        if next_offset is not None:
+            text += f" (call again with offset={next_offset} for more)"
+        text += ":\n"
+        return policy.rows_response(rows, {"handle": handle, "total": len(result.rows),
+                                           "next_offset": next_offset}, text)
+
+
+@instrumented
+def aggregate_result(handle: str, function: str = "sum", column: str = "value", group_by: str = "",
+                     filters: str = "") -> dict:
+    """Summarizes a stored result, e.g. the total or mean value per variable, without fetching again.
+
+    Args:
+        handle (str): The handle from the stored result.
+        function (str, optional): "count", "sum", "mean", "min" or "max". Defaults to "sum".
+        column (str, optional): Column to summarize. Defaults to "value".
+        group_by (str, optional): Comma-separated columns to group by, e.g. "variable".
+                                  Empty summarizes all rows together.
+        filters (str, optional): Conditions applied first, as in query_result.
+
+    Returns:
+        dict: status and one row per group, or error message.
+    """
+    policy = get_output_policy()
+    result = policy.result_set(handle)
+    if result is None:
+        return _unknown_handle(handle)
+    try:
+        with phase("walk"):
+            result = result.filter(filters).aggregate(function, column, group_by)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error_message": f"Error aggregating result {handle}: {str(e)}"
+        }
+    with phase("report_build"):
+        return policy.rows_response(result, {"handle": handle}, f"{function} of {column}:\n")
+
+
+def _model_tool(async_tool, sync_tool):
+    """Returns async_tool under the name and docstring of sync_tool.
+
+    The model sees a tool's function name and docstring, so the async
+    implementations are registered as e.g. "get_observations" rather than
+    "get_observations_async", matching the instruction and the README.
+    """
+    @functools.wraps(async_tool)
+    async def tool(*args, **kwargs):
+        return await async_tool(*args, **kwargs)
+
+    tool.__name__ = tool.__qualname__ = sync_tool.__name__
+    tool.__doc__ = sync_tool.__doc__
+    return tool
+
+
 root_agent = Agent(
     name="datcom_agent",
     model="gemini-2.0-flash",
@@ -327,10 +1245,31 @@ root_agent = Agent(
     ),
     instruction=(
         "You are a helpful agent who can access Data Commons to provide information about "
-        "places. You can help "
+        "places. For a question about specific places and topics, get the place "
+        "observations in one call, passing the place names and the statvar DCIDs or short "
+        "descriptions of what to measure. Otherwise, you can help "
         "users find data about specific cities, states, and countries by first looking up "
         "their Data Commons IDs (DCIDs), retrieving available statistical variables (statvars) for the place, and "
-        "retrieving the observations for those variables and places."
+        "retrieving the observations for those variables and places. To find the right "
+        "statvar for a topic, search the known statvars by description. To compare all "
+        "places of a type within a place (e.g. every county in a state), fetch the child "
+        "place observations directly instead of looking up each child. For trends over "
+        "time, fetch the full observation series in one call instead of one call per year. "
+        "If a result says it was truncated, read the rest with get_more_output only if you "
+        "need it. If a result is stored under a handle, answer from its summary or use "
+        "query_result and aggregate_result on the handle instead of fetching it again."
     ),
-    tools=[get_place_dcids, get_available_variables, get_observations, get_population_count],
-)
\ No newline at end of file
+    # Async tools run on the event loop, so parallel function calls in one
+    # turn are awaited concurrently instead of blocking each other. The statvar
+    # search and the stored-result tools make no requests, so they stay synchronous.
+    tools=[_model_tool(get_place_observations_async, get_place_observations),
+           _model_tool(get_place_dcids_async, get_place_dcids),
+           _model_tool(get_available_variables_async, get_available_variables),
+           _model_tool(get_available_variables_page_async, get_available_variables_page),
+           search_statistical_variables,
+           _model_tool(get_observations_async, get_observations),
+           _model_tool(get_population_count_async, get_population_count),
+           _model_tool(get_observation_series_async, get_observation_series),
+           _model_tool(get_child_place_observations_async, get_child_place_observations),
+           get_more_output, query_result, aggregate_result],
+)
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import threading
+import time
+
+from .telemetry import add_phase
+
+DEFAULT_BATCH_MAX_CELLS = 5000
+
+
+class _Batch:
+    __slots__ = ("entities", "variables", "callers", "full", "done", "sent_at", "cells", "error",
+                 "fetch", "future", "timer")
+
+    def __init__(self):
+        # dicts as insertion-ordered sets
+        self.entities = {}
+        self.variables = {}
+        self.callers = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.sent_at = None
+        self.cells = None
+        self.error = None
+        self.fetch = None
+        self.future = None
+        self.timer = None
+
+    def cells_with(self, entities: list[str], variables: list[str]) -> int:
+        """Returns the size of the merged rectangle if entities and variables were added."""
+        merged_entities = len(self.entities) + sum(entity not in self.entities for entity in set(entities))
+        merged_variables = len(self.variables) + sum(variable not in self.variables for variable in set(variables))
+        return merged_entities * merged_variables
+
+    def add(self, entities: list[str], variables: list[str]):
+        self.entities.update(dict.fromkeys(entities))
+        self.variables.update(dict.fromkeys(variables))
+        self.callers += 1
+
+
+class ObservationBatcher:
+    """Merges concurrent observation fetches for the same date into one request.
+
+    The first fetch for a date opens a batch and holds it for `window_ms`;
+    fetches for the same date arriving in that window join it, and the batch
+    is then sent as one /observation request for the union of their
+    entities and variables. Every caller receives the merged cells and takes
+    its own slice. A batch is sent early once the merged rectangle reaches
+    `max_cells`, and a fetch that would push it past that starts a new batch
+    instead, so unrelated variable sets cannot blow up one request.
+
+    Time from joining a batch until it is sent is recorded as the
+    "batch_wait" phase of each caller's tool call.
+
+    Args:
+        window_ms (float, optional): How long a batch stays open. Defaults to
+                                     $DATCOM_BATCH_WINDOW_MS; 0 (the default)
+                                     disables batching.
+        max_cells (int, optional): Largest merged entity x variable rectangle.
+                                   Defaults to $DATCOM_BATCH_MAX_CELLS or 5000.
+    """
+
+    def __init__(self, window_ms: float = None, max_cells: int = None):
+        if window_ms is None:
+            window_ms = float(os.getenv("DATCOM_BATCH_WINDOW_MS", "0"))
+        self.window_s = window_ms / 1000
+        self.max_cells = max_cells or int(os.getenv("DATCOM_BATCH_MAX_CELLS", DEFAULT_BATCH_MAX_CELLS))
+        self._open = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "batches": 0, "merged": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0
+
+    def _join(self, key, entities: list[str], variables: list[str]) -> tuple[_Batch, bool]:
+        """Adds a fetch to the open batch for key, opening one if needed.
+
+        Returns:
+            tuple: The batch, and whether this caller opened it.
+        """
+        with self._lock:
+            self.counters["calls"] += 1
+            batch = self._open.get(key)
+            if batch is not None and batch.cells_with(entities, variables) > self.max_cells:
+                self._close(key, batch)
+                batch = None
+            opened = batch is None
+            if opened:
+                batch = self._open[key] = _Batch()
+                self.counters["batches"] += 1
+            else:
+                self.counters["merged"] += 1
+            batch.add(entities, variables)
+            if len(batch.entities) * len(batch.variables) >= self.max_cells:
+                self._close(key, batch)
+        return batch, opened
+
+    def _close(self, key, batch: _Batch):
+        """Stops a batch from taking new fetches and sends it now (lock held)."""
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.full.set()
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+            asyncio.get_running_loop().call_soon(self._send_async, key, batch)
+
+    def submit(self, date: str, entities: list[str], variables: list[str], fetch) -> dict:
+        """Fetches cells for entities x variables, possibly merged with other callers.
+
+        Args:
+            date (str): Observation date; only fetches for the same date merge.
+            entities (list[str]): Entity DCIDs to fetch.
+            variables (list[str]): Variable DCIDs to fetch.
+            fetch (callable): fetch(entities, variables) -> {(entity, variable): cell},
+                              called once per batch with the merged sets.
+
+        Returns:
+            dict: The batch's cells, a superset of this caller's; read-only.
+
+        Raises:
+            requests.exceptions.RequestException: If the batch's request fails.
+        """
+        if not self.enabled:
+            return fetch(entities, variables)
+        start = time.perf_counter()
+        batch, opened = self._join(date, entities, variables)
+        if not opened:
+            batch.done.wait()
+            add_phase("batch_wait", batch.sent_at - start)
+            if batch.error is not None:
+                raise batch.error
+            return batch.cells
+
+        batch.full.wait(self.window_s)
+        with self._lock:
+            if self._open.get(date) is batch:
+                del self._open[date]
+        batch.sent_at = time.perf_counter()
+        add_phase("batch_wait", batch.sent_at - start)
+        try:
+            batch.cells = fetch(list(batch.entities), list(batch.variables))
+            return batch.cells
+        except BaseException as e:
+            batch.error = e
+            raise
+        finally:
+            batch.done.set()
+
+    async def submit_async(self, date: str, entities: list[str], variables: list[str], fetch) -> dict:
+        """Async variant of submit; fetch is a coroutine function.
+
+        The batch is sent from a timer on the event loop rather than by one
+        of its callers, so cancelling a caller does not cancel the request
+        for the others.
+        """
+        if not self.enabled:
+            return await fetch(entities, variables)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        key = (loop, date)
+        batch, opened = self._join(key, entities, variables)
+        if opened:
+            batch.fetch = fetch
+            batch.future = loop.create_future()
+            batch.future.add_done_callback(_retrieve)
+            if batch.full.is_set():
+                loop.call_soon(self._send_async, key, batch)
+            else:
+                batch.timer = loop.call_later(self.window_s, self._send_async, key, batch)
+        cells = await asyncio.shield(batch.future)
+        add_phase("batch_wait", batch.sent_at - start)
+        return cells
+
+    def _send_async(self, key, batch: _Batch):
+        with self._lock:
+            if self._open.get(key) is batch:
+                del self._open[key]
+        batch.timer = None
+        batch.sent_at = time.perf_counter()
+        task = asyncio.get_running_loop().create_task(self._run_async(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_async(self, batch: _Batch):
+        try:
+            cells = await batch.fetch(list(batch.entities), list(batch.variables))
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            batch.future.set_exception(e)
+        else:
+            batch.future.set_result(cells)
+
+    def stats(self) -> dict:
+        """Returns calls, batches sent and calls merged into another caller's batch."""
+        with self._lock:
+            return dict(self.counters, open=len(self._open))
+
+
+def _retrieve(future: asyncio.Future):
+    # Mark the exception as retrieved in case every caller was cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_observation_batcher() -> ObservationBatcher:
+    """Returns the process-wide ObservationBatcher."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = ObservationBatcher()
+    return _batcher
+
+
+def set_observation_batcher(batcher: ObservationBatcher):
+    """Replaces the process-wide ObservationBatcher, e.g. to change the window."""
+    global _batcher
+    with _batcher_lock:
+        _batcher = batcher
@@ -0,0 +1,417 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "datcom_agent")
+
+# Place DCIDs practically never change, so resolved names are kept for a long
+# time; names that failed to resolve are retried sooner.
+DEFAULT_PLACE_TTL = 30 * 24 * 3600
+DEFAULT_PLACE_NEGATIVE_TTL = 24 * 3600
+
+DEFAULT_OBSERVATION_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_OBSERVATION_TTL = 6 * 3600
+DEFAULT_VARIABLE_LIST_CACHE_ENTRIES = 10000
+DEFAULT_SERIES_CACHE_BYTES = 64 * 1024 * 1024
+
+# Rough per-entry overhead of the OrderedDict slot, key tuple and cell dict
+_CELL_OVERHEAD_BYTES = 400
+
+# Returned by ObservationCache.get for cells that are not cached at all, as
+# opposed to None for cells cached as having no data
+MISSING = object()
+
+
+def normalize_place_name(name: str) -> str:
+    """Normalizes a place name for cache lookups ("  New  York " -> "new york")."""
+    return " ".join(name.split()).casefold()
+
+
+class PlaceCache:
+    """Persistent SQLite cache of place name -> DCID resolutions.
+
+    Entries survive process restarts. A DCID of None is a negative entry for a
+    name that Data Commons could not resolve. The child places of a parent
+    (e.g. the counties in a state) are kept too, per (parent, place type).
+
+    Args:
+        path (str, optional): SQLite file path, or ":memory:". Defaults to
+                              $DATCOM_CACHE_DIR/places.sqlite.
+        ttl (float, optional): Seconds a resolved name stays valid.
+        negative_ttl (float, optional): Seconds a negative entry stays valid.
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, negative_ttl: float = None):
+        if path is None:
+            cache_dir = os.getenv("DATCOM_CACHE_DIR", DEFAULT_CACHE_DIR)
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, "places.sqlite")
+        self.path = path
+        self.ttl = ttl if ttl is not None else float(os.getenv("DATCOM_PLACE_TTL", DEFAULT_PLACE_TTL))
+        self.negative_ttl = (negative_ttl if negative_ttl is not None
+                             else float(os.getenv("DATCOM_PLACE_NEGATIVE_TTL", DEFAULT_PLACE_NEGATIVE_TTL)))
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                " name TEXT PRIMARY KEY,"
+                " dcid TEXT,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS children ("
+                " parent TEXT NOT NULL,"
+                " place_type TEXT NOT NULL,"
+                " dcids TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (parent, place_type))"
+            )
+
+    def get_many(self, names: list[str], allow_expired: bool = False) -> dict:
+        """Looks up cached resolutions.
+
+        Args:
+            names (list[str]): Place names, in any form.
+            allow_expired (bool, optional): Also return expired entries, for
+                                            answering while the API is down.
+
+        Returns:
+            dict: original name -> DCID (or None for a negative entry) for every
+                  name with an unexpired entry. Misses are absent.
+        """
+        keys = {name: normalize_place_name(name) for name in names}
+        unique_keys = list(set(keys.values()))
+        if not unique_keys:
+            return {}
+        now = 0 if allow_expired else time.time()
+        placeholders = ",".join("?" * len(unique_keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name, dcid FROM places WHERE expires_at > ? AND name IN ({placeholders})",
+                [now] + unique_keys,
+            ).fetchall()
+        found = dict(rows)
+        return {name: found[key] for name, key in keys.items() if key in found}
+
+    def put_many(self, resolved: dict):
+        """Stores resolutions.
+
+        Args:
+            resolved (dict): place name -> DCID, or None for names that did not resolve.
+        """
+        now = time.time()
+        rows = [
+            (normalize_place_name(name), dcid,
+             now + (self.ttl if dcid is not None else self.negative_ttl))
+            for name, dcid in resolved.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO places (name, dcid, expires_at) VALUES (?, ?, ?)", rows)
+
+    def get_children(self, parent: str, place_type: str, allow_expired: bool = False):
+        """Returns the cached child place DCIDs of a parent, or None on a miss."""
+        now = 0 if allow_expired else time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dcids FROM children WHERE parent = ? AND place_type = ?"
+                " AND expires_at > ?", (parent, place_type, now)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_children(self, parent: str, place_type: str, dcids: list[str]):
+        """Stores the child place DCIDs of a parent."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO children (parent, place_type, dcids, expires_at)"
+                " VALUES (?, ?, ?, ?)", (parent, place_type, json.dumps(dcids), time.time() + self.ttl))
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM places")
+            self._conn.execute("DELETE FROM children")
+
+
+class ObservationCache:
+    """In-memory LRU cache of single observation cells with a byte budget.
+
+    Cells are keyed by (entity, variable, date, facet) where facet "" is the
+    preferred (first ordered) facet. A cell holds {"value", "date"}, or None
+    when Data Commons has no observation for it, so that empty cells are not
+    fetched again.
+
+    Args:
+        max_bytes (int, optional): Approximate memory budget. Least recently
+                                   used cells are evicted beyond it.
+        ttl (float, optional): Seconds a cell stays valid.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: float = None):
+        self.max_bytes = max_bytes or int(os.getenv("DATCOM_OBSERVATION_CACHE_BYTES",
+                                                    DEFAULT_OBSERVATION_CACHE_BYTES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("DATCOM_OBSERVATION_TTL",
+                                                               DEFAULT_OBSERVATION_TTL))
+        self._cells = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(key: tuple, cell) -> int:
+        size = _CELL_OVERHEAD_BYTES + sum(len(part) for part in key)
+        if cell is not None:
+            size += len(str(cell.get("date")))
+        return size
+
+    def get(self, entity: str, variable: str, date: str, facet: str = "", allow_expired: bool = False):
+        """Returns the cached cell, None for a cached empty cell, or MISSING.
+
+        Expired cells count as MISSING unless allow_expired is set.
+        """
+        key = (entity, variable, date, facet)
+        with self._lock:
+            entry = self._cells.get(key)
+            if entry is None or (entry[1] <= time.time() and not allow_expired):
+                self.misses += 1
+                return MISSING
+            self._cells.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, entity: str, variable: str, date: str, cell, facet: str = ""):
+        """Stores a cell ({"value", "date"} or None for no data)."""
+        key = (entity, variable, date, facet)
+        size = self._size(key, cell)
+        with self._lock:
+            old = self._cells.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._cells[key] = (cell, time.time() + self.ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._cells:
+                _, evicted = self._cells.popitem(last=False)
+                self._bytes -= evicted[2]
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        with self._lock:
+            return {"cells": len(self._cells), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """Removes every cell."""
+        with self._lock:
+            self._cells.clear()
+            self._bytes = 0
+
+
+class SeriesCache:
+    """In-memory LRU cache of full time series with a byte budget.
+
+    Series are keyed by (entity, variable) and hold a TimeSeries, or None
+    when Data Commons has no observations for the pair.
+
+    Args:
+        max_bytes (int, optional): Approximate memory budget.
+        ttl (float, optional): Seconds a series stays valid.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: float = None):
+        self.max_bytes = max_bytes or int(os.getenv("DATCOM_SERIES_CACHE_BYTES",
+                                                    DEFAULT_SERIES_CACHE_BYTES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("DATCOM_OBSERVATION_TTL",
+                                                               DEFAULT_OBSERVATION_TTL))
+        self._series = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, entity: str, variable: str, allow_expired: bool = False):
+        """Returns the cached TimeSeries, None for a series with no data, or MISSING."""
+        key = (entity, variable)
+        with self._lock:
+            entry = self._series.get(key)
+            if entry is None or (entry[1] <= time.time() and not allow_expired):
+                self.misses += 1
+                return MISSING
+            self._series.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, entity: str, variable: str, series):
+        """Stores a TimeSeries (or None for no data)."""
+        key = (entity, variable)
+        size = _CELL_OVERHEAD_BYTES + len(entity) + len(variable)
+        if series is not None:
+            size += series.nbytes()
+        with self._lock:
+            old = self._series.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._series[key] = (series, time.time() + self.ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._series:
+                _, evicted = self._series.popitem(last=False)
+                self._bytes -= evicted[2]
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        with self._lock:
+            return {"series": len(self._series), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """Removes every series."""
+        with self._lock:
+            self._series.clear()
+            self._bytes = 0
+
+
+class VariableListCache:
+    """In-memory LRU cache of the variables with data for each entity.
+
+    A listing fetched with a limit is only a prefix of the full list, so
+    each entry remembers whether it is complete (shorter than the limit it
+    was fetched with). Lookups with a larger limit than a truncated entry
+    holds are misses.
+
+    Args:
+        max_entries (int, optional): Entities to keep; least recently used
+                                     entries are evicted beyond it.
+        ttl (float, optional): Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self.max_entries = max_entries or int(os.getenv("DATCOM_VARIABLE_LIST_CACHE_ENTRIES",
+                                                        DEFAULT_VARIABLE_LIST_CACHE_ENTRIES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("DATCOM_OBSERVATION_TTL",
+                                                               DEFAULT_OBSERVATION_TTL))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, entity: str, limit: int = None):
+        """Returns up to `limit` cached variables for an entity, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(entity)
+            if (entry is None or entry[2] <= time.time()
+                    or not (entry[1] or (limit is not None and len(entry[0]) >= limit))):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entity)
+            self.hits += 1
+            return entry[0][:limit]
+
+    def put(self, entity: str, variables: list[str], limit: int = None):
+        """Stores the listing fetched for an entity with the given limit."""
+        complete = limit is None or len(variables) < limit
+        with self._lock:
+            old = self._entries.get(entity)
+            # Keep a longer listing already cached rather than a shorter prefix
+            if (not complete and old is not None and old[2] > time.time()
+                    and (old[1] or len(old[0]) > len(variables))):
+                return
+            self._entries[entity] = (list(variables), complete, time.time() + self.ttl)
+            self._entries.move_to_end(entity)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def variables(self) -> set[str]:
+        """Returns every variable DCID in any cached listing."""
+        with self._lock:
+            return {variable for entry in self._entries.values() for variable in entry[0]}
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+_place_cache = None
+_cache_lock = threading.Lock()
+_observation_cache = None
+_variable_list_cache = None
+_series_cache = None
+
+
+def get_place_cache() -> PlaceCache:
+    """Returns the process-wide PlaceCache, creating it on first use."""
+    global _place_cache
+    if _place_cache is None:
+        with _cache_lock:
+            if _place_cache is None:
+                _place_cache = PlaceCache()
+    return _place_cache
+
+
+def set_place_cache(cache: PlaceCache):
+    """Replaces the shared PlaceCache, e.g. with an in-memory one."""
+    global _place_cache
+    with _cache_lock:
+        _place_cache = cache
+
+
+def get_observation_cache() -> ObservationCache:
+    """Returns the process-wide ObservationCache, creating it on first use."""
+    global _observation_cache
+    if _observation_cache is None:
+        with _cache_lock:
+            if _observation_cache is None:
+                _observation_cache = ObservationCache()
+    return _observation_cache
+
+
+def set_observation_cache(cache: ObservationCache):
+    """Replaces the shared ObservationCache."""
+    global _observation_cache
+    with _cache_lock:
+        _observation_cache = cache
+
+
+def get_variable_list_cache() -> VariableListCache:
+    """Returns the process-wide VariableListCache, creating it on first use."""
+    global _variable_list_cache
+    if _variable_list_cache is None:
+        with _cache_lock:
+            if _variable_list_cache is None:
+                _variable_list_cache = VariableListCache()
+    return _variable_list_cache
+
+
+def set_variable_list_cache(cache: VariableListCache):
+    """Replaces the shared VariableListCache."""
+    global _variable_list_cache
+    with _cache_lock:
+        _variable_list_cache = cache
+
+
+def get_series_cache() -> SeriesCache:
+    """Returns the process-wide SeriesCache, creating it on first use."""
+    global _series_cache
+    if _series_cache is None:
+        with _cache_lock:
+            if _series_cache is None:
+                _series_cache = SeriesCache()
+    return _series_cache
+
+
+def set_series_cache(cache: SeriesCache):
+    """Replaces the shared SeriesCache."""
+    global _series_cache
+    with _cache_lock:
+        _series_cache = cache
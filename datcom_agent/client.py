@@ -0,0 +1,402 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import get_rate_limiter
+from .resilience import get_circuit_breaker, get_resilience_policy
+from .singleflight import AsyncSingleFlight, SingleFlight, request_key
+from .telemetry import add_phase, phase, record_response
+
+DEFAULT_BASE_URL = "https://api.datacommons.org/v2"
+
+# (connect, read) timeouts in seconds, per Data Commons endpoint
+DEFAULT_TIMEOUTS = {
+    "resolve": (3.05, 10),
+    "observation": (3.05, 30),
+}
+DEFAULT_TIMEOUT = (3.05, 30)
+
+
+class _ClientConfig:
+    """Settings shared by the sync and async Data Commons clients."""
+
+    def __init__(self, base_url: str = None, api_key: str = None,
+                 pool_size: int = None, timeouts: dict = None):
+        self.base_url = (base_url or os.getenv("DATCOM_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("DATCOM_API_KEY")
+        self.pool_size = pool_size or int(os.getenv("DATCOM_POOL_SIZE", "10"))
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.resilience = get_resilience_policy()
+        self.breaker = get_circuit_breaker()
+
+    def timeout_for(self, endpoint: str):
+        """Returns the (connect, read) timeout for an endpoint."""
+        return self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+
+    def deadline_for(self, endpoint: str) -> float:
+        """Returns the longest one attempt at an endpoint may take, in seconds."""
+        connect, read = self.timeout_for(endpoint)
+        return connect + read
+
+    def url_for(self, endpoint: str) -> str:
+        """Returns the full URL for an endpoint such as "observation"."""
+        return f"{self.base_url}/{endpoint}"
+
+    def _with_key(self, params) -> list:
+        if isinstance(params, dict):
+            params = _expand_params(params)
+        return [("key", self.api_key)] + list(params)
+
+
+class DataCommonsClient(_ClientConfig):
+    """Long-lived Data Commons API v2 client with a keep-alive connection pool.
+
+    A single client is shared by all agent tools so that repeated tool calls
+    reuse the same TCP+TLS connections instead of opening new ones.
+
+    Args:
+        base_url (str, optional): API base URL. Defaults to $DATCOM_BASE_URL or
+                                  the public Data Commons v2 endpoint.
+        api_key (str, optional): API key. Defaults to $DATCOM_API_KEY.
+        pool_size (int, optional): Maximum number of keep-alive connections per
+                                   host. Defaults to $DATCOM_POOL_SIZE or 10.
+        timeouts (dict, optional): Per-endpoint (connect, read) timeouts,
+                                   merged over DEFAULT_TIMEOUTS.
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None,
+                 pool_size: int = None, timeouts: dict = None):
+        super().__init__(base_url, api_key, pool_size, timeouts)
+
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                    pool_maxsize=self.pool_size,
+                                    pool_block=False)
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests_by_endpoint = {}
+        self._flights = SingleFlight()
+
+    def get(self, endpoint: str, params) -> dict:
+        """Sends a GET request to an endpoint and returns the decoded JSON body.
+
+        Args:
+            endpoint (str): Endpoint name relative to the base URL, e.g. "resolve".
+            params (dict | list[tuple]): Query parameters. The API key is added
+                                         automatically. Use a list of tuples to
+                                         repeat a parameter.
+
+        Returns:
+            dict: Decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: On connection or HTTP errors.
+        """
+        return self.request("GET", endpoint, params=params)
+
+    def post(self, endpoint: str, body: dict) -> dict:
+        """Sends a JSON POST request to an endpoint and returns the decoded JSON body.
+
+        Args:
+            endpoint (str): Endpoint name relative to the base URL, e.g. "observation".
+            body (dict): JSON request body. The API key is sent as a query parameter.
+
+        Returns:
+            dict: Decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: On connection or HTTP errors.
+        """
+        return self.request("POST", endpoint, body=body)
+
+    def request(self, method: str, endpoint: str, params=None, body: dict = None) -> dict:
+        """Sends a request through the shared session. See get and post.
+
+        Transient failures are retried and slow attempts hedged according to
+        the client's ResiliencePolicy, and requests fail fast with
+        CircuitOpenError while the endpoint's circuit breaker is open.
+        Identical requests made concurrently from several threads share one
+        upstream call and the same decoded result, which must not be modified.
+
+        A rate-limit token is taken once per request, before the breaker and
+        retries, so time queued for it never counts against the attempt
+        deadline, the hedge delay or the breaker's slow-call threshold.
+        """
+        def send():
+            get_rate_limiter().acquire(endpoint)
+            return self.breaker.call(endpoint, lambda: self.resilience.call(
+                endpoint, lambda: self._send(method, endpoint, params, body),
+                self.deadline_for(endpoint)))
+
+        return self._flights.do(request_key(method, endpoint, params, body), send)
+
+    def _send(self, method: str, endpoint: str, params, body: dict) -> dict:
+        with phase("http_wait"):
+            response = self._session.request(method, self.url_for(endpoint),
+                                             params=self._with_key(params or []), json=body,
+                                             timeout=self.timeout_for(endpoint))
+        self._count(endpoint)
+        record_response(len(response.content))
+        response.raise_for_status()
+        with phase("decode"):
+            return response.json()
+
+    def stream(self, method: str, endpoint: str, params=None, body: dict = None,
+               chunk_size: int = 64 * 1024):
+        """Sends a request and yields the raw response body in chunks.
+
+        Closing the generator early closes the response, so the rest of the
+        body is never downloaded (the connection is then not reused).
+
+        Raises:
+            requests.exceptions.RequestException: On connection or HTTP errors.
+        """
+        def open_response():
+            with phase("http_wait"):
+                response = self._session.request(method, self.url_for(endpoint),
+                                                 params=self._with_key(params or []), json=body,
+                                                 timeout=self.timeout_for(endpoint), stream=True)
+            self._count(endpoint)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+            return response
+
+        # Retry opening the response, but never hedge: a losing hedge would
+        # leave a second streamed response open
+        get_rate_limiter().acquire(endpoint)
+        response = self.breaker.call(endpoint, lambda: self.resilience.call(
+            endpoint, open_response, self.deadline_for(endpoint), hedge=False,
+            discard=lambda abandoned: abandoned.close()))
+        received = 0
+        try:
+            chunks = response.iter_content(chunk_size)
+            while True:
+                with phase("http_wait"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                received += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+            record_response(received)
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self._requests_by_endpoint[endpoint] = self._requests_by_endpoint.get(endpoint, 0) + 1
+
+    def stats(self) -> dict:
+        """Returns request and connection-reuse counters for this client.
+
+        Returns:
+            dict: requests per endpoint, total HTTP requests sent over the pool,
+                  connections opened, and how many requests reused a connection.
+        """
+        sent = 0
+        opened = 0
+        # urllib3 pools keep their own request/connection counters
+        for pool in list(self._adapter.poolmanager.pools._container.values()):
+            sent += pool.num_requests
+            opened += pool.num_connections
+        with self._lock:
+            by_endpoint = dict(self._requests_by_endpoint)
+        return {
+            "requests_by_endpoint": by_endpoint,
+            "http_requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(sent - opened, 0),
+            "coalesced_requests": self._flights.stats()["coalesced"],
+        }
+
+    def close(self):
+        """Closes all pooled connections."""
+        self._session.close()
+
+
+class AsyncDataCommonsClient(_ClientConfig):
+    """Asyncio Data Commons API v2 client backed by a pooled httpx.AsyncClient.
+
+    Takes the same settings as DataCommonsClient. HTTP errors are raised as
+    requests exceptions so sync and async tools handle failures the same way.
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None,
+                 pool_size: int = None, timeouts: dict = None):
+        super().__init__(base_url, api_key, pool_size, timeouts)
+
+        limits = httpx.Limits(max_connections=self.pool_size,
+                              max_keepalive_connections=self.pool_size)
+        self._client = httpx.AsyncClient(limits=limits)
+        self._requests_by_endpoint = {}
+        self._flights = AsyncSingleFlight()
+
+    async def get(self, endpoint: str, params) -> dict:
+        """Sends a GET request to an endpoint and returns the decoded JSON body.
+
+        Args:
+            endpoint (str): Endpoint name relative to the base URL, e.g. "resolve".
+            params (dict | list[tuple]): Query parameters, as for DataCommonsClient.get.
+
+        Returns:
+            dict: Decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: On connection or HTTP errors.
+        """
+        return await self.request("GET", endpoint, params=params)
+
+    async def post(self, endpoint: str, body: dict) -> dict:
+        """Sends a JSON POST request to an endpoint, as for DataCommonsClient.post."""
+        return await self.request("POST", endpoint, body=body)
+
+    async def request(self, method: str, endpoint: str, params=None, body: dict = None) -> dict:
+        """Sends a request through the shared httpx client. See get and post.
+
+        Identical concurrent requests on this event loop share one upstream
+        call. As in DataCommonsClient.request, the rate-limit token is taken
+        once, outside the retry and breaker accounting.
+        """
+        async def send():
+            await get_rate_limiter().acquire_async(endpoint)
+            return await self.breaker.call_async(endpoint, lambda: self.resilience.call_async(
+                endpoint, lambda: self._send(method, endpoint, params, body),
+                self.deadline_for(endpoint)))
+
+        return await self._flights.do(request_key(method, endpoint, params, body), send)
+
+    async def _send(self, method: str, endpoint: str, params, body: dict) -> dict:
+        connect, read = self.timeout_for(endpoint)
+
+        try:
+            with phase("http_wait"):
+                response = await self._client.request(
+                    method, self.url_for(endpoint), params=self._with_key(params or []), json=body,
+                    timeout=httpx.Timeout(read, connect=connect))
+            self._requests_by_endpoint[endpoint] = self._requests_by_endpoint.get(endpoint, 0) + 1
+            record_response(len(response.content))
+            response.raise_for_status()
+            with phase("decode"):
+                return response.json()
+        except httpx.HTTPError as e:
+            raise _to_requests_error(e) from e
+
+    async def stream(self, method: str, endpoint: str, params=None, body: dict = None,
+                     chunk_size: int = 64 * 1024):
+        """Async variant of DataCommonsClient.stream.
+
+        Use contextlib.aclosing when stopping early so the response is closed.
+        """
+        connect, read = self.timeout_for(endpoint)
+
+        async def open_response():
+            request = self._client.build_request(
+                method, self.url_for(endpoint), params=self._with_key(params or []), json=body,
+                timeout=httpx.Timeout(read, connect=connect))
+            try:
+                with phase("http_wait"):
+                    response = await self._client.send(request, stream=True)
+                self._requests_by_endpoint[endpoint] = self._requests_by_endpoint.get(endpoint, 0) + 1
+                if response.is_error:
+                    await response.aclose()
+                response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                raise _to_requests_error(e) from e
+
+        await get_rate_limiter().acquire_async(endpoint)
+        response = await self.breaker.call_async(endpoint, lambda: self.resilience.call_async(
+            endpoint, open_response, self.deadline_for(endpoint), hedge=False))
+        received = 0
+        try:
+            start = time.perf_counter()
+            async for chunk in response.aiter_bytes(chunk_size):
+                add_phase("http_wait", time.perf_counter() - start)
+                received += len(chunk)
+                yield chunk
+                start = time.perf_counter()
+        except httpx.HTTPError as e:
+            raise _to_requests_error(e) from e
+        finally:
+            await response.aclose()
+            record_response(received)
+
+    def stats(self) -> dict:
+        """Returns request counters for this client."""
+        return {"requests_by_endpoint": dict(self._requests_by_endpoint),
+                "coalesced_requests": self._flights.stats()["coalesced"]}
+
+    async def aclose(self):
+        """Closes all pooled connections."""
+        await self._client.aclose()
+
+
+def _expand_params(params: dict) -> list:
+    # Flatten list values into repeated (key, value) pairs
+    expanded = []
+    for key, value in params.items():
+        if isinstance(value, (list, tuple)):
+            expanded += [(key, item) for item in value]
+        else:
+            expanded.append((key, value))
+    return expanded
+
+
+def _to_requests_error(error: httpx.HTTPError) -> requests.exceptions.RequestException:
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(error))
+    if isinstance(error, httpx.HTTPStatusError):
+        # Keep the status code so retry decisions match the sync client
+        response = requests.Response()
+        response.status_code = error.response.status_code
+        return requests.exceptions.HTTPError(str(error), response=response)
+    if isinstance(error, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(error))
+    return requests.exceptions.RequestException(str(error))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# httpx connection pools belong to the event loop that created them, so keep
+# one async client per running loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> DataCommonsClient:
+    """Returns the process-wide shared DataCommonsClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DataCommonsClient()
+    return _client
+
+
+def set_client(client: DataCommonsClient):
+    """Replaces the shared client, e.g. to point the tools at another base URL."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def get_async_client() -> AsyncDataCommonsClient:
+    """Returns the shared AsyncDataCommonsClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncDataCommonsClient()
+        _async_clients[loop] = client
+    return client
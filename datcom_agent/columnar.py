@@ -0,0 +1,137 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for columnar results
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is only needed for to_arrow
+    pa = None
+
+
+def numpy_available() -> bool:
+    """Returns whether numpy is installed, so ObservationTable can be used."""
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Columnar observation results require numpy: pip install numpy")
+
+
+def _plain(value) -> float:
+    # Keep integer counts as ints in reports, like the API returns them
+    return int(value) if value.is_integer() else float(value)
+
+
+class ObservationTable:
+    """Columnar place x variable observations.
+
+    Values live in a float64 matrix of shape (len(entities), len(variables)),
+    stored column-major so each variable is one contiguous array. Cells with
+    no observation hold NaN and are True in `missing`. `dates` holds the
+    observation date of each cell ("" when missing).
+
+    Attributes:
+        entities (list[str]): Row labels (place DCIDs).
+        variables (list[str]): Column labels (statistical variable DCIDs).
+        values (numpy.ndarray): float64 values, NaN where missing.
+        missing (numpy.ndarray): bool mask of cells without an observation.
+        dates (numpy.ndarray): str observation dates.
+    """
+
+    def __init__(self, entities: list[str], variables: list[str], values, missing, dates):
+        self.entities = list(entities)
+        self.variables = list(variables)
+        self.values = values
+        self.missing = missing
+        self.dates = dates
+
+    @classmethod
+    def from_cells(cls, cells: dict, entities: list[str], variables: list[str]) -> "ObservationTable":
+        """Builds a table from {(entity, variable): {"value", "date"} or None} cells."""
+        _require_numpy()
+        shape = (len(entities), len(variables))
+        values = np.full(shape, np.nan, dtype=np.float64, order="F")
+        dates = np.full(shape, "", dtype=object, order="F")
+        for i, entity in enumerate(entities):
+            for j, variable in enumerate(variables):
+                cell = cells.get((entity, variable))
+                if cell is not None and cell.get("value") is not None:
+                    values[i, j] = cell["value"]
+                    dates[i, j] = cell.get("date") or ""
+        return cls(entities, variables, values, np.isnan(values), dates)
+
+    @classmethod
+    def from_observations(cls, result: dict, entities: list[str] = None,
+                          variables: list[str] = None) -> "ObservationTable":
+        """Builds a table from a result[entity][variable] = {"value", "date"} dict."""
+        if entities is None:
+            entities = list(result)
+        if variables is None:
+            variables = list(dict.fromkeys(v for row in result.values() for v in row))
+        cells = {(entity, variable): cell
+                 for entity, row in result.items() for variable, cell in row.items()}
+        return cls.from_cells(cells, entities, variables)
+
+    def column(self, variable: str):
+        """Returns one variable's values as a contiguous view (no copy)."""
+        return self.values[:, self.variables.index(variable)]
+
+    def to_numpy(self) -> dict:
+        """Returns the underlying arrays without copying.
+
+        Returns:
+            dict: entities and variables (str arrays) plus the values, missing
+                  and dates matrices.
+        """
+        return {
+            "entities": np.asarray(self.entities),
+            "variables": np.asarray(self.variables),
+            "values": self.values,
+            "missing": self.missing,
+            "dates": self.dates,
+        }
+
+    def to_arrow(self, include_dates: bool = False):
+        """Returns a pyarrow.Table with an "entity" column and one float64 column per variable.
+
+        Value columns wrap the numpy buffers without copying; missing cells are
+        NaN. With include_dates, a "<variable>:date" string column follows each
+        value column (dates are copied).
+        """
+        if pa is None:
+            raise ImportError("Arrow export requires pyarrow: pip install pyarrow")
+        columns = {"entity": pa.array(self.entities, type=pa.string())}
+        for j, variable in enumerate(self.variables):
+            columns[variable] = pa.array(self.values[:, j])
+            if include_dates:
+                columns[f"{variable}:date"] = pa.array(self.dates[:, j].tolist(), type=pa.string())
+        return pa.table(columns)
+
+    def to_observations(self) -> dict:
+        """Returns the result[entity][variable] = {"value", "date"} dicts used by the tools."""
+        result = {}
+        for i, entity in enumerate(self.entities):
+            for j, variable in enumerate(self.variables):
+                if not self.missing[i, j]:
+                    result.setdefault(entity, {})[variable] = {
+                        "value": _plain(self.values[i, j]),
+                        "date": self.dates[i, j],
+                    }
+        return result
+
+    def to_columns(self) -> dict:
+        """Returns the table as JSON-serializable lists, one row per entity.
+
+        Returns:
+            dict: entities, variables, and values and dates matrices as nested
+                  lists with None where missing.
+        """
+        values, dates = [], []
+        for i in range(len(self.entities)):
+            missing = self.missing[i].tolist()
+            values.append([None if missing[j] else _plain(value)
+                           for j, value in enumerate(self.values[i].tolist())])
+            dates.append([None if missing[j] else date for j, date in enumerate(self.dates[i].tolist())])
+        return {"entities": self.entities, "variables": self.variables, "values": values, "dates": dates}
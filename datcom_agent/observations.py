@@ -0,0 +1,562 @@
+from contextlib import aclosing, closing
+
+from .batching import get_observation_batcher
+from .cache import (MISSING, get_observation_cache, get_place_cache, get_series_cache,
+                    get_variable_list_cache)
+from .client import get_async_client, get_client
+from .columnar import ObservationTable
+from .planner import (get_observation_batched, get_observation_batched_async,
+                      map_batches, map_batches_async, plan_expression_request, plan_requests)
+from .search import get_statvar_index
+from .store import get_local_store
+from .streaming import VariableListingScanner, stream_stats
+from .telemetry import phase, record
+from .timeseries import TimeSeries, extract_series
+
+VALUE_SELECT = [("select", "entity"), ("select", "variable"),
+                ("select", "value"), ("select", "date")]
+VARIABLE_SELECT = [("select", "entity"), ("select", "variable")]
+# Variables per /node name request, keeping the GET URL short
+NAME_BATCH_SIZE = 50
+
+
+def extract_observations(data: dict) -> dict:
+    """Walks an /observation response into result[entity][variable] = {"value", "date"}."""
+    result = {}
+
+    # Check if we have any variable data in the response
+    if "byVariable" in data:
+        for variable_dcid, variable_data in data["byVariable"].items():
+            if "byEntity" in variable_data:
+                for entity_dcid, entity_data in variable_data["byEntity"].items():
+                    if "orderedFacets" in entity_data and entity_data["orderedFacets"]:
+                        # Get the most recent observation from the first facet
+                        # (Different facets represent different data sources)
+                        facet = entity_data["orderedFacets"][0]
+
+                        if "observations" in facet and facet["observations"]:
+                            # Get the value and its date
+                            obs = facet["observations"][0]
+
+                            # Initialize result structure if needed
+                            if entity_dcid not in result:
+                                result[entity_dcid] = {}
+
+                            result[entity_dcid][variable_dcid] = {
+                                "value": obs.get("value"),
+                                "date": obs.get("date")
+                            }
+
+    return result
+
+
+def _plan(entities: list[str], variables: list[str], date: str,
+          allow_expired: bool = False) -> tuple[dict, list[str], list[str]]:
+    """Splits a request into cached cells and the sub-rectangle still to fetch.
+
+    Cells are read from the local observation store first, then from the
+    observation cache (including expired cells if allow_expired is set).
+
+    Returns:
+        tuple: cached cells as {(entity, variable): cell}, and the entities and
+               variables that have at least one uncached cell.
+    """
+    cache = get_observation_cache()
+    store = get_local_store()
+    cached = {}
+    # dicts as insertion-ordered sets
+    missing_entities = {}
+    missing_variables = {}
+    for entity in entities:
+        for variable in variables:
+            cell = store.get(entity, variable, date) if len(store) else None
+            if cell is None:
+                cell = cache.get(entity, variable, date, allow_expired=allow_expired)
+            if cell is MISSING:
+                missing_entities[entity] = None
+                missing_variables[variable] = None
+            else:
+                cached[(entity, variable)] = cell
+    return cached, list(missing_entities), list(missing_variables)
+
+
+def _store(cells: dict, entities: list[str], variables: list[str], date: str, data: dict):
+    """Caches every fetched cell, including empty ones, and adds them to cells."""
+    cache = get_observation_cache()
+    with phase("walk"):
+        fetched = extract_observations(data)
+    for entity in entities:
+        for variable in variables:
+            cell = fetched.get(entity, {}).get(variable)
+            cache.put(entity, variable, date, cell)
+            cells[(entity, variable)] = cell
+
+
+def _assemble(cells: dict, entities: list[str], variables: list[str]) -> dict:
+    """Builds result[entity][variable] in request order, skipping empty cells."""
+    result = {}
+    for entity in entities:
+        for variable in variables:
+            cell = cells.get((entity, variable))
+            if cell is not None:
+                result.setdefault(entity, {})[variable] = cell
+    return result
+
+
+def _take(cells: dict, fetched: dict, entities: list[str], variables: list[str]):
+    """Copies this caller's slice of a (possibly merged) fetch into cells."""
+    for entity in entities:
+        for variable in variables:
+            cells[(entity, variable)] = fetched.get((entity, variable))
+
+
+def _fetch_missing(entities: list[str], variables: list[str], date: str) -> dict:
+    data = get_observation_batched(entities, variables, [("date", date)], VALUE_SELECT)
+    fetched = {}
+    _store(fetched, entities, variables, date, data)
+    return fetched
+
+
+async def _fetch_missing_async(entities: list[str], variables: list[str], date: str) -> dict:
+    data = await get_observation_batched_async(entities, variables, [("date", date)], VALUE_SELECT)
+    fetched = {}
+    _store(fetched, entities, variables, date, data)
+    return fetched
+
+
+def _fetch_cells(entities: list[str], variables: list[str], date: str) -> dict:
+    record(entities=len(entities), variables=len(variables))
+    cells, missing_entities, missing_variables = _plan(entities, variables, date)
+    if missing_entities:
+        fetched = get_observation_batcher().submit(
+            date, missing_entities, missing_variables,
+            lambda batch_entities, batch_variables: _fetch_missing(batch_entities, batch_variables, date))
+        _take(cells, fetched, missing_entities, missing_variables)
+    return cells
+
+
+async def _fetch_cells_async(entities: list[str], variables: list[str], date: str) -> dict:
+    record(entities=len(entities), variables=len(variables))
+    cells, missing_entities, missing_variables = _plan(entities, variables, date)
+    if missing_entities:
+        fetched = await get_observation_batcher().submit_async(
+            date, missing_entities, missing_variables,
+            lambda batch_entities, batch_variables: _fetch_missing_async(batch_entities, batch_variables, date))
+        _take(cells, fetched, missing_entities, missing_variables)
+    return cells
+
+
+def fetch_observations(entities: list[str], variables: list[str], date: str = "LATEST") -> dict:
+    """Fetches observations, requesting only cells that are not already cached.
+
+    Args:
+        entities (list[str]): Place DCIDs.
+        variables (list[str]): Statistical variable DCIDs.
+        date (str, optional): "LATEST" or a specific date. Defaults to "LATEST".
+
+    Returns:
+        dict: result[entity][variable] = {"value", "date"}.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    cells = _fetch_cells(entities, variables, date)
+    with phase("walk"):
+        return _assemble(cells, entities, variables)
+
+
+async def fetch_observations_async(entities: list[str], variables: list[str], date: str = "LATEST") -> dict:
+    """Async variant of fetch_observations."""
+    cells = await _fetch_cells_async(entities, variables, date)
+    with phase("walk"):
+        return _assemble(cells, entities, variables)
+
+
+def cached_observations(entities: list[str], variables: list[str], date: str = "LATEST") -> dict:
+    """Returns whatever the local store and observation cache hold, without any request.
+
+    Expired cached cells are included, so the result may be out of date. Used
+    to answer while the Data Commons circuit breaker is open.
+
+    Returns:
+        dict: result[entity][variable] = {"value", "date"} for the cells available.
+    """
+    cells, _, _ = _plan(entities, variables, date, allow_expired=True)
+    return _assemble(cells, entities, variables)
+
+
+def _plan_series(entities: list[str], variables: list[str],
+                 allow_expired: bool = False) -> tuple[dict, list[str], list[str]]:
+    """Like _plan, for full time series from the local store and series cache."""
+    cache = get_series_cache()
+    store = get_local_store()
+    cached = {}
+    missing_entities = {}
+    missing_variables = {}
+    for entity in entities:
+        for variable in variables:
+            stored = store.series(entity, variable) if len(store) else None
+            if stored is not None:
+                series = TimeSeries(*stored)
+            else:
+                series = cache.get(entity, variable, allow_expired=allow_expired)
+            if series is MISSING:
+                missing_entities[entity] = None
+                missing_variables[variable] = None
+            else:
+                cached[(entity, variable)] = series
+    return cached, list(missing_entities), list(missing_variables)
+
+
+def _store_series(series: dict, entities: list[str], variables: list[str], data: dict):
+    """Caches every fetched series, including empty ones, and adds them to series.
+
+    The newest point of each series also fills the "LATEST" observation cell.
+    """
+    cache = get_series_cache()
+    cell_cache = get_observation_cache()
+    with phase("walk"):
+        fetched = extract_series(data)
+    for entity in entities:
+        for variable in variables:
+            found = fetched.get(entity, {}).get(variable)
+            cache.put(entity, variable, found)
+            cell_cache.put(entity, variable, "LATEST", found.latest() if found else None)
+            series[(entity, variable)] = found
+
+
+def _assemble_series(series: dict, entities: list[str], variables: list[str],
+                     start: str, end: str) -> dict:
+    """Builds result[entity][variable] = TimeSeries sliced to [start, end], skipping empty ones."""
+    result = {}
+    for entity in entities:
+        for variable in variables:
+            found = series.get((entity, variable))
+            if found is not None:
+                found = found.slice(start, end)
+                if len(found):
+                    result.setdefault(entity, {})[variable] = found
+    return result
+
+
+def fetch_series(entities: list[str], variables: list[str], start: str = None, end: str = None) -> dict:
+    """Fetches the full time series of every place x variable pair.
+
+    All dates are requested at once (date=""), only for series that are not
+    already in the local store or series cache, and each series is kept as
+    compact date and value arrays so later trend questions are served
+    locally.
+
+    Args:
+        entities (list[str]): Place DCIDs.
+        variables (list[str]): Statistical variable DCIDs.
+        start (str, optional): First date to return, e.g. "2015". Inclusive.
+        end (str, optional): Last date to return, e.g. "2020". Inclusive.
+
+    Returns:
+        dict: result[entity][variable] = TimeSeries.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    record(entities=len(entities), variables=len(variables))
+    series, missing_entities, missing_variables = _plan_series(entities, variables)
+    if missing_entities:
+        data = get_observation_batched(missing_entities, missing_variables, [("date", "")], VALUE_SELECT)
+        _store_series(series, missing_entities, missing_variables, data)
+    with phase("walk"):
+        return _assemble_series(series, entities, variables, start, end)
+
+
+async def fetch_series_async(entities: list[str], variables: list[str],
+                             start: str = None, end: str = None) -> dict:
+    """Async variant of fetch_series."""
+    record(entities=len(entities), variables=len(variables))
+    series, missing_entities, missing_variables = _plan_series(entities, variables)
+    if missing_entities:
+        data = await get_observation_batched_async(missing_entities, missing_variables,
+                                                   [("date", "")], VALUE_SELECT)
+        _store_series(series, missing_entities, missing_variables, data)
+    with phase("walk"):
+        return _assemble_series(series, entities, variables, start, end)
+
+
+def cached_series(entities: list[str], variables: list[str], start: str = None, end: str = None) -> dict:
+    """Like cached_observations, for time series; makes no request."""
+    series, _, _ = _plan_series(entities, variables, allow_expired=True)
+    return _assemble_series(series, entities, variables, start, end)
+
+
+def fetch_observation_table(entities: list[str], variables: list[str],
+                            date: str = "LATEST") -> ObservationTable:
+    """Fetches observations as a columnar ObservationTable (requires numpy).
+
+    Same caching and batching as fetch_observations, which builds the same
+    cells into per-place dicts instead.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    return ObservationTable.from_cells(_fetch_cells(entities, variables, date), entities, variables)
+
+
+async def fetch_observation_table_async(entities: list[str], variables: list[str],
+                                        date: str = "LATEST") -> ObservationTable:
+    """Async variant of fetch_observation_table."""
+    cells = await _fetch_cells_async(entities, variables, date)
+    return ObservationTable.from_cells(cells, entities, variables)
+
+
+def cached_observation_table(entities: list[str], variables: list[str],
+                             date: str = "LATEST") -> ObservationTable:
+    """Like cached_observations, as an ObservationTable; makes no request."""
+    cells, _, _ = _plan(entities, variables, date, allow_expired=True)
+    return ObservationTable.from_cells(cells, entities, variables)
+
+
+def child_places_expression(parent: str, child_type: str) -> str:
+    """Returns the entity expression for every child_type place within parent, at any depth."""
+    return f"{parent}<-containedInPlace+{{typeOf:{child_type}}}"
+
+
+def _plan_children(parent: str, child_type: str, variables: list[str], date: str,
+                   allow_expired: bool = False) -> tuple[list[str], dict, list[str]]:
+    """Looks up the cached child list of (parent, child_type) and its cached cells.
+
+    Returns:
+        tuple: child DCIDs (empty if not cached), cached cells as
+               {(entity, variable): cell}, and the variables to fetch.
+    """
+    children = get_place_cache().get_children(parent, child_type, allow_expired=allow_expired)
+    if children is None:
+        return [], {}, list(variables)
+    cells, missing_entities, missing_variables = _plan(children, variables, date, allow_expired)
+    return children, cells, missing_variables if missing_entities else []
+
+
+def _store_children(parent: str, child_type: str, children: list[str], cells: dict,
+                    variables: list[str], date: str, data: dict) -> list[str]:
+    """Caches the cells and child list from an expression response; returns the children."""
+    with phase("walk"):
+        fetched = {entity for variable_data in data.get("byVariable", {}).values()
+                   for entity in variable_data.get("byEntity", {})}
+    # Children without data for these variables are only known from earlier calls
+    children = children + sorted(fetched.difference(children))
+    _store(cells, children, variables, date, data)
+    get_place_cache().put_children(parent, child_type, children)
+    return children
+
+
+def _child_request(parent: str, child_type: str, variables: list[str], date: str, url: str) -> dict:
+    with phase("request_build"):
+        return plan_expression_request(url, child_places_expression(parent, child_type), variables,
+                                       [("date", date)], VALUE_SELECT)
+
+
+def fetch_child_observations(parent: str, child_type: str, variables: list[str],
+                             date: str = "LATEST") -> dict:
+    """Fetches observations for every child_type place within a parent in one request.
+
+    The API expands the contained-in-place expression, so no child DCIDs need
+    to be resolved first. The child list is cached per (parent, child_type),
+    and once it is known, only variables with uncached cells are requested.
+
+    Args:
+        parent (str): Parent place DCID, e.g. "geoId/06".
+        child_type (str): Child place type, e.g. "County".
+        variables (list[str]): Statistical variable DCIDs.
+        date (str, optional): "LATEST" or a specific date. Defaults to "LATEST".
+
+    Returns:
+        dict: result[child][variable] = {"value", "date"}, children in DCID order.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    children, cells, missing_variables = _plan_children(parent, child_type, variables, date)
+    if missing_variables:
+        client = get_client()
+        data = client.request(endpoint="observation",
+                              **_child_request(parent, child_type, missing_variables, date,
+                                               client.url_for("observation")))
+        children = _store_children(parent, child_type, children, cells, missing_variables, date, data)
+    record(entities=len(children), variables=len(variables))
+    with phase("walk"):
+        return _assemble(cells, children, variables)
+
+
+async def fetch_child_observations_async(parent: str, child_type: str, variables: list[str],
+                                         date: str = "LATEST") -> dict:
+    """Async variant of fetch_child_observations."""
+    children, cells, missing_variables = _plan_children(parent, child_type, variables, date)
+    if missing_variables:
+        client = get_async_client()
+        data = await client.request(endpoint="observation",
+                                    **_child_request(parent, child_type, missing_variables, date,
+                                                     client.url_for("observation")))
+        children = _store_children(parent, child_type, children, cells, missing_variables, date, data)
+    record(entities=len(children), variables=len(variables))
+    with phase("walk"):
+        return _assemble(cells, children, variables)
+
+
+def cached_child_observations(parent: str, child_type: str, variables: list[str],
+                              date: str = "LATEST") -> dict:
+    """Like cached_observations, for the cached children of a parent; makes no request."""
+    children, cells, _ = _plan_children(parent, child_type, variables, date, allow_expired=True)
+    return _assemble(cells, children, variables)
+
+
+def _merge_variable_lists(dcid_list: list[str], results: list[dict]) -> dict:
+    merged = {entity: [] for entity in dcid_list}
+    for result in results:
+        for entity, variables in result.items():
+            merged[entity] = variables
+    return merged
+
+
+def _cached_variable_lists(dcid_list: list[str], limit: int) -> tuple[dict, list[str]]:
+    """Splits entities into cached variable listings and entities still to fetch."""
+    cache = get_variable_list_cache()
+    cached = {}
+    misses = []
+    for entity in dict.fromkeys(dcid_list):
+        variables = cache.get(entity, limit)
+        if variables is None:
+            misses.append(entity)
+        else:
+            cached[entity] = variables
+    return cached, misses
+
+
+def _store_variable_lists(merged: dict, misses: list[str], limit: int):
+    cache = get_variable_list_cache()
+    index = get_statvar_index()
+    for entity in misses:
+        cache.put(entity, merged[entity], limit)
+        index.add_many(merged[entity])
+
+
+def _name_batches(variables: list[str]) -> list[list[str]]:
+    variables = list(dict.fromkeys(variables))
+    return [variables[i:i + NAME_BATCH_SIZE] for i in range(0, len(variables), NAME_BATCH_SIZE)]
+
+
+def _name_params(variables: list[str]) -> dict:
+    return {
+        "nodes": variables,
+        "property": "->name"
+    }
+
+
+def _index_names(responses: list[dict]) -> dict:
+    """Adds the names in /node responses to the statvar index and returns them."""
+    names = {}
+    for data in responses:
+        for dcid, node in (data.get("data") or {}).items():
+            values = node.get("arcs", {}).get("name", {}).get("nodes", [])
+            if values and values[0].get("value"):
+                names[dcid] = values[0]["value"]
+    index = get_statvar_index()
+    for dcid, name in names.items():
+        index.add(dcid, name)
+    return names
+
+
+def fetch_variable_names(variables: list[str]) -> dict:
+    """Fetches the names of statistical variables and adds them to the statvar index.
+
+    Variable listings only carry DCIDs; names such as "Total population"
+    let search_statistical_variables match wording the DCID lacks.
+
+    Returns:
+        dict: DCID -> name, for the variables that have one.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    client = get_client()
+    return _index_names(map_batches(lambda batch: client.get("node", _name_params(batch)),
+                                    _name_batches(variables)))
+
+
+async def fetch_variable_names_async(variables: list[str]) -> dict:
+    """Async variant of fetch_variable_names."""
+    client = get_async_client()
+
+    async def fetch(batch):
+        return await client.get("node", _name_params(batch))
+
+    return _index_names(await map_batches_async(fetch, _name_batches(variables)))
+
+
+def fetch_available_variables(dcid_list: list[str], limit: int = None) -> dict:
+    """Lists variables with data for each entity, streaming the /observation response.
+
+    The response is scanned as it downloads and the download stops as soon as
+    every entity has `limit` variables, so memory stays bounded however large
+    the full listing is. Listings are cached per entity, and only entities
+    without a cached listing are requested.
+
+    Args:
+        dcid_list (list[str]): Entity DCIDs.
+        limit (int, optional): Variables to keep per entity, or None for all.
+
+    Returns:
+        dict: entity DCID -> list of variable DCIDs.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    cached, misses = _cached_variable_lists(dcid_list, limit)
+    record(entities=len(dcid_list), cache_misses=len(misses))
+    if not misses:
+        return _merge_variable_lists(dcid_list, [cached])
+    client = get_client()
+    with phase("request_build"):
+        planned = plan_requests(client.url_for("observation"), misses, [],
+                                [("date", "LATEST")], VARIABLE_SELECT)
+
+    def scan(batch):
+        entities, _, kwargs = batch
+        scanner = VariableListingScanner(entities, limit)
+        with closing(client.stream(endpoint="observation", **kwargs)) as chunks:
+            for chunk in chunks:
+                with phase("walk"):
+                    done = scanner.feed(chunk)
+                if done:
+                    break
+        stream_stats.record(scanner)
+        return scanner.result
+
+    merged = _merge_variable_lists(dcid_list, [cached] + map_batches(scan, planned))
+    _store_variable_lists(merged, misses, limit)
+    return merged
+
+
+async def fetch_available_variables_async(dcid_list: list[str], limit: int = None) -> dict:
+    """Async variant of fetch_available_variables."""
+    cached, misses = _cached_variable_lists(dcid_list, limit)
+    record(entities=len(dcid_list), cache_misses=len(misses))
+    if not misses:
+        return _merge_variable_lists(dcid_list, [cached])
+    client = get_async_client()
+    with phase("request_build"):
+        planned = plan_requests(client.url_for("observation"), misses, [],
+                                [("date", "LATEST")], VARIABLE_SELECT)
+
+    async def scan(batch):
+        entities, _, kwargs = batch
+        scanner = VariableListingScanner(entities, limit)
+        async with aclosing(client.stream(endpoint="observation", **kwargs)) as chunks:
+            async for chunk in chunks:
+                with phase("walk"):
+                    done = scanner.feed(chunk)
+                if done:
+                    break
+        stream_stats.record(scanner)
+        return scanner.result
+
+    merged = _merge_variable_lists(dcid_list, [cached] + await map_batches_async(scan, planned))
+    _store_variable_lists(merged, misses, limit)
+    return merged
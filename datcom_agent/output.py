@@ -0,0 +1,404 @@
+import csv
+import functools
+import inspect
+import io
+import json
+import os
+import threading
+
+from .results import ResultSet, get_result_store
+from .telemetry import phase, record
+
+OUTPUT_MODES = ("full", "data", "report", "table")
+DEFAULT_OUTPUT_MAX_TOKENS = 0
+DEFAULT_RESULT_HANDLE_ROWS = 0
+# Rows shown with the summary of a stored result
+PREVIEW_ROWS = 5
+
+# Rough size of a token in characters of JSON, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(value) -> int:
+    """Estimates how many LLM tokens a JSON-serializable value costs."""
+    return len(json.dumps(value, separators=(",", ":"), default=str)) // CHARS_PER_TOKEN
+
+
+class OutputShape:
+    """Describes how a tool's `data` flattens into table rows and back.
+
+    `data` is nested dicts keyed by `keys` (e.g. place, then variable), with
+    a leaf at the bottom of one of these kinds:
+
+    - "value": a scalar, one row (e.g. place -> DCID).
+    - "list": a list of scalars, one row per item (e.g. place -> variables).
+    - "record": a dict, one row of its `fields` (e.g. {"value", "date"}).
+    - "columns": a dict of parallel lists named by `fields`, one row per
+      position (e.g. {"dates": [...], "values": [...]}).
+
+    With no keys, `data` is a list of leaves instead. The "matrix" kind is
+    not nested: `data` is {"entities", "variables"} plus one matrix per
+    field, indexed [entity][variable], with None where there is no value
+    (see ObservationTable.to_columns).
+
+    Args:
+        keys (tuple[str], optional): Column names of the nesting levels.
+        fields (tuple[str], optional): Fields of each leaf.
+        leaf (str, optional): One of the leaf kinds above. Defaults to "value".
+        section (str, optional): Key of `data` holding the rows, when `data`
+                                 also carries other small sections.
+        columns (tuple[str], optional): Column names for `fields` if different.
+    """
+
+    def __init__(self, keys: tuple = (), fields: tuple = ("value",), leaf: str = "value",
+                 section: str = None, columns: tuple = None):
+        self.keys = tuple(keys)
+        self.fields = tuple(fields)
+        self.leaf = leaf
+        self.section = section
+        self.columns = tuple(columns) if columns else None
+        self.header = self.keys + (self.columns or self.fields)
+
+    def to_dict(self) -> dict:
+        """Returns the shape as JSON-serializable settings, for stored results."""
+        return {"keys": self.keys, "fields": self.fields, "leaf": self.leaf,
+                "section": self.section, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "OutputShape":
+        """Rebuilds a shape from to_dict settings."""
+        return cls(**settings)
+
+    def split(self, data) -> tuple:
+        """Returns the part of data holding the rows and the other sections."""
+        if self.section is None:
+            return data, {}
+        return (data.get(self.section, {}),
+                {key: value for key, value in data.items() if key != self.section})
+
+    def rows(self, data) -> list[tuple]:
+        """Flattens the row part of data into tuples matching `header`."""
+        rows = []
+        if self.leaf == "matrix":
+            data = data or {}
+            matrices = [data.get(field, []) for field in self.fields]
+            for i, entity in enumerate(data.get("entities", [])):
+                for j, variable in enumerate(data.get("variables", [])):
+                    if matrices[0][i][j] is not None:
+                        rows.append((entity, variable) + tuple(matrix[i][j] for matrix in matrices))
+            return rows
+        if not self.keys:
+            for leaf in data or []:
+                rows.extend(self._leaf_rows((), leaf))
+            return rows
+
+        def walk(node, prefix):
+            if len(prefix) == len(self.keys):
+                rows.extend(self._leaf_rows(prefix, node))
+                return
+            for key, child in node.items():
+                walk(child, prefix + (key,))
+
+        walk(data or {}, ())
+        return rows
+
+    def _leaf_rows(self, prefix: tuple, leaf) -> list[tuple]:
+        if self.leaf == "list":
+            return [prefix + (item,) for item in leaf]
+        if self.leaf == "record":
+            return [prefix + tuple(leaf.get(field) for field in self.fields)]
+        if self.leaf == "columns":
+            return [prefix + values for values in zip(*(leaf.get(field, []) for field in self.fields))]
+        return [prefix + (leaf,)]
+
+    def nest(self, rows: list[tuple]):
+        """Rebuilds the row part of data from (a subset of) its rows."""
+        if self.leaf == "matrix":
+            # dicts as insertion-ordered position maps
+            entities = {entity: i for i, entity in enumerate(dict.fromkeys(row[0] for row in rows))}
+            variables = {variable: j for j, variable in enumerate(dict.fromkeys(row[1] for row in rows))}
+            result = {"entities": list(entities), "variables": list(variables)}
+            for field in self.fields:
+                result[field] = [[None] * len(variables) for _ in entities]
+            for row in rows:
+                i, j = entities[row[0]], variables[row[1]]
+                for field, value in zip(self.fields, row[2:]):
+                    result[field][i][j] = value
+            return result
+        if not self.keys:
+            return [self._leaf(row) for row in rows]
+        depth = len(self.keys)
+        result = {}
+        for row in rows:
+            node = result
+            for key in row[:depth - 1]:
+                node = node.setdefault(key, {})
+            key, values = row[depth - 1], row[depth:]
+            if self.leaf == "list":
+                node.setdefault(key, []).append(values[0])
+            elif self.leaf == "columns":
+                columns = node.setdefault(key, {field: [] for field in self.fields})
+                for field, value in zip(self.fields, values):
+                    columns[field].append(value)
+            else:
+                node[key] = self._leaf(values)
+        return result
+
+    def _leaf(self, values: tuple):
+        if self.leaf == "record":
+            return dict(zip(self.fields, values))
+        return values[0]
+
+
+def _table(header: tuple, rows: list[tuple]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class OutputPolicy:
+    """Shapes successful tool responses for the model.
+
+    Modes:
+
+    - "full": the prose `report` and the `data` dict, as built by the tool.
+    - "data": only `data`.
+    - "report": only `report`.
+    - "table": `data` as one compact CSV `table` with a header row.
+
+    A result with more than `handle_rows` rows is not returned at all. It
+    is kept in the ResultStore, and the model gets a summary instead: row
+    count, value ranges and the first few rows, plus a handle. The
+    query_result and aggregate_result tools then read just the rows the
+    model needs.
+
+    A smaller response whose estimated size exceeds `max_tokens` is cut to
+    fit. Reports are cut at line boundaries and data and tables at row
+    boundaries, and a "full" response falls back to its data. The complete
+    response is stored the same way, and the "truncated" entry says how to
+    read the rest with the get_more_output tool. Error responses are never
+    changed.
+
+    Args:
+        mode (str, optional): Defaults to $DATCOM_OUTPUT_MODE or "full".
+        max_tokens (int, optional): Defaults to $DATCOM_OUTPUT_MAX_TOKENS; 0
+                                    (the default) disables the budget.
+        handle_rows (int, optional): Defaults to $DATCOM_RESULT_HANDLE_ROWS; 0
+                                     (the default) always returns rows inline.
+        store (ResultStore, optional): Where large responses are kept.
+                                       Defaults to the process-wide store.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+
+    def __init__(self, mode: str = None, max_tokens: int = None, handle_rows: int = None,
+                 store=None):
+        self.mode = mode or os.getenv("DATCOM_OUTPUT_MODE", "full")
+        if self.mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {self.mode!r}; expected one of {OUTPUT_MODES}")
+        if max_tokens is None:
+            max_tokens = int(os.getenv("DATCOM_OUTPUT_MAX_TOKENS", DEFAULT_OUTPUT_MAX_TOKENS))
+        self.max_tokens = max_tokens
+        if handle_rows is None:
+            handle_rows = int(os.getenv("DATCOM_RESULT_HANDLE_ROWS", DEFAULT_RESULT_HANDLE_ROWS))
+        self.handle_rows = handle_rows
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or get_result_store()
+
+    def apply(self, response: dict, shape: OutputShape) -> dict:
+        """Returns the response in this policy's mode and within its budget."""
+        if not isinstance(response, dict) or response.get("status") != "success":
+            return response
+        if self.handle_rows:
+            part, sections = shape.split(response.get("data"))
+            rows = shape.rows(part)
+            if len(rows) > self.handle_rows:
+                return self._summary(response, shape, rows, sections)
+        shaped = self._shape(response, shape)
+        if not self.max_tokens or estimate_tokens(shaped) <= self.max_tokens:
+            return shaped
+        return self.page(self._put(response, shape), 0)
+
+    def _put(self, response: dict, shape: OutputShape) -> str:
+        return self.store.put({"response": response, "shape": shape.to_dict(), "mode": self.mode})
+
+    def _shape(self, response: dict, shape: OutputShape) -> dict:
+        if self.mode == "full":
+            return response
+        shaped = {key: value for key, value in response.items() if key not in ("report", "data")}
+        if self.mode == "report":
+            shaped["report"] = response.get("report", "")
+        elif self.mode == "data":
+            shaped["data"] = response.get("data")
+        else:
+            part, sections = shape.split(response.get("data"))
+            shaped["table"] = _table(shape.header, shape.rows(part))
+            if sections:
+                shaped["data"] = sections
+        return shaped
+
+    def _summary(self, response: dict, shape: OutputShape, rows: list, sections: dict) -> dict:
+        """Stores a large response and describes it instead of returning its rows."""
+        handle = self._put(response, shape)
+        summary = ResultSet(shape.header, rows).summary(PREVIEW_ROWS)
+        info = dict(sections, handle=handle, total_rows=summary["rows"], distinct=summary["distinct"],
+                    numeric=summary["numeric"])
+        text = (f"The result has {summary['rows']} rows, too many to show, so it is stored as "
+                f"handle=\"{handle}\". Use query_result to filter, sort and page it, or "
+                f"aggregate_result to summarize it.\n")
+        for name, stats in summary["numeric"].items():
+            text += f"{name}: {stats['count']} values from {stats['min']:,} to {stats['max']:,}\n"
+        for name, count in summary["distinct"].items():
+            text += f"{name}: {count} distinct\n"
+        text += f"\nFirst {len(summary['preview'])} rows:\n"
+        extras = {key: value for key, value in response.items() if key not in ("status", "report", "data")}
+        record(result_handle=True)
+        return dict(self.rows_response(ResultSet(shape.header, summary["preview"]), info, text), **extras)
+
+    def rows_response(self, result: ResultSet, info: dict, text: str) -> dict:
+        """Builds a response showing a few rows in this policy's mode.
+
+        Args:
+            result (ResultSet): The rows to show.
+            info (dict): Small facts about them, such as the handle.
+            text (str): Prose shown before the rows in the report.
+
+        Returns:
+            dict: The response for the query_result and aggregate_result tools
+                  and for stored-result summaries.
+        """
+        table = _table(result.header, result.rows)
+        response = {"status": "success"}
+        if self.mode in ("full", "report"):
+            response["report"] = text + table
+        if self.mode in ("full", "data"):
+            response["data"] = dict(info, columns=result.header, rows=result.rows)
+        if self.mode == "table":
+            response["table"] = table
+            response["data"] = info
+        return response
+
+    def result_set(self, handle: str):
+        """Returns the rows of a stored response as a ResultSet, or None if unknown."""
+        entry = self.store.get(handle)
+        if entry is None:
+            return None
+        shape = OutputShape.from_dict(entry["shape"])
+        part, _ = shape.split(entry["response"].get("data"))
+        return ResultSet(shape.header, [list(row) for row in shape.rows(part)])
+
+    def page(self, handle: str, offset: int = 0):
+        """Returns the part of a stored response starting at offset, within the budget.
+
+        Offsets count report lines in "report" mode and data rows otherwise.
+
+        Returns:
+            dict: The shaped part with a "truncated" entry, or None if the
+                  handle is unknown or has expired.
+        """
+        entry = self.store.get(handle)
+        if entry is None:
+            return None
+        response, mode = entry["response"], entry["mode"]
+        shape = OutputShape.from_dict(entry["shape"])
+        shaped = {key: value for key, value in response.items() if key not in ("report", "data")}
+        part, sections = shape.split(response.get("data"))
+        budget = (self.max_tokens * CHARS_PER_TOKEN - len(json.dumps(sections, default=str))
+                  if self.max_tokens else float("inf"))
+
+        if mode == "report":
+            items = response.get("report", "").splitlines(keepends=True)
+            cost = len
+        else:
+            items = shape.rows(part)
+            cost = lambda row: len(json.dumps(row, default=str))
+        end = offset
+        used = 0
+        while end < len(items):
+            used += cost(items[end])
+            # Always return at least one item so paging makes progress
+            if used > budget and end > offset:
+                break
+            end += 1
+        chunk = items[offset:end]
+
+        if mode == "report":
+            shaped["report"] = "".join(chunk)
+        elif mode == "table":
+            shaped["table"] = _table(shape.header, chunk)
+            if sections:
+                shaped["data"] = sections
+        else:
+            data = shape.nest(chunk)
+            shaped["data"] = dict(sections, **{shape.section: data}) if shape.section else data
+        next_offset = end if end < len(items) else None
+        unit = "lines" if mode == "report" else "rows"
+        shaped["truncated"] = {
+            "handle": handle,
+            "offset": offset,
+            "next_offset": next_offset,
+            "total": len(items),
+            "note": (f"Showing {unit} {offset + 1}-{end} of {len(items)}. Call get_more_output with "
+                     f"handle=\"{handle}\" and offset={next_offset} for the rest.")
+                    if next_offset is not None else f"Showing the last {unit} of {len(items)}."
+        }
+        record(output_truncated=True)
+        return shaped
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_output_policy() -> OutputPolicy:
+    """Returns the process-wide OutputPolicy."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = OutputPolicy()
+    return _policy
+
+
+def set_output_policy(policy: OutputPolicy):
+    """Replaces the process-wide OutputPolicy, e.g. to switch modes."""
+    global _policy
+    with _policy_lock:
+        _policy = policy
+
+
+def shaped(shape):
+    """Decorates a sync or async tool so its responses follow the OutputPolicy.
+
+    Args:
+        shape (OutputShape or callable): The shape of the tool's data, or a
+                                         function picking it from the response
+                                         for tools with more than one.
+    """
+
+    def shape_of(response) -> OutputShape:
+        return shape if isinstance(shape, OutputShape) else shape(response)
+
+    def decorate(tool):
+        if inspect.iscoroutinefunction(tool):
+            @functools.wraps(tool)
+            async def async_wrapper(*args, **kwargs):
+                response = await tool(*args, **kwargs)
+                with phase("report_build"):
+                    return get_output_policy().apply(response, shape_of(response))
+            return async_wrapper
+
+        @functools.wraps(tool)
+        def wrapper(*args, **kwargs):
+            response = tool(*args, **kwargs)
+            with phase("report_build"):
+                return get_output_policy().apply(response, shape_of(response))
+        return wrapper
+
+    return decorate
@@ -0,0 +1,148 @@
+import base64
+import json
+
+from .client import get_async_client, get_client
+from .observations import VARIABLE_SELECT
+from .planner import plan_requests
+from .search import get_statvar_index
+from .telemetry import phase
+
+
+def encode_cursor(entities: list[str], batch: int, token: str, offset: int) -> str:
+    """Packs a listing position into an opaque, URL-safe cursor string."""
+    state = json.dumps({"e": entities, "b": batch, "t": token, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(state.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[list[str], int, str, int]:
+    """Unpacks a cursor from encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return list(state["e"]), int(state["b"]), state["t"], int(state["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid variable listing cursor: {cursor!r}") from e
+
+
+def _page_pairs(data: dict, entities: list[str]) -> list[tuple[str, str]]:
+    """Returns a page's (entity, variable) pairs in request entity order, then DCID order."""
+    order = {entity: i for i, entity in enumerate(entities)}
+    pairs = [(entity, variable)
+             for variable, variable_data in data.get("byVariable", {}).items()
+             for entity in variable_data.get("byEntity", {})
+             if entity in order]
+    pairs.sort(key=lambda pair: (order[pair[0]], pair[1]))
+    return pairs
+
+
+def _with_token(kwargs: dict, token: str) -> dict:
+    if not token:
+        return kwargs
+    if kwargs["method"] == "POST":
+        return dict(kwargs, body=dict(kwargs["body"], nextToken=token))
+    return dict(kwargs, params=kwargs["params"] + [("nextToken", token)])
+
+
+class _VariableListingBase:
+    def __init__(self, dcid_list: list[str] = None, cursor: str = None):
+        if cursor:
+            self.entities, self._batch, self._token, self._offset = decode_cursor(cursor)
+        else:
+            self.entities = list(dict.fromkeys(dcid_list or []))
+            self._batch, self._token, self._offset = 0, "", 0
+        self._planned = None
+        # (pairs on the page being yielded, its nextToken) once it is fetched
+        self._page = None
+        self.pages_fetched = 0
+
+    def _plan(self, client) -> list:
+        if self._planned is None:
+            with phase("request_build"):
+                self._planned = plan_requests(client.url_for("observation"), self.entities, [],
+                                              [("date", "LATEST")], VARIABLE_SELECT)
+        return self._planned
+
+    def _after_page(self, next_token: str) -> tuple[int, str]:
+        """Returns the batch and token of the page after the current one."""
+        if next_token:
+            return self._batch, next_token
+        return self._batch + 1, ""
+
+    def _enter_page(self, pairs: list, next_token: str):
+        self.pages_fetched += 1
+        self._page = (len(pairs), next_token)
+
+    def _advance(self, next_token: str):
+        self._batch, self._token = self._after_page(next_token)
+        self._offset = 0
+        self._page = None
+
+    @property
+    def cursor(self):
+        """Cursor resuming right after the last pair yielded, or None when exhausted."""
+        batch, token, offset = self._batch, self._token, self._offset
+        if self._page is not None and offset >= self._page[0]:
+            # The page is used up, so point at the next one; a listing ending
+            # exactly here then has no cursor instead of one to an empty page
+            (batch, token), offset = self._after_page(self._page[1]), 0
+        if self._planned is not None and batch >= len(self._planned):
+            return None
+        return encode_cursor(self.entities, batch, token, offset)
+
+
+class VariableListing(_VariableListingBase):
+    """Lazy, resumable listing of every variable with data for some entities.
+
+    Iterating yields (entity, variable) pairs, fetching one /observation
+    page at a time and following the API's nextToken only when the
+    previous page is used up, so only one page is ever held in memory and
+    stopping early skips the remaining pages. Within a page, pairs are
+    ordered by the entity's position in the request and then by variable
+    DCID, so the same listing always comes back in the same order.
+
+    After stopping, `cursor` is an opaque string that a new listing can
+    start from (VariableListing(cursor=...)), e.g. in a later tool call.
+
+    Args:
+        dcid_list (list[str], optional): Entity DCIDs.
+        cursor (str, optional): Resume from a cursor instead of the start.
+    """
+
+    def __iter__(self):
+        client = get_client()
+        planned = self._plan(client)
+        while self._batch < len(planned):
+            entities, _, kwargs = planned[self._batch]
+            data = client.request(endpoint="observation", **_with_token(kwargs, self._token))
+            with phase("walk"):
+                pairs = _page_pairs(data, entities)
+            get_statvar_index().add_many(data.get("byVariable", {}))
+            self._enter_page(pairs, data.get("nextToken"))
+            while self._offset < len(pairs):
+                pair = pairs[self._offset]
+                self._offset += 1
+                yield pair
+            self._advance(data.get("nextToken"))
+
+
+class AsyncVariableListing(_VariableListingBase):
+    """Async variant of VariableListing; use `async for`."""
+
+    async def __aiter__(self):
+        client = get_async_client()
+        planned = self._plan(client)
+        while self._batch < len(planned):
+            entities, _, kwargs = planned[self._batch]
+            data = await client.request(endpoint="observation", **_with_token(kwargs, self._token))
+            with phase("walk"):
+                pairs = _page_pairs(data, entities)
+            get_statvar_index().add_many(data.get("byVariable", {}))
+            self._enter_page(pairs, data.get("nextToken"))
+            while self._offset < len(pairs):
+                pair = pairs[self._offset]
+                self._offset += 1
+                yield pair
+            self._advance(data.get("nextToken"))
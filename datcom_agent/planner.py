@@ -0,0 +1,273 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from .client import get_async_client, get_client
+from .telemetry import phase
+
+# Conservative limit that stays under common proxy/server URL limits
+DEFAULT_MAX_URL_LENGTH = 4000
+# Expected number of place x variable cells one response should carry
+DEFAULT_MAX_CELLS = 5000
+DEFAULT_MAX_CONCURRENCY = 4
+# Requests whose GET URL would be longer than this are sent as a JSON POST
+DEFAULT_POST_THRESHOLD = 2000
+
+# A variable listing (no variable.dcids) returns every variable of a place;
+# large places have thousands, so budget payload per entity accordingly
+VARIABLES_PER_ENTITY_ESTIMATE = 1000
+
+
+def _setting(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _encoded_length(params: list) -> int:
+    return sum(len(key) + len(quote(str(value), safe="")) + 2 for key, value in params)
+
+
+def _chunk_by_length(dcids: list[str], key: str, budget: int, max_items: int) -> list[list[str]]:
+    """Greedily splits DCIDs so each chunk's encoded parameters fit the budget."""
+    chunks = []
+    current = []
+    length = 0
+    for dcid in dcids:
+        item_length = len(key) + len(quote(dcid, safe="")) + 2
+        if current and (length + item_length > budget or len(current) >= max_items):
+            chunks.append(current)
+            current = []
+            length = 0
+        current.append(dcid)
+        length += item_length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def plan_batches(entities: list[str], variables: list[str], fixed_params: list,
+                 base_url: str, max_url_length: int = None, max_cells: int = None) -> list[tuple]:
+    """Splits an entity x variable request into batches.
+
+    Each batch's URL stays under max_url_length and its expected payload under
+    max_cells. An empty variables list means "all variables", whose payload is
+    estimated at VARIABLES_PER_ENTITY_ESTIMATE cells per entity.
+
+    Args:
+        entities (list[str]): Entity DCIDs.
+        variables (list[str]): Variable DCIDs, or [] for a variable listing.
+        fixed_params (list[tuple]): Parameters sent with every batch, e.g. date.
+        base_url (str): Endpoint URL, counted against the URL length.
+        max_url_length (int, optional): Defaults to $DATCOM_MAX_URL_LENGTH or 4000.
+        max_cells (int, optional): Defaults to $DATCOM_MAX_CELLS or 5000.
+
+    Returns:
+        list[tuple]: (entities, variables) pairs covering the full request.
+    """
+    max_url_length = max_url_length or _setting("DATCOM_MAX_URL_LENGTH", DEFAULT_MAX_URL_LENGTH)
+    max_cells = max_cells or _setting("DATCOM_MAX_CELLS", DEFAULT_MAX_CELLS)
+    # key=... is added by the client; allow for a typical API key
+    budget = max(max_url_length - len(base_url) - _encoded_length(fixed_params) - 64, 200)
+
+    if variables:
+        # Give variables at most half the budget, the rest goes to entities
+        variable_chunks = _chunk_by_length(variables, "variable.dcids", budget // 2, len(variables))
+    else:
+        variable_chunks = [[]]
+
+    batches = []
+    for variable_chunk in variable_chunks:
+        cells_per_entity = len(variable_chunk) or VARIABLES_PER_ENTITY_ESTIMATE
+        entity_budget = budget - _encoded_length([("variable.dcids", v) for v in variable_chunk])
+        max_entities = max(max_cells // cells_per_entity, 1)
+        for entity_chunk in _chunk_by_length(entities, "entity.dcids", entity_budget, max_entities):
+            batches.append((entity_chunk, variable_chunk))
+    return batches
+
+
+def merge_observation_responses(responses: list[dict]) -> dict:
+    """Merges /observation responses into one byVariable -> byEntity response."""
+    if len(responses) == 1:
+        return responses[0]
+    merged = {"byVariable": {}}
+    for response in responses:
+        for variable_dcid, variable_data in response.get("byVariable", {}).items():
+            target = merged["byVariable"].setdefault(variable_dcid, {})
+            if "byEntity" in variable_data:
+                target.setdefault("byEntity", {}).update(variable_data["byEntity"])
+        if "facets" in response:
+            merged.setdefault("facets", {}).update(response["facets"])
+    return merged
+
+
+def _batch_params(fixed_params: list, entities: list[str], variables: list[str], select: list) -> list:
+    params = list(fixed_params)
+    params += [("entity.dcids", dcid) for dcid in entities]
+    params += [("variable.dcids", dcid) for dcid in variables]
+    return params + list(select)
+
+
+def observation_body(fixed_params: list, entities: list[str], variables: list[str], select: list) -> dict:
+    """Builds the JSON body for the POST form of /v2/observation."""
+    body = dict(fixed_params)
+    body["entity"] = {"dcids": entities}
+    if variables:
+        body["variable"] = {"dcids": variables}
+    body["select"] = [value for _, value in select]
+    return body
+
+
+def use_post(url: str, entities: list[str], variables: list[str], fixed_params: list,
+             threshold: int = None) -> bool:
+    """Returns whether a request is large enough to send as a JSON POST.
+
+    Args:
+        url (str): Endpoint URL.
+        entities (list[str]): Entity DCIDs.
+        variables (list[str]): Variable DCIDs.
+        fixed_params (list[tuple]): Every other query parameter.
+        threshold (int, optional): GET URL length above which POST is used.
+                                   Defaults to $DATCOM_POST_THRESHOLD or 2000;
+                                   a negative value disables POST.
+    """
+    threshold = threshold if threshold is not None else _setting("DATCOM_POST_THRESHOLD", DEFAULT_POST_THRESHOLD)
+    if threshold < 0:
+        return False
+    length = len(url) + _encoded_length(fixed_params)
+    length += _encoded_length([("entity.dcids", dcid) for dcid in entities])
+    length += _encoded_length([("variable.dcids", dcid) for dcid in variables])
+    return length > threshold
+
+
+def plan_requests(url: str, entities: list[str], variables: list[str],
+                  fixed_params: list, select: list) -> list[tuple]:
+    """Plans the batches of an /observation request.
+
+    Returns:
+        list[tuple]: (entities, variables, request_kwargs) per batch, where
+                     request_kwargs are keyword arguments for client.request.
+    """
+    post = use_post(url, entities, variables, fixed_params + select)
+    # A POST body has no URL limit, so only the payload size bounds a batch
+    batches = plan_batches(entities, variables, fixed_params + select, url,
+                           max_url_length=sys.maxsize if post else None)
+    if post:
+        return [(e, v, {"method": "POST", "body": observation_body(fixed_params, e, v, select)})
+                for e, v in batches]
+    return [(e, v, {"method": "GET", "params": _batch_params(fixed_params, e, v, select)})
+            for e, v in batches]
+
+
+def plan_node_batches(url: str, nodes: list[str], fixed_params: list,
+                      max_url_length: int = None) -> list[list[str]]:
+    """Splits the nodes=... of a /resolve or /node request so each GET URL fits.
+
+    Args:
+        url (str): Endpoint URL, counted against the URL length.
+        nodes (list[str]): Node names or DCIDs.
+        fixed_params (list[tuple]): Parameters sent with every batch, e.g. property.
+        max_url_length (int, optional): Defaults to $DATCOM_MAX_URL_LENGTH or 4000.
+
+    Returns:
+        list[list[str]]: Node batches covering the full list, in order.
+    """
+    max_url_length = max_url_length or _setting("DATCOM_MAX_URL_LENGTH", DEFAULT_MAX_URL_LENGTH)
+    budget = max(max_url_length - len(url) - _encoded_length(fixed_params) - 64, 200)
+    return _chunk_by_length(nodes, "nodes", budget, len(nodes))
+
+
+def plan_expression_request(url: str, expression: str, variables: list[str],
+                            fixed_params: list, select: list) -> dict:
+    """Plans an /observation request whose entities are given by an expression.
+
+    The expression (e.g. "geoId/06<-containedInPlace+{typeOf:County}") is
+    expanded by the API, so the request cannot be split by entity.
+
+    Returns:
+        dict: keyword arguments for client.request.
+    """
+    entity_param = [("entity.expression", expression)]
+    if use_post(url, [], variables, fixed_params + entity_param + select):
+        body = observation_body(fixed_params, [], variables, select)
+        body["entity"] = {"expression": expression}
+        return {"method": "POST", "body": body}
+    return {"method": "GET", "params": fixed_params + entity_param
+            + [("variable.dcids", dcid) for dcid in variables] + list(select)}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting("DATCOM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+                    thread_name_prefix="datcom-batch")
+    return _executor
+
+
+def map_batches(fn, items: list) -> list:
+    """Calls fn on every item, concurrently when there is more than one."""
+    if len(items) == 1:
+        return [fn(items[0])]
+    # Run each item in a copy of the caller's context so tool telemetry follows it
+    futures = [_get_executor().submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+async def map_batches_async(fn, items: list) -> list:
+    """Awaits fn on every item, at most $DATCOM_MAX_CONCURRENCY at a time."""
+    if len(items) == 1:
+        return [await fn(items[0])]
+
+    semaphore = asyncio.Semaphore(_setting("DATCOM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+def get_observation_batched(entities: list[str], variables: list[str],
+                            fixed_params: list, select: list) -> dict:
+    """Sends an /observation request as concurrent batches and merges the results.
+
+    Requests too long for a GET URL are sent as JSON POST bodies instead.
+
+    Args:
+        entities (list[str]): Entity DCIDs.
+        variables (list[str]): Variable DCIDs, or [] to list all variables.
+        fixed_params (list[tuple]): Parameters sent with every batch, e.g. date.
+        select (list[tuple]): select=... parameters.
+
+    Returns:
+        dict: Merged /observation response.
+
+    Raises:
+        requests.exceptions.RequestException: If any batch fails.
+    """
+    client = get_client()
+    with phase("request_build"):
+        planned = plan_requests(client.url_for("observation"), entities, variables, fixed_params, select)
+    responses = map_batches(
+        lambda batch: client.request(endpoint="observation", **batch[2]), planned)
+    return merge_observation_responses(responses)
+
+
+async def get_observation_batched_async(entities: list[str], variables: list[str],
+                                        fixed_params: list, select: list) -> dict:
+    """Async variant of get_observation_batched."""
+    client = get_async_client()
+    with phase("request_build"):
+        planned = plan_requests(client.url_for("observation"), entities, variables, fixed_params, select)
+    responses = await map_batches_async(
+        lambda batch: client.request(endpoint="observation", **batch[2]), planned)
+    return merge_observation_responses(responses)
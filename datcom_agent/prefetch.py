@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .observations import (fetch_available_variables, fetch_available_variables_async,
+                           fetch_observations, fetch_observations_async,
+                           fetch_variable_names, fetch_variable_names_async)
+from .search import get_statvar_index
+
+DEFAULT_PREFETCH_MAX_ENTITIES = 20
+DEFAULT_PREFETCH_MAX_PENDING = 2
+# Variable names fetched per listing
+DEFAULT_PREFETCH_MAX_NAMES = 500
+
+# The get_available_variables tool lists this many variables per place
+PREFETCH_VARIABLE_LIMIT = 30
+
+
+def _listed(listings: dict) -> list[str]:
+    """Returns every variable in entity -> variables listings."""
+    return [variable for variables in listings.values() for variable in variables]
+
+
+class Prefetcher:
+    """Warms the caches for the tool calls that usually follow get_place_dcids.
+
+    After places are resolved, the agent almost always lists their variables
+    and fetches Count_Person next. The prefetcher requests both in the
+    background so those calls hit the caches. Once variables are listed, it
+    also fetches their names for the statvar search index. Work is bounded: at most
+    `max_entities` DCIDs per prefetch and `max_pending` prefetches at once;
+    anything beyond that is dropped rather than queued. Failures are ignored,
+    and requests still go through the client's rate limiter and circuit
+    breaker.
+
+    Args:
+        max_entities (int, optional): DCIDs prefetched per resolution.
+        max_pending (int, optional): Prefetches allowed in flight at once.
+        enabled (bool, optional): Defaults to $DATCOM_PREFETCH != "0".
+    """
+
+    def __init__(self, max_entities: int = None, max_pending: int = None, enabled: bool = None):
+        self.max_entities = max_entities or int(os.getenv("DATCOM_PREFETCH_MAX_ENTITIES",
+                                                          DEFAULT_PREFETCH_MAX_ENTITIES))
+        self.max_pending = max_pending or DEFAULT_PREFETCH_MAX_PENDING
+        self.enabled = enabled if enabled is not None else os.getenv("DATCOM_PREFETCH", "1") != "0"
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._tasks = set()
+        self._named = set()
+        self.counters = {"scheduled": 0, "dropped": 0, "failed": 0}
+
+    def _claim(self, dcids: list[str], limit: int = None):
+        """Returns the DCIDs to prefetch, or None if over budget or disabled."""
+        dcids = list(dict.fromkeys(dcid for dcid in dcids if dcid))[:limit or self.max_entities]
+        if not self.enabled or not dcids:
+            return None
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counters["dropped"] += 1
+                return None
+            self._pending += 1
+            self.counters["scheduled"] += 1
+        return dcids
+
+    def _release(self, failed: bool):
+        with self._lock:
+            self._pending -= 1
+            if failed:
+                self.counters["failed"] += 1
+
+    def _unnamed(self, variables) -> list[str]:
+        """Returns the variables without a name whose names were not requested before."""
+        index = get_statvar_index()
+        with self._lock:
+            return [variable for variable in dict.fromkeys(variables)
+                    if variable not in self._named and index.name(variable) is None]
+
+    def _request_names(self, variables: list[str]) -> list[str]:
+        """Marks names as requested, so each variable's name is fetched once."""
+        variables = variables[:DEFAULT_PREFETCH_MAX_NAMES]
+        with self._lock:
+            self._named.update(variables)
+        return variables
+
+    def _run(self, dcids: list[str]):
+        failed = False
+        try:
+            listings = fetch_available_variables(dcids, limit=PREFETCH_VARIABLE_LIMIT)
+            fetch_observations(dcids, ["Count_Person"], "LATEST")
+            fetch_variable_names(self._request_names(self._unnamed(_listed(listings))))
+        except requests.exceptions.RequestException:
+            failed = True
+        finally:
+            self._release(failed)
+
+    async def _run_async(self, dcids: list[str]):
+        failed = False
+        try:
+            listings, _ = await asyncio.gather(
+                fetch_available_variables_async(dcids, limit=PREFETCH_VARIABLE_LIMIT),
+                fetch_observations_async(dcids, ["Count_Person"], "LATEST"))
+            await fetch_variable_names_async(self._request_names(self._unnamed(_listed(listings))))
+        except requests.exceptions.RequestException:
+            failed = True
+        finally:
+            self._release(failed)
+
+    def _run_names(self, variables: list[str]):
+        failed = False
+        try:
+            fetch_variable_names(variables)
+        except requests.exceptions.RequestException:
+            failed = True
+        finally:
+            self._release(failed)
+
+    async def _run_names_async(self, variables: list[str]):
+        failed = False
+        try:
+            await fetch_variable_names_async(variables)
+        except requests.exceptions.RequestException:
+            failed = True
+        finally:
+            self._release(failed)
+
+    def _submit(self, run, items: list[str]):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_pending,
+                                                    thread_name_prefix="datcom-prefetch")
+        self._executor.submit(run, items)
+
+    def _create_task(self, coroutine):
+        # A fresh context keeps the prefetch out of the calling tool's span; the
+        # task copies the context it is created in (create_task's context=
+        # argument needs Python 3.11)
+        task = contextvars.Context().run(asyncio.get_running_loop().create_task, coroutine)
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def schedule(self, dcids: list[str]):
+        """Starts a background prefetch on a worker thread; returns immediately."""
+        dcids = self._claim(dcids)
+        if dcids is not None:
+            self._submit(self._run, dcids)
+
+    def schedule_async(self, dcids: list[str]):
+        """Starts a background prefetch task on the running event loop."""
+        dcids = self._claim(dcids)
+        if dcids is not None:
+            self._create_task(self._run_async(dcids))
+
+    def schedule_names(self, variables: list[str]):
+        """Fetches names of newly listed variables on a worker thread; returns immediately."""
+        variables = self._claim(self._unnamed(variables), DEFAULT_PREFETCH_MAX_NAMES)
+        if variables is not None:
+            self._submit(self._run_names, self._request_names(variables))
+
+    def schedule_names_async(self, variables: list[str]):
+        """Fetches names of newly listed variables in a task on the running event loop."""
+        variables = self._claim(self._unnamed(variables), DEFAULT_PREFETCH_MAX_NAMES)
+        if variables is not None:
+            self._create_task(self._run_names_async(self._request_names(variables)))
+
+    def stats(self) -> dict:
+        """Returns scheduled/dropped/failed counters and prefetches in flight."""
+        with self._lock:
+            return dict(self.counters, pending=self._pending)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Returns the process-wide Prefetcher."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
+
+
+def set_prefetcher(prefetcher: Prefetcher):
+    """Replaces the process-wide Prefetcher, e.g. with a disabled one."""
+    global _prefetcher
+    with _prefetcher_lock:
+        _prefetcher = prefetcher
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no cross-process buckets on Windows
+    fcntl = None
+
+from .telemetry import add_phase
+
+# Packed (tokens, updated_at) state of a file-backed bucket
+_STATE = struct.Struct("dd")
+
+
+def parse_limits(spec: str) -> dict:
+    """Parses "observation=10:20,resolve=5" into {endpoint: (rate, burst)}.
+
+    Rates are requests per second; burst defaults to max(1, rate). The
+    endpoint "*" applies to every endpoint without its own entry.
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        rate = float(rate)
+        limits[endpoint.strip()] = (rate, float(burst) if burst else max(1.0, rate))
+    return limits
+
+
+class TokenBucket:
+    """In-process token bucket that hands out tokens in arrival order.
+
+    A caller reserves a token and is told how long to wait for it. Tokens
+    may go negative: the deficit is the queue of callers already waiting,
+    so each new caller waits behind them instead of racing for the next
+    refill.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (float): Bucket capacity, i.e. requests allowed at once after idling.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _take(tokens: float, elapsed: float, rate: float, burst: float):
+        tokens = min(burst, tokens + elapsed * rate) - 1
+        return tokens, (-tokens / rate if tokens < 0 else 0.0)
+
+    def reserve(self) -> float:
+        """Takes one token and returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, delay = self._take(self._tokens, now - self._updated, self.rate, self.burst)
+            self._updated = now
+        return delay
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a file shared by several processes.
+
+    The state is two packed doubles updated under an exclusive flock, so
+    every worker process pointing at the same file draws from one bucket.
+    Wall-clock time is used because monotonic clocks are per process.
+
+    Args:
+        path (str): State file; created if missing.
+        rate (float): Tokens added per second.
+        burst (float): Bucket capacity.
+    """
+
+    def __init__(self, path: str, rate: float, burst: float):
+        if fcntl is None:
+            raise OSError("cross-process rate limiting needs fcntl (POSIX only)")
+        super().__init__(rate, burst)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def reserve(self) -> float:
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state = os.pread(self._fd, _STATE.size, 0)
+                tokens, updated = _STATE.unpack(state) if len(state) == _STATE.size else (self.burst, now)
+                tokens, delay = self._take(tokens, max(now - updated, 0.0), self.rate, self.burst)
+                os.pwrite(self._fd, _STATE.pack(tokens, now), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return delay
+
+    def close(self):
+        os.close(self._fd)
+
+
+class RateLimiter:
+    """Per-endpoint token buckets in front of every Data Commons request.
+
+    Endpoints without a configured limit are not throttled. Each acquire
+    records the time spent queued as the "rate_limit_wait" phase of the
+    current tool call and in per-endpoint wait metrics.
+
+    Args:
+        limits (dict, optional): {endpoint: (rate, burst)}; see parse_limits.
+                                 Defaults to $DATCOM_RATE_LIMITS.
+        state_dir (str, optional): Directory for cross-process bucket files.
+                                   Defaults to $DATCOM_RATE_LIMIT_DIR; unset
+                                   keeps the buckets in this process.
+    """
+
+    def __init__(self, limits: dict = None, state_dir: str = None):
+        if limits is None:
+            limits = parse_limits(os.getenv("DATCOM_RATE_LIMITS", ""))
+        self.limits = dict(limits)
+        self.state_dir = state_dir if state_dir is not None else os.getenv("DATCOM_RATE_LIMIT_DIR") or None
+        self._buckets = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, endpoint: str):
+        with self._lock:
+            if endpoint in self._buckets:
+                return self._buckets[endpoint]
+            limit = self.limits.get(endpoint, self.limits.get("*"))
+            bucket = None
+            if limit is not None:
+                rate, burst = limit
+                if self.state_dir:
+                    bucket = FileTokenBucket(os.path.join(self.state_dir, f"{endpoint}.bucket"), rate, burst)
+                else:
+                    bucket = TokenBucket(rate, burst)
+            self._buckets[endpoint] = bucket
+            return bucket
+
+    def _reserve(self, endpoint: str) -> float:
+        bucket = self._bucket(endpoint)
+        if bucket is None:
+            return 0.0
+        delay = bucket.reserve()
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                endpoint, {"acquired": 0, "waited": 0, "wait_s": 0.0, "max_wait_s": 0.0})
+            metrics["acquired"] += 1
+            if delay > 0:
+                metrics["waited"] += 1
+                metrics["wait_s"] += delay
+                metrics["max_wait_s"] = max(metrics["max_wait_s"], delay)
+        add_phase("rate_limit_wait", delay)
+        return delay
+
+    def acquire(self, endpoint: str):
+        """Blocks until a request to `endpoint` may be sent."""
+        delay = self._reserve(endpoint)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, endpoint: str):
+        """Async variant of acquire; waits without blocking the event loop."""
+        delay = self._reserve(endpoint)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Returns {endpoint: {acquired, waited, wait_s, max_wait_s, mean_wait_s}}."""
+        with self._lock:
+            stats = {endpoint: dict(metrics) for endpoint, metrics in self._metrics.items()}
+        for metrics in stats.values():
+            metrics["mean_wait_s"] = metrics["wait_s"] / metrics["acquired"]
+        return stats
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide RateLimiter shared by the sync and async clients."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def set_rate_limiter(limiter: RateLimiter):
+    """Replaces the process-wide RateLimiter."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
@@ -0,0 +1,488 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import requests
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.1
+DEFAULT_MAX_DELAY = 2.0
+
+# Hedging starts once an endpoint has this many latency samples
+HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_MIN_DELAY = 0.05
+# At most this fraction of requests may send a hedge, to bound extra load
+DEFAULT_HEDGE_BUDGET = 0.1
+# Hedges in flight at once; beyond this a slow attempt just keeps waiting
+DEFAULT_MAX_CONCURRENT_HEDGES = 32
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Circuit breaker defaults: trip when half of the last 20 requests (at least
+# 10) failed or took longer than 10s, and probe again after 30s
+DEFAULT_BREAKER_WINDOW = 20
+DEFAULT_BREAKER_MIN_CALLS = 10
+DEFAULT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_BREAKER_SLOW_SECONDS = 10.0
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request while an endpoint's circuit is open."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Returns whether a failed attempt is worth retrying.
+
+    Connection errors, timeouts, 429 and 5xx responses are transient; other
+    HTTP errors (bad request, not found, ...) are not.
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies for one endpoint."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float:
+        """Returns the q-th percentile (0-100) of the window, or 0.0 if empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(int(len(samples) * q / 100), len(samples) - 1)
+        return samples[index]
+
+
+class ResiliencePolicy:
+    """Bounded retries with decorrelated jitter, plus hedged requests.
+
+    Each attempt is retried on transient errors up to max_attempts times,
+    sleeping a decorrelated-jitter delay (uniform between base_delay and 3x
+    the previous delay, capped at max_delay) in between. Once an endpoint has
+    enough latency samples, an attempt still running after the endpoint's p95
+    latency gets a duplicate (hedged) request and the first success wins.
+    Hedges are limited to hedge_budget of all requests and to
+    max_concurrent_hedges in flight at once.
+
+    Args:
+        max_attempts (int, optional): Attempts per request, including the first.
+        base_delay (float, optional): Minimum retry delay in seconds.
+        max_delay (float, optional): Maximum retry delay in seconds.
+        hedge (bool, optional): Whether to send hedged requests.
+        hedge_min_delay (float, optional): Lower bound on the hedge delay in seconds.
+        hedge_budget (float, optional): Maximum fraction of requests that hedge.
+        max_concurrent_hedges (int, optional): Maximum hedges running at once.
+    """
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None,
+                 hedge: bool = None, hedge_min_delay: float = None, hedge_budget: float = None,
+                 max_concurrent_hedges: int = None):
+        self.max_attempts = max_attempts or int(os.getenv("DATCOM_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+        self.base_delay = base_delay if base_delay is not None else DEFAULT_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else DEFAULT_MAX_DELAY
+        self.hedge = hedge if hedge is not None else os.getenv("DATCOM_HEDGE", "1") != "0"
+        self.hedge_min_delay = (hedge_min_delay if hedge_min_delay is not None
+                                else float(os.getenv("DATCOM_HEDGE_MIN_DELAY", DEFAULT_HEDGE_MIN_DELAY)))
+        self.hedge_budget = hedge_budget if hedge_budget is not None else DEFAULT_HEDGE_BUDGET
+
+        self._hedge_slots = threading.BoundedSemaphore(max_concurrent_hedges or DEFAULT_MAX_CONCURRENT_HEDGES)
+
+        self._latency = {}
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def stats(self) -> dict:
+        """Returns request, attempt, retry and hedge counters plus per-endpoint p95."""
+        with self._lock:
+            counters = dict(self.counters)
+            trackers = dict(self._latency)
+        counters["p95_s"] = {endpoint: tracker.percentile(95) for endpoint, tracker in trackers.items()}
+        return counters
+
+    def _tracker(self, endpoint: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._latency.get(endpoint)
+            if tracker is None:
+                tracker = self._latency[endpoint] = LatencyTracker()
+            return tracker
+
+    def backoff(self, previous: float) -> float:
+        """Returns the next decorrelated-jitter delay after `previous` seconds."""
+        return min(self.max_delay, random.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+
+    def hedge_delay(self, endpoint: str):
+        """Returns seconds to wait before hedging, or None if hedging is off for now."""
+        if not self.hedge:
+            return None
+        tracker = self._tracker(endpoint)
+        if len(tracker) < HEDGE_MIN_SAMPLES:
+            return None
+        with self._lock:
+            if self.counters["hedges"] >= self.hedge_budget * self.counters["requests"]:
+                return None
+        return max(tracker.percentile(95), self.hedge_min_delay)
+
+    def _reserve_hedge(self) -> bool:
+        """Counts a hedge against the budget, or returns False if it is used up.
+
+        Reserving when the hedge is decided rather than after it is sent keeps
+        concurrent callers from all passing the budget check at once.
+        """
+        with self._lock:
+            if self.counters["hedges"] >= self.hedge_budget * self.counters["requests"]:
+                return False
+            self.counters["hedges"] += 1
+            return True
+
+    def _launch_hedge(self, attempt):
+        """Starts a hedged attempt on its own thread, or returns None if none can be sent."""
+        if not self._reserve_hedge():
+            return None
+        if not self._hedge_slots.acquire(blocking=False):
+            self._count("hedges", -1)
+            return None
+        future = _run_in_thread(attempt)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+
+    def call(self, endpoint: str, attempt, deadline: float, hedge: bool = True, discard=None):
+        """Runs a sync request with retries and hedging.
+
+        Args:
+            endpoint (str): Endpoint name, for latency tracking.
+            attempt (callable): Sends one attempt and returns its result.
+            deadline (float): Seconds after which an attempt counts as timed out.
+            hedge (bool, optional): False to only retry, e.g. for streamed
+                                    responses a losing hedge would leave open.
+            discard (callable, optional): Called with the result of an attempt
+                                          that finishes after its deadline, e.g.
+                                          to close a streamed response.
+
+        Raises:
+            requests.exceptions.RequestException: When every attempt failed.
+        """
+        self._count("requests")
+        delay = 0.0
+        for attempt_number in range(1, self.max_attempts + 1):
+            try:
+                return self._attempt(endpoint, attempt, deadline, hedge, discard)
+            except requests.exceptions.RequestException as e:
+                if attempt_number == self.max_attempts or not is_retryable(e):
+                    raise
+            self._count("retries")
+            delay = self.backoff(delay)
+            time.sleep(delay)
+
+    def _attempt(self, endpoint: str, attempt, deadline: float, hedge: bool, discard):
+        hedge_after = self.hedge_delay(endpoint) if hedge else None
+        self._count("attempts")
+        start = time.perf_counter()
+        if hedge_after is None:
+            # requests only bounds each socket read, so a response trickling in
+            # would never time out; run the attempt on its own thread and give up
+            # on it at the deadline, like the async path does
+            future = _run_in_thread(attempt)
+            done, _ = wait([future], timeout=deadline)
+            if not done:
+                if discard is not None:
+                    future.add_done_callback(lambda late: _discard_late(late, discard))
+                raise requests.exceptions.Timeout(f"{endpoint} request exceeded {deadline:.1f}s")
+            result = future.result()
+            self._tracker(endpoint).add(time.perf_counter() - start)
+            return result
+
+        # The primary gets its own thread like an unhedged attempt, so it never
+        # queues behind other callers while the hedge and deadline timers run
+        primary = _run_in_thread(attempt)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            self._tracker(endpoint).add(time.perf_counter() - start)
+            return primary.result()
+
+        hedged = self._launch_hedge(attempt)
+        pending = {primary} if hedged is None else {primary, hedged}
+        remaining = deadline - (time.perf_counter() - start)
+        error = None
+        while pending and remaining > 0:
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if future is hedged:
+                    self._count("hedge_wins")
+                self._tracker(endpoint).add(time.perf_counter() - start)
+                return result
+            remaining = deadline - (time.perf_counter() - start)
+        if error is not None and not pending:
+            raise error
+        raise requests.exceptions.Timeout(f"{endpoint} request exceeded {deadline:.1f}s")
+
+    async def call_async(self, endpoint: str, attempt, deadline: float, hedge: bool = True):
+        """Async variant of call; `attempt` returns a new coroutine per call."""
+        self._count("requests")
+        delay = 0.0
+        for attempt_number in range(1, self.max_attempts + 1):
+            try:
+                return await self._attempt_async(endpoint, attempt, deadline, hedge)
+            except requests.exceptions.RequestException as e:
+                if attempt_number == self.max_attempts or not is_retryable(e):
+                    raise
+            self._count("retries")
+            delay = self.backoff(delay)
+            await asyncio.sleep(delay)
+
+    async def _attempt_async(self, endpoint: str, attempt, deadline: float, hedge: bool):
+        hedge_after = self.hedge_delay(endpoint) if hedge else None
+        start = time.perf_counter()
+        self._count("attempts")
+        primary = asyncio.ensure_future(attempt())
+        tasks = {primary}
+        try:
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and self._reserve_hedge():
+                    tasks.add(asyncio.ensure_future(attempt()))
+
+            error = None
+            while tasks:
+                remaining = deadline - (time.perf_counter() - start)
+                if remaining <= 0:
+                    break
+                done, tasks = await asyncio.wait(tasks, timeout=remaining,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not primary:
+                        self._count("hedge_wins")
+                    self._tracker(endpoint).add(time.perf_counter() - start)
+                    return task.result()
+            if error is not None and not tasks:
+                raise error
+            raise requests.exceptions.Timeout(f"{endpoint} request exceeded {deadline:.1f}s")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def _run_in_thread(fn) -> Future:
+    """Starts fn() on a new daemon thread in a copy of the caller's context.
+
+    A dedicated thread rather than a shared pool, so attempts from many
+    callers never queue behind each other while their deadline runs.
+    """
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="datcom-attempt", daemon=True).start()
+    return future
+
+
+def _discard_late(future: Future, discard):
+    if future.exception() is None:
+        discard(future.result())
+
+
+class _Circuit:
+    def __init__(self, window: int):
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.trips = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker that trips on error rate or latency.
+
+    Outcomes of the last `window` requests are kept per endpoint. Once at
+    least `min_calls` are recorded and the share that failed (transient
+    errors only) or took longer than `slow_seconds` reaches `error_rate`,
+    the circuit opens and requests fail immediately with CircuitOpenError.
+    After `cooldown` seconds one probe request is let through (half-open):
+    success closes the circuit, failure opens it for another cooldown.
+
+    Args:
+        window (int, optional): Requests remembered per endpoint.
+        min_calls (int, optional): Requests needed before the circuit can trip.
+        error_rate (float, optional): Failed-or-slow share that trips it.
+        slow_seconds (float, optional): Latency above which a success counts as slow.
+        cooldown (float, optional): Seconds to stay open before probing.
+        enabled (bool, optional): False to never trip. Defaults to $DATCOM_BREAKER != "0".
+    """
+
+    def __init__(self, window: int = None, min_calls: int = None, error_rate: float = None,
+                 slow_seconds: float = None, cooldown: float = None, enabled: bool = None):
+        self.window = window or DEFAULT_BREAKER_WINDOW
+        self.min_calls = min_calls or DEFAULT_BREAKER_MIN_CALLS
+        self.error_rate = error_rate or float(os.getenv("DATCOM_BREAKER_ERROR_RATE",
+                                                        DEFAULT_BREAKER_ERROR_RATE))
+        self.slow_seconds = slow_seconds or float(os.getenv("DATCOM_BREAKER_SLOW_SECONDS",
+                                                            DEFAULT_BREAKER_SLOW_SECONDS))
+        self.cooldown = (cooldown if cooldown is not None
+                         else float(os.getenv("DATCOM_BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN)))
+        self.enabled = enabled if enabled is not None else os.getenv("DATCOM_BREAKER", "1") != "0"
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, endpoint: str) -> _Circuit:
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit(self.window)
+        return circuit
+
+    def state(self, endpoint: str) -> str:
+        """Returns "closed", "open" or "half_open" for an endpoint."""
+        with self._lock:
+            return self._circuit(endpoint).state
+
+    def before(self, endpoint: str):
+        """Checks that a request may be sent.
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or half-open with a
+                              probe already in flight.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == "closed":
+                return
+            if circuit.state == "open" and now - circuit.opened_at >= self.cooldown:
+                circuit.state = "half_open"
+            # A probe that never reported back (e.g. was cancelled) is replaced
+            # after another cooldown
+            if circuit.state == "half_open" and (circuit.probe_started is None
+                                                 or now - circuit.probe_started >= self.cooldown):
+                circuit.probe_started = now
+                return
+            circuit.rejected += 1
+            retry_in = max(self.cooldown - (now - circuit.opened_at), 0.0)
+        raise CircuitOpenError(f"Data Commons {endpoint} is unavailable; not retrying for {retry_in:.0f}s")
+
+    def record(self, endpoint: str, ok: bool, seconds: float):
+        """Records the outcome of a request let through by before()."""
+        if not self.enabled:
+            return
+        bad = not ok or seconds > self.slow_seconds
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == "half_open":
+                circuit.probe_started = None
+                if bad:
+                    circuit.state = "open"
+                    circuit.opened_at = time.monotonic()
+                    circuit.trips += 1
+                else:
+                    circuit.state = "closed"
+                    circuit.outcomes.clear()
+                return
+            circuit.outcomes.append(bad)
+            if (circuit.state == "closed" and len(circuit.outcomes) >= self.min_calls
+                    and sum(circuit.outcomes) >= self.error_rate * len(circuit.outcomes)):
+                circuit.state = "open"
+                circuit.opened_at = time.monotonic()
+                circuit.trips += 1
+
+    def call(self, endpoint: str, send):
+        """Runs `send()` if the circuit allows it and records the outcome.
+
+        Only transient errors (see is_retryable) count as failures.
+        """
+        self.before(endpoint)
+        start = time.perf_counter()
+        try:
+            result = send()
+        except requests.exceptions.RequestException as e:
+            self.record(endpoint, not is_retryable(e), time.perf_counter() - start)
+            raise
+        self.record(endpoint, True, time.perf_counter() - start)
+        return result
+
+    async def call_async(self, endpoint: str, send):
+        """Async variant of call; `send` returns a coroutine."""
+        self.before(endpoint)
+        start = time.perf_counter()
+        try:
+            result = await send()
+        except requests.exceptions.RequestException as e:
+            self.record(endpoint, not is_retryable(e), time.perf_counter() - start)
+            raise
+        self.record(endpoint, True, time.perf_counter() - start)
+        return result
+
+    def stats(self) -> dict:
+        """Returns {endpoint: {state, trips, rejected, recent_failure_rate}}."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "state": circuit.state,
+                    "trips": circuit.trips,
+                    "rejected": circuit.rejected,
+                    "recent_failure_rate": (sum(circuit.outcomes) / len(circuit.outcomes)
+                                            if circuit.outcomes else 0.0),
+                }
+                for endpoint, circuit in self._circuits.items()
+            }
+
+
+_policy = None
+_policy_lock = threading.Lock()
+_breaker = None
+
+
+def get_resilience_policy() -> ResiliencePolicy:
+    """Returns the process-wide ResiliencePolicy shared by the sync and async clients."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = ResiliencePolicy()
+    return _policy
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Returns the process-wide CircuitBreaker shared by the sync and async clients."""
+    global _breaker
+    if _breaker is None:
+        with _policy_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
@@ -0,0 +1,297 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import DEFAULT_CACHE_DIR
+
+DEFAULT_RESULT_MEMORY_ENTRIES = 128
+DEFAULT_RESULT_TTL = 24 * 60 * 60
+# Expired result files are swept once every this many stores
+_SWEEP_EVERY = 100
+
+_HANDLE = re.compile(r"^[0-9a-f]{16}$")
+_CONDITION = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<|~)\s*(.*?)\s*$")
+
+AGGREGATES = ("count", "sum", "mean", "min", "max")
+
+
+class ResultStore:
+    """Content-addressed store of tool results kept outside the LLM context.
+
+    A result is saved under a handle derived from a hash of its content, so
+    storing the same result twice yields the same handle. Results are
+    written as gzipped JSON files under `directory`, so handles still work
+    after a restart and in other worker processes sharing the directory.
+    Recently used results are also kept in memory. Files older than `ttl`
+    are deleted from time to time.
+
+    Args:
+        directory (str, optional): Where result files go. Defaults to
+                                   $DATCOM_RESULT_DIR or $DATCOM_CACHE_DIR/results;
+                                   "" keeps results in memory only.
+        max_entries (int, optional): Results kept in memory. Defaults to
+                                     $DATCOM_OUTPUT_HANDLES or 128.
+        ttl (float, optional): Seconds a result file is kept. Defaults to
+                               $DATCOM_RESULT_TTL or one day.
+    """
+
+    def __init__(self, directory: str = None, max_entries: int = None, ttl: float = None):
+        if directory is None:
+            directory = os.getenv("DATCOM_RESULT_DIR") or os.path.join(
+                os.getenv("DATCOM_CACHE_DIR", DEFAULT_CACHE_DIR), "results")
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries or int(os.getenv("DATCOM_OUTPUT_HANDLES",
+                                                        DEFAULT_RESULT_MEMORY_ENTRIES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("DATCOM_RESULT_TTL", DEFAULT_RESULT_TTL))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, f"{handle}.json.gz")
+
+    def put(self, entry: dict) -> str:
+        """Stores a JSON-serializable entry and returns its handle."""
+        encoded = json.dumps(entry, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        handle = hashlib.sha256(encoded).hexdigest()[:16]
+        self._remember(handle, entry)
+        if self.directory:
+            path = self._path(handle)
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with gzip.open(temp, "wb") as f:
+                    f.write(encoded)
+                os.replace(temp, path)
+            with self._lock:
+                self._puts += 1
+                sweep = self._puts % _SWEEP_EVERY == 0
+            if sweep:
+                self.sweep()
+        return handle
+
+    def get(self, handle: str):
+        """Returns the entry for a handle, or None if unknown or expired."""
+        if not _HANDLE.match(handle or ""):
+            return None
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None:
+                self._entries.move_to_end(handle)
+                return entry
+        if not self.directory:
+            return None
+        try:
+            with gzip.open(self._path(handle), "rb") as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        self._remember(handle, entry)
+        return entry
+
+    def _remember(self, handle: str, entry: dict):
+        with self._lock:
+            self._entries[handle] = entry
+            self._entries.move_to_end(handle)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def sweep(self) -> int:
+        """Deletes result files older than the TTL.
+
+        Returns:
+            int: Number of files deleted.
+        """
+        if not self.directory:
+            return 0
+        cutoff = time.time() - self.ttl
+        deleted = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    deleted += 1
+            except OSError:
+                pass
+        return deleted
+
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _matches(cell, op: str, operand: str) -> bool:
+    if op == "~":
+        return cell is not None and operand.casefold() in str(cell).casefold()
+    if _number(cell):
+        try:
+            target = float(operand)
+        except ValueError:
+            if op in ("=", "!="):
+                return op == "!="
+            raise ValueError(f"Cannot compare numbers with {operand!r}") from None
+    else:
+        if cell is None:
+            return op == "!="
+        cell, target = str(cell), operand
+    if op == "=":
+        return cell == target
+    if op == "!=":
+        return cell != target
+    if op == ">":
+        return cell > target
+    if op == ">=":
+        return cell >= target
+    if op == "<":
+        return cell < target
+    return cell <= target
+
+
+class ResultSet:
+    """Rows of a stored result with the columns named in `header`.
+
+    Args:
+        header (list[str]): Column names.
+        rows (list[list]): Rows, one value per column.
+    """
+
+    def __init__(self, header: list[str], rows: list):
+        self.header = list(header)
+        self.rows = rows
+
+    def column(self, name: str) -> int:
+        """Returns the position of a column.
+
+        Raises:
+            ValueError: If there is no such column.
+        """
+        try:
+            return self.header.index(name.strip())
+        except ValueError:
+            raise ValueError(f"Unknown column {name!r}; columns are {', '.join(self.header)}") from None
+
+    def filter(self, filters: str) -> "ResultSet":
+        """Keeps rows matching every condition in a ";"-separated list.
+
+        Conditions look like "variable=Count_Person", "value>=1000000" or
+        "place~geoId/06" (contains). Numeric columns compare as numbers.
+
+        Raises:
+            ValueError: If a condition cannot be parsed or names no column.
+        """
+        conditions = []
+        for text in (filters or "").split(";"):
+            if not text.strip():
+                continue
+            match = _CONDITION.match(text)
+            if match is None:
+                raise ValueError(f"Cannot parse filter {text.strip()!r}; "
+                                 "use e.g. value>1000 or variable=Count_Person")
+            name, op, operand = match.groups()
+            conditions.append((self.column(name), op, operand))
+        if not conditions:
+            return self
+        return ResultSet(self.header, [row for row in self.rows
+                                       if all(_matches(row[i], op, operand) for i, op, operand in conditions)])
+
+    def sort(self, column: str, descending: bool = False) -> "ResultSet":
+        """Returns the rows ordered by a column; empty cells always come last.
+
+        Numbers sort before text when a column holds both, in either direction.
+        """
+        if not column:
+            return self
+        i = self.column(column)
+        numbers = sorted((row for row in self.rows if _number(row[i])), key=lambda row: row[i],
+                         reverse=descending)
+        text = sorted((row for row in self.rows if row[i] is not None and not _number(row[i])),
+                      key=lambda row: str(row[i]), reverse=descending)
+        return ResultSet(self.header, numbers + text + [row for row in self.rows if row[i] is None])
+
+    def aggregate(self, function: str, column: str = "value", group_by: str = "") -> "ResultSet":
+        """Reduces a column per group with count, sum, mean, min or max.
+
+        Args:
+            function (str): One of AGGREGATES.
+            column (str, optional): Column to reduce. Defaults to "value".
+            group_by (str, optional): Comma-separated grouping columns; empty
+                                      reduces all rows to one.
+
+        Raises:
+            ValueError: If the function or a column is unknown.
+        """
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {function!r}; use one of {', '.join(AGGREGATES)}")
+        i = self.column(column)
+        keys = [self.column(name) for name in group_by.split(",") if name.strip()]
+        groups = {}
+        for row in self.rows:
+            groups.setdefault(tuple(row[k] for k in keys), []).append(row[i])
+        rows = []
+        for group, cells in groups.items():
+            values = [cell for cell in cells if _number(cell)]
+            if function == "count":
+                result = len(cells)
+            elif not values:
+                result = None
+            elif function == "sum":
+                result = sum(values)
+            elif function == "mean":
+                result = round(sum(values) / len(values), 4)
+            else:
+                result = min(values) if function == "min" else max(values)
+            rows.append(list(group) + [result])
+        return ResultSet([self.header[k] for k in keys] + [f"{function}_{self.header[i]}"], rows)
+
+    def page(self, offset: int = 0, limit: int = 50) -> tuple["ResultSet", int]:
+        """Returns rows [offset, offset + limit) and the next offset, or None at the end."""
+        end = offset + limit
+        return ResultSet(self.header, self.rows[offset:end]), (end if end < len(self.rows) else None)
+
+    def summary(self, preview: int = 5) -> dict:
+        """Describes the rows without returning them all.
+
+        Returns:
+            dict: row count, columns, distinct counts of text columns, count,
+                  min, max and mean of numeric columns, and the first rows.
+        """
+        summary = {"rows": len(self.rows), "columns": self.header, "distinct": {}, "numeric": {}}
+        for i, name in enumerate(self.header):
+            cells = [row[i] for row in self.rows if row[i] is not None]
+            if cells and all(_number(cell) for cell in cells):
+                summary["numeric"][name] = {"count": len(cells), "min": min(cells), "max": max(cells),
+                                            "mean": round(sum(cells) / len(cells), 4)}
+            else:
+                summary["distinct"][name] = len(set(cells))
+        summary["preview"] = self.rows[:preview]
+        return summary
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Returns the process-wide ResultStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultStore()
+    return _store
+
+
+def set_result_store(store: ResultStore):
+    """Replaces the process-wide ResultStore, e.g. with an in-memory one."""
+    global _store
+    with _store_lock:
+        _store = store
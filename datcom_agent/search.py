@@ -0,0 +1,246 @@
+import bisect
+import csv
+import math
+import re
+import threading
+
+from .cache import get_variable_list_cache
+from .store import get_local_store, strip_dcid_prefix
+
+# "Count_Person_IncomeOf10000To14999USDollar" -> count, person, income, of, 10000, ...
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+(?:\.\d+)?")
+
+STOPWORDS = frozenset(
+    "a an and are as at by do does for from has have how in is many much of on or per that the "
+    "their there to what which who with".split())
+
+# Everyday words mapped to the terms Data Commons DCIDs use
+SYNONYMS = {
+    "population": ("count", "person"),
+    "people": ("person",),
+    "residents": ("person",),
+    "inhabitants": ("person",),
+    "number": ("count",),
+    "salary": ("income",),
+    "earnings": ("income",),
+    "poor": ("poverty",),
+    "moved": ("different", "house"),
+    "foreign": ("abroad",),
+    "age": ("years",),
+    "old": ("years",),
+}
+
+_GRAM = 3
+# Weights of exact, prefix and fuzzy (trigram) matches of a query term
+_PREFIX_WEIGHT = 0.8
+_FUZZY_WEIGHT = 0.6
+_MIN_FUZZY_SIMILARITY = 0.5
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+# Query terms are stemmed before the lookup, so the keys must be too
+_STEMMED_SYNONYMS = {_stem(word): terms for word, terms in SYNONYMS.items()}
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits a DCID, name or query into lowercase, lightly stemmed terms.
+
+    CamelCase, underscores, punctuation and digit runs all separate terms,
+    and stopwords are dropped.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if word not in STOPWORDS:
+            terms.append(_stem(word))
+    return terms
+
+
+def _grams(token: str) -> set[str]:
+    padded = f"^{token}$"
+    return {padded[i:i + _GRAM] for i in range(len(padded) - _GRAM + 1)}
+
+
+class StatVarIndex:
+    """In-memory inverted index for ranking statistical variables against a query.
+
+    Each variable is indexed under the terms of its DCID and, once fetched
+    (see observations.fetch_variable_names), its name. Query terms match index terms exactly, as a prefix ("pov" ->
+    "poverty") or by character-trigram similarity (typos), and matches are
+    weighted by inverse document frequency. Shorter variables win ties, so
+    "population" ranks Count_Person above its breakdowns. Variables can be
+    added at any time; the index updates incrementally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._dcids = []
+        self._names = []
+        self._lengths = []
+        self._postings = {}
+        self._vocabulary = []
+        self._gram_postings = {}
+
+    def __len__(self) -> int:
+        return len(self._dcids)
+
+    def __contains__(self, dcid: str) -> bool:
+        return dcid in self._ids
+
+    def _add_term(self, term: str, doc: int) -> bool:
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = set()
+            bisect.insort(self._vocabulary, term)
+            for gram in _grams(term):
+                self._gram_postings.setdefault(gram, set()).add(term)
+        if doc in postings:
+            return False
+        postings.add(doc)
+        return True
+
+    def add(self, dcid: str, name: str = None):
+        """Indexes a variable, or adds a name to one already indexed."""
+        dcid = strip_dcid_prefix(dcid)
+        if not dcid:
+            return
+        with self._lock:
+            doc = self._ids.get(dcid)
+            if doc is None:
+                doc = self._ids[dcid] = len(self._dcids)
+                self._dcids.append(dcid)
+                self._names.append(None)
+                self._lengths.append(0)
+                text = dcid
+            elif name and not self._names[doc]:
+                text = ""
+            else:
+                return
+            if name:
+                self._names[doc] = name
+                text = f"{text} {name}"
+            self._lengths[doc] += sum(self._add_term(term, doc) for term in tokenize(text))
+
+    def name(self, dcid: str):
+        """Returns the name indexed for a variable, or None if it has none yet."""
+        with self._lock:
+            doc = self._ids.get(dcid)
+            return self._names[doc] if doc is not None else None
+
+    def add_many(self, dcids):
+        """Indexes several variable DCIDs."""
+        for dcid in dcids:
+            if dcid not in self._ids:
+                self.add(dcid)
+
+    def load_csv(self, path: str) -> int:
+        """Indexes the StatVar column of a Year,Place,StatVar,Quantity,Unit CSV file.
+
+        Returns:
+            int: Number of variables now in the index.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            self.add_many(row["StatVar"] for row in csv.DictReader(f) if row.get("StatVar"))
+        return len(self)
+
+    def _matches(self, term: str) -> dict:
+        """Returns {index term: weight} for one query term."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = 1.0
+        if len(term) >= 3:
+            start = bisect.bisect_left(self._vocabulary, term)
+            for candidate in self._vocabulary[start:start + 50]:
+                if not candidate.startswith(term):
+                    break
+                matches.setdefault(candidate, _PREFIX_WEIGHT)
+        if not matches and len(term) >= 4:
+            grams = _grams(term)
+            overlap = {}
+            for gram in grams:
+                for candidate in self._gram_postings.get(gram, ()):
+                    overlap[candidate] = overlap.get(candidate, 0) + 1
+            for candidate, shared in overlap.items():
+                similarity = shared / len(grams | _grams(candidate))
+                if similarity >= _MIN_FUZZY_SIMILARITY:
+                    matches[candidate] = _FUZZY_WEIGHT * similarity
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Ranks indexed variables against a natural-language query.
+
+        Args:
+            query (str): Free text such as "people who moved from abroad".
+            limit (int, optional): Maximum results. Defaults to 10.
+
+        Returns:
+            list[dict]: {"dcid", "name", "score"} best first.
+        """
+        terms = []
+        for term in tokenize(query):
+            terms.extend(_STEMMED_SYNONYMS.get(term, (term,)))
+        terms = list(dict.fromkeys(terms))
+
+        with self._lock:
+            total = len(self._dcids)
+            if not total or not terms:
+                return []
+            scores = {}
+            matched = {}
+            for term in terms:
+                best = {}
+                for candidate, weight in self._matches(term).items():
+                    postings = self._postings[candidate]
+                    idf = math.log(1 + total / len(postings))
+                    for doc in postings:
+                        if weight * idf > best.get(doc, 0.0):
+                            best[doc] = weight * idf
+                for doc, score in best.items():
+                    scores[doc] = scores.get(doc, 0.0) + score
+                    matched[doc] = matched.get(doc, 0) + 1
+
+            ranked = []
+            for doc, score in scores.items():
+                # Reward covering more of the query, and prefer general variables
+                coverage = matched[doc] / len(terms)
+                ranked.append((score * coverage / (1 + 0.05 * self._lengths[doc]), doc))
+            ranked.sort(key=lambda item: (-item[0], self._dcids[item[1]]))
+            return [{"dcid": self._dcids[doc], "name": self._names[doc], "score": round(score, 4)}
+                    for score, doc in ranked[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_statvar_index() -> StatVarIndex:
+    """Returns the process-wide StatVarIndex.
+
+    On first use it is seeded with every variable in the local observation
+    store (the $DATCOM_LOCAL_DATA CSV files) and in cached variable listings;
+    listings fetched later are added as they arrive.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = StatVarIndex()
+                index.add_many(get_local_store().statvars())
+                index.add_many(get_variable_list_cache().variables())
+                _index = index
+    return _index
+
+
+def set_statvar_index(index: StatVarIndex):
+    """Replaces the process-wide StatVarIndex."""
+    global _index
+    with _index_lock:
+        _index = index
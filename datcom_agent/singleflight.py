@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+
+
+def request_key(method: str, endpoint: str, params, body) -> tuple:
+    """Returns a key under which equivalent requests compare equal.
+
+    Parameter order does not matter to the API, so query pairs are sorted,
+    and a JSON body is serialized with sorted keys and sorted DCID lists.
+    """
+    if isinstance(params, dict):
+        params = [(key, item) for key, value in params.items()
+                  for item in (value if isinstance(value, (list, tuple)) else [value])]
+    normalized_params = tuple(sorted((str(key), str(value)) for key, value in params or []))
+    normalized_body = json.dumps(_normalize(body), sort_keys=True) if body is not None else None
+    return method.upper(), endpoint, normalized_params, normalized_body
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(item) for item in value]
+        return sorted(items) if all(isinstance(item, str) for item in items) else items
+    return value
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls from several threads into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result object (or the same
+    exception), so results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """Runs fn() once per in-flight key and returns its result to every caller."""
+        with self._lock:
+            self.counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+
+class AsyncSingleFlight:
+    """Asyncio variant of SingleFlight for one event loop.
+
+    The shared call runs as its own task and every caller awaits it through
+    asyncio.shield, so cancelling one caller does not cancel the request
+    for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.counters = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key, fn):
+        """Awaits fn() once per in-flight key and returns its result to every caller."""
+        self.counters["calls"] += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return dict(self.counters, in_flight=len(self._tasks))
@@ -0,0 +1,417 @@
+"""Local stand-in for the Data Commons v2 REST API, for offline testing and benchmarks.
+
+Implements /v2/resolve, /v2/node names and /v2/observation (GET and JSON
+POST, including contained-in-place entity expressions) with the response shapes the agent
+tools parse. Data comes from census CSV files or a synthetic generator, and
+latency and failures can be injected.
+
+Run it and point the tools at it with DATCOM_BASE_URL:
+
+    python -m datcom_agent.standin --csv data/test_census_data.csv --port 8123
+    DATCOM_BASE_URL=http://127.0.0.1:8123/v2 adk web
+"""
+import argparse
+import csv
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .store import strip_dcid_prefix
+
+FACET_ID = "1"
+FACETS = {FACET_ID: {"importName": "StandIn", "provenanceUrl": "http://localhost/"}}
+
+# A few well-known names so resolution works with real-looking queries
+KNOWN_PLACES = {
+    "united states": "country/USA",
+    "usa": "country/USA",
+    "california": "geoId/06",
+    "texas": "geoId/48",
+    "new york": "geoId/36",
+}
+
+KNOWN_VARIABLES = {
+    "Count_Person": "Total population",
+}
+
+
+# "geoId/06<-containedInPlace+{typeOf:County}"
+CONTAINED_IN = re.compile(r"^(?P<parent>[^<]+)<-containedInPlace\+?\{typeOf:(?P<type>\w+)\}$")
+
+
+def place_parents(dcid: str) -> tuple[str, list[str]]:
+    """Returns a place's type and ancestors, derived from its geoId FIPS code.
+
+    geoId/06 is a State in country/USA, geoId/06085 a County and
+    geoId/0668000 a City in geoId/06 (and country/USA).
+    """
+    if dcid.startswith("geoId/") and dcid[6:].isdigit():
+        code = dcid[6:]
+        if len(code) == 2:
+            return "State", ["country/USA"]
+        if len(code) == 5:
+            return "County", [f"geoId/{code[:2]}", "country/USA"]
+        if len(code) == 7:
+            return "City", [f"geoId/{code[:2]}", "country/USA"]
+    if dcid == "country/USA":
+        return "Country", []
+    return "Place", []
+
+
+class StandInData:
+    """Observations and place names served by the stand-in.
+
+    Observations are stored as series[variable][entity] = [(date, value), ...]
+    sorted newest first.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.entities = set()
+        self.names = dict(KNOWN_PLACES)
+        self.variable_names = dict(KNOWN_VARIABLES)
+
+    def add(self, entity: str, variable: str, date: str, value: float):
+        """Adds one observation."""
+        self.entities.add(entity)
+        points = self.series.setdefault(variable, {}).setdefault(entity, [])
+        points.append((date, value))
+        points.sort(reverse=True)
+
+    def add_name(self, name: str, dcid: str):
+        """Makes `name` resolve to `dcid`."""
+        self.names[" ".join(name.split()).casefold()] = dcid
+
+    def add_variable_name(self, dcid: str, name: str):
+        """Sets the name /v2/node returns for a variable."""
+        self.variable_names[dcid] = name
+
+    def load_csv(self, path: str) -> "StandInData":
+        """Loads a Year,Place,StatVar,Quantity,Unit CSV file."""
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    value = float(row["Quantity"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if value.is_integer():
+                    value = int(value)
+                self.add(strip_dcid_prefix(row["Place"]), strip_dcid_prefix(row["StatVar"]),
+                         row["Year"].strip(), value)
+        return self
+
+    @classmethod
+    def synthetic(cls, places: int = 100, variables: int = 20, years: int = 5,
+                  seed: int = 0) -> "SyntheticData":
+        """Returns generated data; see SyntheticData."""
+        return SyntheticData(places, variables, years, seed)
+
+    def points(self, variable: str, entity: str) -> list:
+        """Returns the (date, value) points of one series, newest first."""
+        return self.series.get(variable, {}).get(entity)
+
+    def variables(self) -> list[str]:
+        """Returns every variable DCID."""
+        return list(self.series)
+
+    def contained_in(self, parent: str, place_type: str) -> list[str]:
+        """Returns the places of a type within a parent, at any depth, sorted."""
+        children = []
+        for entity in self.entities:
+            entity_type, ancestors = place_parents(entity)
+            if entity_type == place_type and parent in ancestors:
+                children.append(entity)
+        return sorted(children)
+
+    def lookup_name(self, node: str):
+        """Returns the DCID a place name or DCID resolves to, or None."""
+        dcid = self.names.get(" ".join(node.split()).casefold())
+        if dcid is None and node in self.entities:
+            dcid = node
+        return dcid
+
+    def variable_name(self, dcid: str):
+        """Returns a variable's name, or None."""
+        return self.variable_names.get(dcid)
+
+    def node(self, nodes: list[str], prop: str) -> dict:
+        """Builds a /v2/node response; only the "->name" property of variables is known."""
+        data = {}
+        for node in nodes:
+            name = self.variable_name(node) if prop == "->name" else None
+            data[node] = {"arcs": {"name": {"nodes": [{"value": name}]}}} if name else {}
+        return {"data": data}
+
+    def resolve(self, nodes: list[str]) -> dict:
+        """Builds a /v2/resolve response."""
+        entities = []
+        for node in nodes:
+            dcid = self.lookup_name(node)
+            entity = {"node": node}
+            if dcid:
+                entity["candidates"] = [{"dcid": dcid}]
+            entities.append(entity)
+        return {"entities": entities}
+
+    def observation(self, entities: list[str], variables: list[str], date: str, select: list[str],
+                    page_size: int = 0, page_token: str = "") -> dict:
+        """Builds a /v2/observation response.
+
+        An empty variables list means every variable with data for the
+        entities, in DCID order. date "LATEST" keeps the newest point, ""
+        keeps all points. With a page_size, listings of every variable return
+        at most that many variables per response, and "nextToken" points at
+        the next page.
+        """
+        with_values = "value" in select
+        by_variable = {}
+        candidates = variables or sorted(self.variables())
+        start = int(page_token or 0)
+        next_token = None
+        for position in range(start, len(candidates)):
+            if page_size and not variables and len(by_variable) == page_size:
+                next_token = str(position)
+                break
+            variable = candidates[position]
+            by_entity = {}
+            for entity in entities:
+                points = self.points(variable, entity)
+                if not points:
+                    continue
+                if date == "LATEST":
+                    points = points[:1]
+                elif date:
+                    points = [p for p in points if p[0] == date]
+                if not points:
+                    continue
+                if not with_values:
+                    by_entity[entity] = {}
+                    continue
+                by_entity[entity] = {"orderedFacets": [{
+                    "facetId": FACET_ID,
+                    "earliestDate": points[-1][0],
+                    "latestDate": points[0][0],
+                    "obsCount": len(points),
+                    "observations": [{"date": d, "value": v} for d, v in points],
+                }]}
+            if by_entity or variables:
+                by_variable[variable] = {"byEntity": by_entity}
+        response = {"byVariable": by_variable}
+        if with_values:
+            response["facets"] = FACETS
+        if next_token is not None:
+            response["nextToken"] = next_token
+        return response
+
+
+class SyntheticData(StandInData):
+    """Generated data computed on demand, so large benchmarks need no memory.
+
+    Serves places geoId/00000.. (named "Place N") x variables Count_Person,
+    Synthetic_1.. (named "Synthetic variable N") x the last `years` years up to 2024. Values are
+    deterministic for a given seed.
+    """
+
+    def __init__(self, places: int = 100, variables: int = 20, years: int = 5, seed: int = 0):
+        super().__init__()
+        self.place_count = places
+        self.variable_dcids = ["Count_Person"] + [f"Synthetic_{j}" for j in range(1, variables)]
+        self._variable_set = set(self.variable_dcids)
+        self.years = [str(year) for year in range(2024, 2024 - years, -1)]
+        self.seed = seed
+
+    def _place_index(self, entity: str):
+        if entity.startswith("geoId/") and len(entity) == 11 and entity[6:].isdigit():
+            index = int(entity[6:])
+            if index < self.place_count:
+                return index
+        return None
+
+    def points(self, variable: str, entity: str) -> list:
+        index = self._place_index(entity)
+        if index is None or variable not in self._variable_set:
+            return super().points(variable, entity)
+        rng = random.Random(f"{self.seed}:{variable}:{index}")
+        base = rng.randint(1_000, 10_000_000)
+        return [(year, base + rng.randint(-1000, 1000)) for year in self.years]
+
+    def variables(self) -> list[str]:
+        return self.variable_dcids + [v for v in super().variables() if v not in self._variable_set]
+
+    def variable_name(self, dcid: str):
+        if dcid in self._variable_set and dcid.startswith("Synthetic_"):
+            return f"Synthetic variable {dcid[10:]}"
+        return super().variable_name(dcid)
+
+    def contained_in(self, parent: str, place_type: str) -> list[str]:
+        # Generated places are the counties geoId/00000.. of state geoId/00
+        children = super().contained_in(parent, place_type)
+        if place_type == "County" and parent in ("geoId/00", "country/USA"):
+            children = sorted(set(children).union(f"geoId/{i:05d}" for i in range(self.place_count)))
+        return children
+
+    def lookup_name(self, node: str):
+        name = " ".join(node.split()).casefold()
+        if name.startswith("place ") and name[6:].isdigit() and int(name[6:]) < self.place_count:
+            return f"geoId/{int(name[6:]):05d}"
+        if self._place_index(node) is not None:
+            return node
+        return super().lookup_name(node)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one write without Nagle delays, so small
+    # responses are not held back by delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    server: "StandInServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, path: str, query: dict, body: dict):
+        server = self.server
+        server.count(path)
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.failure_rate and random.random() < server.failure_rate:
+            self._send_json(503, {"code": 14, "message": "injected failure"})
+            return
+
+        if path.endswith("/resolve"):
+            nodes = body.get("nodes") or query.get("nodes", [])
+            self._send_json(200, server.data.resolve(nodes))
+        elif path.endswith("/node"):
+            nodes = body.get("nodes") or query.get("nodes", [])
+            prop = body.get("property") or query.get("property", [""])[0]
+            self._send_json(200, server.data.node(nodes, prop))
+        elif path.endswith("/observation"):
+            if body:
+                entities = body.get("entity", {}).get("dcids", [])
+                expression = body.get("entity", {}).get("expression", "")
+                variables = body.get("variable", {}).get("dcids", [])
+                date = body.get("date", "")
+                select = body.get("select", [])
+                token = body.get("nextToken", "")
+            else:
+                entities = query.get("entity.dcids", [])
+                expression = query.get("entity.expression", [""])[0]
+                variables = query.get("variable.dcids", [])
+                date = query.get("date", [""])[0]
+                select = query.get("select", [])
+                token = query.get("nextToken", [""])[0]
+            if expression:
+                match = CONTAINED_IN.match(expression)
+                if not match:
+                    self._send_json(400, {"code": 3, "message": f"unsupported expression {expression}"})
+                    return
+                entities = server.data.contained_in(match["parent"], match["type"])
+            self._send_json(200, server.data.observation(entities, variables, date, select,
+                                                         server.page_size, token))
+        else:
+            self._send_json(404, {"code": 5, "message": f"unknown path {path}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._handle(url.path, parse_qs(url.query), {})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self._handle(url.path, parse_qs(url.query), body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded stand-in API server.
+
+    Args:
+        data (StandInData): Data to serve.
+        host (str, optional): Bind address. Defaults to 127.0.0.1.
+        port (int, optional): Port, 0 for any free port.
+        latency (float, optional): Seconds added to every response.
+        jitter (float, optional): Extra uniform random latency, in seconds.
+        failure_rate (float, optional): Fraction of requests answered with 503.
+        page_size (int, optional): Variables per /observation page, 0 for no paging.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, data: StandInData, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 page_size: int = 0):
+        super().__init__((host, port), _Handler)
+        self.data = data
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.page_size = page_size
+        self.requests_by_path = {}
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as DATCOM_BASE_URL."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def count(self, path: str):
+        with self._count_lock:
+            self.requests_by_path[path] = self.requests_by_path.get(path, 0) + 1
+
+    def start(self) -> "StandInServer":
+        """Serves in a background daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Data Commons v2 API.")
+    parser.add_argument("--csv", action="append", default=[],
+                        help="Year,Place,StatVar,Quantity,Unit file to serve (repeatable)")
+    parser.add_argument("--synthetic", type=int, nargs=2, metavar=("PLACES", "VARIABLES"),
+                        help="serve generated data instead of / in addition to CSV files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--page-size", type=int, default=0, help="variables per observation page")
+    args = parser.parse_args()
+
+    data = StandInData.synthetic(*args.synthetic) if args.synthetic else StandInData()
+    for path in args.csv:
+        data.load_csv(path)
+    server = StandInServer(data, args.host, args.port, args.latency, args.jitter, args.failure_rate,
+                           args.page_size)
+    print(f"Serving Data Commons stand-in at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import csv
+import os
+import threading
+from array import array
+
+
+def strip_dcid_prefix(dcid: str) -> str:
+    """Strips the "dcid:" prefix used in CSV exports ("dcid:Count_Person" -> "Count_Person")."""
+    dcid = dcid.strip()
+    return dcid[len("dcid:"):] if dcid.startswith("dcid:") else dcid
+
+
+class LocalObservationStore:
+    """Indexed in-memory observation store loaded from Data Commons-style CSV files.
+
+    Files have a `Year,Place,StatVar,Quantity,Unit` header, as in
+    data/test_census_data.csv. Rows are kept in typed arrays (interned place
+    and variable codes, years and float64 values) with a dict index from
+    (place, statvar, year) to row, plus the latest row per (place, statvar).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._places = []
+        self._place_codes = {}
+        self._statvars = []
+        self._statvar_codes = {}
+        self._place_col = array("I")
+        self._statvar_col = array("I")
+        self._years = array("i")
+        self._values = array("d")
+        self._units = []
+        self._index = {}
+        self._latest = {}
+        self._series = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _code(self, value: str, labels: list, codes: dict) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(labels)
+            labels.append(value)
+        return code
+
+    def add(self, place: str, statvar: str, year: int, value: float, unit: str = ""):
+        """Adds or replaces one observation."""
+        place = strip_dcid_prefix(place)
+        statvar = strip_dcid_prefix(statvar)
+        with self._lock:
+            key = (place, statvar, year)
+            row = self._index.get(key)
+            if row is not None:
+                self._values[row] = value
+                self._units[row] = unit
+            else:
+                row = len(self._values)
+                self._place_col.append(self._code(place, self._places, self._place_codes))
+                self._statvar_col.append(self._code(statvar, self._statvars, self._statvar_codes))
+                self._years.append(year)
+                self._values.append(value)
+                self._units.append(unit)
+                self._index[key] = row
+                self._series.setdefault((place, statvar), []).append(row)
+            latest = self._latest.get((place, statvar))
+            if latest is None or self._years[latest] <= year:
+                self._latest[(place, statvar)] = row
+
+    def load_csv(self, path: str) -> int:
+        """Loads a Year,Place,StatVar,Quantity,Unit CSV file.
+
+        Rows without a numeric year or quantity are skipped.
+
+        Returns:
+            int: Number of observations loaded.
+        """
+        loaded = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    year = int(row["Year"])
+                    value = float(row["Quantity"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self.add(row["Place"], row["StatVar"], year, value, (row.get("Unit") or "").strip())
+                loaded += 1
+        return loaded
+
+    def get(self, place: str, statvar: str, date: str = "LATEST"):
+        """Looks up one observation.
+
+        Args:
+            place (str): Place DCID.
+            statvar (str): Statistical variable DCID.
+            date (str, optional): "LATEST" or a year such as "2020".
+
+        Returns:
+            dict: {"value", "date"} like the tools return, or None if not stored.
+        """
+        if date == "LATEST":
+            row = self._latest.get((place, statvar))
+        elif date.isdigit():
+            row = self._index.get((place, statvar, int(date)))
+        else:
+            return None
+        if row is None:
+            return None
+        value = self._values[row]
+        return {
+            "value": int(value) if value.is_integer() else value,
+            "date": str(self._years[row]),
+        }
+
+    def series(self, place: str, statvar: str):
+        """Returns every stored observation of a series as ([years], [values]), oldest first.
+
+        Returns None if the series is not stored.
+        """
+        rows = self._series.get((place, statvar))
+        if not rows:
+            return None
+        rows = sorted(rows, key=self._years.__getitem__)
+        return [str(self._years[row]) for row in rows], [self._values[row] for row in rows]
+
+    def statvars(self) -> list[str]:
+        """Returns every statistical variable DCID in the store."""
+        return list(self._statvars)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_local_store() -> LocalObservationStore:
+    """Returns the process-wide local store.
+
+    On first use it loads every CSV file listed in $DATCOM_LOCAL_DATA
+    (separated by os.pathsep). The store is empty if the variable is unset.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = LocalObservationStore()
+                for path in filter(None, os.getenv("DATCOM_LOCAL_DATA", "").split(os.pathsep)):
+                    store.load_csv(path)
+                _store = store
+    return _store
+
+
+def set_local_store(store: LocalObservationStore):
+    """Replaces the shared local store."""
+    global _store
+    with _store_lock:
+        _store = store
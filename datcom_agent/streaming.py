@@ -0,0 +1,138 @@
+import codecs
+import json
+import re
+import threading
+
+# Next structural character or string start
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+# Rest of a JSON string after its opening quote, including the closing quote
+_STRING_TAIL = re.compile(r'(?:[^"\\]|\\.)*"')
+_WHITESPACE = " \t\r\n"
+
+
+class VariableListingScanner:
+    """Incrementally scans an /observation variable listing for (variable, entity) pairs.
+
+    Only object keys at byVariable -> <variable> -> byEntity -> <entity> are
+    extracted; everything else is skipped without being decoded, and only an
+    unfinished token is buffered between chunks. Scanning reports completion
+    as soon as every requested entity has `limit` variables.
+
+    Args:
+        entities (list[str]): Entity DCIDs to collect variables for.
+        limit (int, optional): Variables to keep per entity, or None for all.
+    """
+
+    def __init__(self, entities: list[str], limit: int = None):
+        self.result = {entity: [] for entity in entities}
+        self.limit = limit
+        self._pending = len(entities) if limit else None
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # One [current_key] frame per open object/array
+        self._stack = []
+        self.bytes_read = 0
+        self.bytes_needed = 0
+
+    @property
+    def done(self) -> bool:
+        """Whether every entity has reached its limit."""
+        return self._pending == 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """Scans the next chunk of the response body.
+
+        Returns:
+            bool: True once every entity has reached its limit.
+        """
+        self.bytes_read += len(chunk)
+        text = self._buffer + self._decoder.decode(chunk)
+        # Byte offset of text[0] in the stream, for bytes_needed
+        base = self.bytes_read - len(text.encode("utf-8"))
+        pos = 0
+        stack = self._stack
+        while True:
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            char = match.group()
+            if char == '"':
+                tail = _STRING_TAIL.match(text, match.end())
+                if tail is None:
+                    # String continues in the next chunk
+                    pos = match.start()
+                    break
+                end = tail.end()
+                # A string followed by ':' is an object key
+                after = end
+                while after < len(text) and text[after] in _WHITESPACE:
+                    after += 1
+                if after == len(text):
+                    pos = match.start()
+                    break
+                if text[after] == ":" and stack:
+                    key = json.loads(text[match.start():end])
+                    stack[-1][0] = key
+                    if (len(stack) == 4 and stack[0][0] == "byVariable"
+                            and stack[2][0] == "byEntity"):
+                        self._add(stack[1][0], key)
+                        if self.done:
+                            self.bytes_needed = base + len(text[:end].encode("utf-8"))
+                            self._buffer = ""
+                            return True
+                    pos = after + 1
+                else:
+                    pos = end
+            elif char in "{[":
+                stack.append([None])
+                pos = match.end()
+            else:
+                if stack:
+                    stack.pop()
+                pos = match.end()
+        self._buffer = text[pos:]
+        self.bytes_needed = self.bytes_read - len(self._buffer.encode("utf-8"))
+        return False
+
+    def _add(self, variable: str, entity: str):
+        variables = self.result.get(entity)
+        if variables is None:
+            return
+        if self.limit is None:
+            variables.append(variable)
+        elif len(variables) < self.limit:
+            variables.append(variable)
+            if len(variables) == self.limit:
+                self._pending -= 1
+
+
+class StreamStats:
+    """Thread-safe counters comparing bytes downloaded with bytes actually needed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.early_stops = 0
+        self.bytes_read = 0
+        self.bytes_needed = 0
+
+    def record(self, scanner: VariableListingScanner):
+        with self._lock:
+            self.responses += 1
+            self.early_stops += int(scanner.done)
+            self.bytes_read += scanner.bytes_read
+            self.bytes_needed += scanner.bytes_needed
+
+    def snapshot(self) -> dict:
+        """Returns the counters as a dict."""
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "early_stops": self.early_stops,
+                "bytes_read": self.bytes_read,
+                "bytes_needed": self.bytes_needed,
+            }
+
+
+stream_stats = StreamStats()
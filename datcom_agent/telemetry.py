@@ -0,0 +1,248 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # spans are still collected in-process without OpenTelemetry
+    otel_trace = None
+
+# Phases recorded for every tool call
+PHASES = ("request_build", "batch_wait", "rate_limit_wait", "http_wait", "decode", "walk", "report_build")
+
+# Histogram bucket upper bounds in milliseconds (OpenTelemetry's defaults)
+BUCKETS_MS = (0, 5, 10, 25, 50, 75, 100, 250, 500, 750, 1000, 2500, 5000, 7500, 10000)
+
+_current_span = contextvars.ContextVar("datcom_tool_span", default=None)
+
+
+class ToolSpan:
+    """Timing and attributes of one tool call.
+
+    Phase durations are summed over every request the call makes, so for
+    concurrent batches they can add up to more than the wall-clock duration.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_s = None
+        self.phases = {}
+        self.attributes = {"response_bytes": 0, "http_requests": 0}
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add(self, key: str, amount: int):
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def set(self, key: str, value):
+        with self._lock:
+            self.attributes[key] = value
+
+    def end(self):
+        self.duration_s = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_s * 1000,
+            "phases_ms": {phase: seconds * 1000 for phase, seconds in self.phases.items()},
+            "attributes": dict(self.attributes),
+        }
+
+
+class Histogram:
+    """Fixed-bucket histogram of millisecond durations."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value_ms: float):
+        index = len(BUCKETS_MS)
+        for i, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max,
+                "bucket_bounds_ms": list(BUCKETS_MS), "bucket_counts": list(self.counts)}
+
+
+class Collector:
+    """In-process collector of finished tool spans and duration histograms.
+
+    Keeps the most recent `max_spans` spans and a histogram per tool and per
+    (tool, phase). If `path` is set, every span is also appended to it as one
+    JSON line.
+    """
+
+    def __init__(self, max_spans: int = 1000, path: str = None):
+        self.max_spans = max_spans
+        self.path = path
+        self.spans = []
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def export(self, span: ToolSpan):
+        record = span.to_dict()
+        with self._lock:
+            self.spans.append(record)
+            del self.spans[:-self.max_spans]
+            self._histogram(f"{span.name}.duration").record(record["duration_ms"])
+            for phase, value_ms in record["phases_ms"].items():
+                self._histogram(f"{span.name}.{phase}").record(value_ms)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def snapshot(self) -> dict:
+        """Returns recent spans and all histograms as plain dicts."""
+        with self._lock:
+            return {
+                "spans": list(self.spans),
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+
+
+_collector = Collector(path=os.getenv("DATCOM_TELEMETRY_FILE") or None)
+
+
+def get_collector() -> Collector:
+    """Returns the process-wide collector."""
+    return _collector
+
+
+def set_collector(collector: Collector):
+    """Replaces the process-wide collector."""
+    global _collector
+    _collector = collector
+
+
+def current_span():
+    """Returns the ToolSpan of the tool call in progress, or None."""
+    return _current_span.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Times a block as one of PHASES of the current tool call (no-op outside one)."""
+    span = _current_span.get()
+    if span is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span.add_phase(name, time.perf_counter() - start)
+
+
+def add_phase(name: str, seconds: float):
+    """Adds an already measured duration to a phase of the current tool call."""
+    span = _current_span.get()
+    if span is not None:
+        span.add_phase(name, seconds)
+
+
+def record(**attributes):
+    """Sets attributes such as entities=3 on the current tool call, if any."""
+    span = _current_span.get()
+    if span is not None:
+        for key, value in attributes.items():
+            span.set(key, value)
+
+
+def record_response(num_bytes: int):
+    """Counts one HTTP response of `num_bytes` bytes against the current tool call."""
+    span = _current_span.get()
+    if span is not None:
+        span.add("response_bytes", num_bytes)
+        span.add("http_requests", 1)
+
+
+def _finish(span: ToolSpan, result, otel_span):
+    span.end()
+    status = result.get("status") if isinstance(result, dict) else "exception"
+    span.set("status", status)
+    if otel_span is not None:
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(f"datcom.{key}", value)
+        for name, seconds in span.phases.items():
+            otel_span.set_attribute(f"datcom.phase.{name}_ms", seconds * 1000)
+    _collector.export(span)
+
+
+def _start_otel_span(name: str):
+    if otel_trace is None:
+        return None
+    return otel_trace.get_tracer("datcom_agent").start_span(f"datcom.{name}")
+
+
+def instrumented(tool):
+    """Decorates a sync or async tool so each call is recorded as a ToolSpan."""
+    name = tool.__name__
+
+    if inspect.iscoroutinefunction(tool):
+        @functools.wraps(tool)
+        async def async_wrapper(*args, **kwargs):
+            span = ToolSpan(name)
+            token = _current_span.set(span)
+            otel_span = _start_otel_span(name)
+            result = None
+            try:
+                result = await tool(*args, **kwargs)
+                return result
+            finally:
+                _current_span.reset(token)
+                _finish(span, result, otel_span)
+                if otel_span is not None:
+                    otel_span.end()
+        return async_wrapper
+
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        span = ToolSpan(name)
+        token = _current_span.set(span)
+        otel_span = _start_otel_span(name)
+        result = None
+        try:
+            result = tool(*args, **kwargs)
+            return result
+        finally:
+            _current_span.reset(token)
+            _finish(span, result, otel_span)
+            if otel_span is not None:
+                otel_span.end()
+    return wrapper
@@ -0,0 +1,84 @@
+import bisect
+import sys
+from array import array
+
+# Appended to an end date so "2020" also covers "2020-05" and "2020-05-01"
+_DATE_END = "~"
+
+
+def _number(value: float):
+    return int(value) if value.is_integer() else value
+
+
+class TimeSeries:
+    """All observations of one (entity, variable) series as parallel date and value arrays.
+
+    Dates are interned ISO strings ("2020", "2020-05", "2020-05-01") in
+    ascending order and values are float64, so a series of n points costs
+    an array of n doubles and a list of n pointers to shared date strings
+    instead of n dicts.
+
+    Args:
+        dates (list[str]): Observation dates, ascending.
+        values (array or list[float]): Values, same length as dates.
+    """
+
+    __slots__ = ("dates", "values")
+
+    def __init__(self, dates: list[str], values):
+        self.dates = dates
+        self.values = values if isinstance(values, array) else array("d", values)
+
+    @classmethod
+    def from_observations(cls, observations: list[dict]) -> "TimeSeries":
+        """Builds a series from API observations ([{"date", "value"}, ...], any order)."""
+        points = sorted((obs["date"], obs["value"]) for obs in observations
+                        if obs.get("date") is not None and obs.get("value") is not None)
+        return cls([sys.intern(date) for date, _ in points], [value for _, value in points])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TimeSeries) and self.dates == other.dates and self.values == other.values
+
+    def slice(self, start: str = None, end: str = None) -> "TimeSeries":
+        """Returns the points dated from start to end, both inclusive.
+
+        A year or month bound covers the whole period, e.g. end="2020"
+        includes "2020-12".
+        """
+        lo = bisect.bisect_left(self.dates, start) if start else 0
+        hi = bisect.bisect_right(self.dates, end + _DATE_END) if end else len(self.dates)
+        if lo == 0 and hi == len(self.dates):
+            return self
+        return TimeSeries(self.dates[lo:hi], self.values[lo:hi])
+
+    def latest(self):
+        """Returns the newest point as {"value", "date"}, or None if empty."""
+        if not self.dates:
+            return None
+        return {"value": _number(self.values[-1]), "date": self.dates[-1]}
+
+    def to_dict(self) -> dict:
+        """Returns {"dates": [...], "values": [...]} for tool output."""
+        return {"dates": list(self.dates), "values": [_number(value) for value in self.values]}
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the value array and date list (not the shared strings)."""
+        return self.values.itemsize * len(self.values) + 8 * len(self.dates)
+
+
+def extract_series(data: dict) -> dict:
+    """Walks an /observation response fetched with date="" into result[entity][variable] = TimeSeries.
+
+    Like extract_observations, only the first (preferred) facet is used.
+    """
+    result = {}
+    for variable_dcid, variable_data in data.get("byVariable", {}).items():
+        for entity_dcid, entity_data in variable_data.get("byEntity", {}).items():
+            facets = entity_data.get("orderedFacets")
+            if facets and facets[0].get("observations"):
+                result.setdefault(entity_dcid, {})[variable_dcid] = TimeSeries.from_observations(
+                    facets[0]["observations"])
+    return result
@@ -0,0 +1,55 @@
+import pytest
+
+from datcom_agent import resilience
+from datcom_agent.batching import ObservationBatcher, set_observation_batcher
+from datcom_agent.cache import (ObservationCache, PlaceCache, SeriesCache, VariableListCache,
+                                set_observation_cache, set_place_cache, set_series_cache,
+                                set_variable_list_cache)
+from datcom_agent.client import DataCommonsClient, set_client
+from datcom_agent.output import OutputPolicy, set_output_policy
+from datcom_agent.prefetch import Prefetcher, set_prefetcher
+from datcom_agent.ratelimit import RateLimiter, set_rate_limiter
+from datcom_agent.results import ResultStore
+from datcom_agent.search import StatVarIndex, set_statvar_index
+from datcom_agent.standin import StandInData, StandInServer
+from datcom_agent.store import LocalObservationStore, set_local_store
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Gives every test empty caches and default-off features, with nothing on disk."""
+    monkeypatch.setenv("DATCOM_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("DATCOM_PREFETCH", "0")
+    set_place_cache(PlaceCache(":memory:"))
+    set_observation_cache(ObservationCache())
+    set_series_cache(SeriesCache())
+    set_variable_list_cache(VariableListCache())
+    set_statvar_index(StatVarIndex())
+    set_local_store(LocalObservationStore())
+    set_rate_limiter(RateLimiter({}))
+    set_observation_batcher(ObservationBatcher(window_ms=0))
+    set_prefetcher(Prefetcher(enabled=False))
+    set_output_policy(OutputPolicy(mode="full", max_tokens=0, handle_rows=0, store=ResultStore("")))
+    # Clients created during the test (including the per-loop async ones)
+    # pick up a fresh policy and breaker
+    monkeypatch.setattr(resilience, "_policy", resilience.ResiliencePolicy(
+        max_attempts=3, base_delay=0.01, max_delay=0.05, hedge=False))
+    monkeypatch.setattr(resilience, "_breaker", resilience.CircuitBreaker(enabled=False))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A stand-in API with 50 places and 5 variables; the tools are pointed at it."""
+    server = StandInServer(StandInData.synthetic(places=50, variables=5)).start()
+    monkeypatch.setenv("DATCOM_BASE_URL", server.base_url)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    """The shared sync client, talking to the stand-in server."""
+    client = DataCommonsClient(base_url=server.base_url, api_key="test")
+    set_client(client)
+    yield client
+    client.close()
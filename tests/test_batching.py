@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+from datcom_agent.batching import ObservationBatcher, set_observation_batcher
+from datcom_agent.cache import ObservationCache, set_observation_cache
+from datcom_agent.observations import fetch_observations, fetch_observations_async
+
+PLACES = [f"geoId/{i:05d}" for i in range(1, 9)]
+
+
+def _concurrently(calls) -> list:
+    """Runs each zero-argument callable on its own thread and returns the results."""
+    results = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = calls[i]()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _recording_fetch(sent: list):
+    def fetch(entities, variables):
+        sent.append((list(entities), list(variables)))
+        return {(entity, variable): {"value": 1, "date": "2024"}
+                for entity in entities for variable in variables}
+    return fetch
+
+
+def test_disabled_batcher_calls_fetch_directly():
+    sent = []
+    batcher = ObservationBatcher(window_ms=0)
+    batcher.submit("LATEST", ["a"], ["v"], _recording_fetch(sent))
+    assert sent == [(["a"], ["v"])]
+    assert batcher.stats()["calls"] == 0
+
+
+def test_callers_in_the_window_share_one_fetch():
+    sent = []
+    batcher = ObservationBatcher(window_ms=100)
+    fetch = _recording_fetch(sent)
+    results = _concurrently([
+        lambda: batcher.submit("LATEST", ["a"], ["v1"], fetch),
+        lambda: batcher.submit("LATEST", ["b"], ["v2"], fetch),
+        lambda: batcher.submit("LATEST", ["c"], ["v1"], fetch),
+    ])
+
+    assert len(sent) == 1
+    entities, variables = sent[0]
+    assert sorted(entities) == ["a", "b", "c"]
+    assert sorted(variables) == ["v1", "v2"]
+    assert all(("a", "v1") in cells for cells in results)
+    assert batcher.stats() == {"calls": 3, "batches": 1, "merged": 2, "open": 0}
+
+
+def test_different_dates_are_not_merged():
+    sent = []
+    batcher = ObservationBatcher(window_ms=50)
+    fetch = _recording_fetch(sent)
+    _concurrently([
+        lambda: batcher.submit("2020", ["a"], ["v"], fetch),
+        lambda: batcher.submit("2021", ["a"], ["v"], fetch),
+    ])
+    assert len(sent) == 2
+
+
+def test_batch_is_split_at_max_cells():
+    sent = []
+    batcher = ObservationBatcher(window_ms=100, max_cells=4)
+    fetch = _recording_fetch(sent)
+    _concurrently([lambda i=i: batcher.submit("LATEST", [f"e{i}"], ["v1", "v2"], fetch)
+                   for i in range(4)])
+    assert all(len(entities) * len(variables) <= 4 for entities, variables in sent)
+    assert sorted(entity for entities, _ in sent for entity in entities) == ["e0", "e1", "e2", "e3"]
+
+
+def test_fetch_error_reaches_every_caller():
+    batcher = ObservationBatcher(window_ms=50)
+
+    def fail(entities, variables):
+        raise requests.exceptions.ConnectionError("down")
+
+    results = _concurrently([lambda: batcher.submit("LATEST", ["a"], ["v"], fail),
+                             lambda: batcher.submit("LATEST", ["b"], ["v"], fail)])
+    assert all(isinstance(result, requests.exceptions.ConnectionError) for result in results)
+
+
+def test_concurrent_fetches_get_their_own_cells_from_one_request(client, server):
+    set_observation_batcher(ObservationBatcher(window_ms=50))
+    variables = ["Synthetic_1", "Synthetic_2"]
+    results = _concurrently([lambda place=place, i=i: fetch_observations([place], [variables[i % 2]])
+                             for i, place in enumerate(PLACES)])
+
+    assert server.requests_by_path["/v2/observation"] == 1
+    for i, (place, result) in enumerate(zip(PLACES, results)):
+        assert list(result) == [place]
+        assert list(result[place]) == [variables[i % 2]]
+        assert result[place][variables[i % 2]]["date"] == "2024"
+
+
+def test_batched_results_match_unbatched_ones(client):
+    set_observation_batcher(ObservationBatcher(window_ms=50))
+    batched = _concurrently([lambda place=place: fetch_observations([place], ["Synthetic_3"])
+                             for place in PLACES])
+    set_observation_batcher(ObservationBatcher(window_ms=0))
+    set_observation_cache(ObservationCache())
+    assert batched == [fetch_observations([place], ["Synthetic_3"]) for place in PLACES]
+
+
+def test_async_fetches_get_their_own_cells_from_one_request(server):
+    set_observation_batcher(ObservationBatcher(window_ms=50))
+
+    async def main():
+        return await asyncio.gather(*(fetch_observations_async([place], ["Synthetic_1"])
+                                      for place in PLACES))
+
+    results = asyncio.run(main())
+    assert server.requests_by_path["/v2/observation"] == 1
+    assert [list(result) for result in results] == [[place] for place in PLACES]
+
+
+def test_cancelled_async_caller_does_not_cancel_the_batch(server):
+    set_observation_batcher(ObservationBatcher(window_ms=50))
+
+    async def main():
+        first = asyncio.ensure_future(fetch_observations_async([PLACES[0]], ["Synthetic_1"]))
+        second = asyncio.ensure_future(fetch_observations_async([PLACES[1]], ["Synthetic_1"]))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return first, await second
+
+    first, second = asyncio.run(main())
+    assert first.cancelled()
+    assert list(second) == [PLACES[1]]
+    assert server.requests_by_path["/v2/observation"] == 1
+
+
+@pytest.mark.parametrize("window_ms", [0, 50])
+def test_cached_cells_are_not_batched_again(client, server, window_ms):
+    set_observation_batcher(ObservationBatcher(window_ms=window_ms))
+    fetch_observations(PLACES[:2], ["Synthetic_1"])
+    fetch_observations(PLACES[:2], ["Synthetic_1"])
+    assert server.requests_by_path["/v2/observation"] == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from datcom_agent import agent
+from datcom_agent.client import DataCommonsClient, set_client
+from datcom_agent.standin import StandInData, StandInServer
+
+COUNTIES = [f"geoId/{i:05d}" for i in range(50)]
+VARIABLES = ["Count_Person", "Synthetic_1"]
+
+
+@pytest.fixture
+def states(monkeypatch):
+    """Serves two states, a county in each and a city, so child types can be told apart."""
+    data = StandInData()
+    for dcid, value in (("geoId/06", 39), ("geoId/48", 30), ("geoId/06085", 2),
+                        ("geoId/48201", 5), ("geoId/0668000", 1)):
+        data.add(dcid, "Count_Person", "2023", value)
+    server = StandInServer(data).start()
+    monkeypatch.setenv("DATCOM_BASE_URL", server.base_url)
+    client = DataCommonsClient(base_url=server.base_url, api_key="test")
+    set_client(client)
+    yield server
+    client.close()
+    server.stop()
+
+
+def test_every_child_comes_back_from_one_request(client, server):
+    response = agent.get_child_place_observations("geoId/00", "County", VARIABLES)
+
+    assert response["status"] == "success"
+    assert list(response["data"]) == COUNTIES
+    assert server.requests_by_path["/v2/observation"] == 1
+    # The same cells as asking for each county by DCID
+    assert response["data"] == agent.get_observations(COUNTIES, VARIABLES)["data"]
+
+
+@pytest.mark.parametrize("parent,child_type,expected", [
+    ("country/USA", "State", ["geoId/06", "geoId/48"]),
+    ("geoId/06", "County", ["geoId/06085"]),
+    ("country/USA", "City", ["geoId/0668000"]),
+    ("geoId/48", "City", []),
+])
+def test_only_children_of_the_type_within_the_parent(states, parent, child_type, expected):
+    response = agent.get_child_place_observations(parent, child_type, ["Count_Person"])
+    assert response["status"] == "success"
+    assert list(response["data"]) == expected
+
+
+def test_known_children_only_request_new_variables(client, server):
+    agent.get_child_place_observations("geoId/00", "County", ["Count_Person"])
+    agent.get_child_place_observations("geoId/00", "County", ["Count_Person"])
+    assert server.requests_by_path["/v2/observation"] == 1
+
+    response = agent.get_child_place_observations("geoId/00", "County", VARIABLES)
+    assert server.requests_by_path["/v2/observation"] == 2
+    assert all(list(cells) == VARIABLES for cells in response["data"].values())
+
+
+def test_async_children_match_sync_ones(client, server):
+    result = asyncio.run(agent.get_child_place_observations_async("geoId/00", "County", ["Synthetic_3"]))
+    assert list(result["data"]) == COUNTIES
+    assert result["data"] == agent.get_observations(COUNTIES, ["Synthetic_3"])["data"]
@@ -0,0 +1,109 @@
+import pytest
+
+from datcom_agent import agent
+from datcom_agent.output import OutputPolicy, OutputShape, estimate_tokens, set_output_policy
+from datcom_agent.results import ResultStore
+
+PLACES = [f"geoId/{i:05d}" for i in range(1, 21)]
+VARIABLES = ["Synthetic_1", "Synthetic_2"]
+
+
+def _read_all(first: dict) -> list[dict]:
+    """Follows get_more_output from a truncated response to the end."""
+    pages = [first]
+    while pages[-1]["truncated"]["next_offset"] is not None:
+        truncated = pages[-1]["truncated"]
+        pages.append(agent.get_more_output(truncated["handle"], truncated["next_offset"]))
+    return pages
+
+
+def test_budget_and_handles_are_off_by_default(monkeypatch):
+    monkeypatch.delenv("DATCOM_OUTPUT_MAX_TOKENS", raising=False)
+    monkeypatch.delenv("DATCOM_RESULT_HANDLE_ROWS", raising=False)
+    policy = OutputPolicy()
+    assert policy.max_tokens == 0
+    assert policy.handle_rows == 0
+
+
+def test_small_responses_are_unchanged(client):
+    set_output_policy(OutputPolicy(mode="full", max_tokens=8000, store=ResultStore("")))
+    response = agent.get_observations(PLACES[:2], VARIABLES)
+    assert "truncated" not in response
+    assert set(response["data"]) == set(PLACES[:2])
+
+
+@pytest.mark.parametrize("mode", ["full", "data"])
+def test_truncated_data_pages_back_to_the_full_result(client, mode):
+    full = agent.get_observations(PLACES, VARIABLES)
+    set_output_policy(OutputPolicy(mode=mode, max_tokens=100, store=ResultStore("")))
+    pages = _read_all(agent.get_observations(PLACES, VARIABLES))
+
+    assert len(pages) > 1
+    for page in pages:
+        assert estimate_tokens(page["data"]) <= 100 + 30
+        assert "report" not in page
+    merged = {}
+    for page in pages:
+        for place, variables in page["data"].items():
+            merged.setdefault(place, {}).update(variables)
+    assert merged == full["data"]
+    assert pages[-1]["truncated"]["total"] == len(PLACES) * len(VARIABLES)
+
+
+def test_truncated_report_pages_by_line(client):
+    full = agent.get_observations(PLACES, VARIABLES)
+    set_output_policy(OutputPolicy(mode="report", max_tokens=50, store=ResultStore("")))
+    pages = _read_all(agent.get_observations(PLACES, VARIABLES))
+
+    assert len(pages) > 1
+    assert "".join(page["report"] for page in pages) == full["report"]
+
+
+def test_truncated_table_repeats_the_header(client):
+    set_output_policy(OutputPolicy(mode="table", max_tokens=60, store=ResultStore("")))
+    pages = _read_all(agent.get_observations(PLACES, VARIABLES))
+
+    rows = []
+    for page in pages:
+        header, *lines = page["table"].splitlines()
+        assert header == "place,variable,value,date"
+        rows.extend(lines)
+    assert len(rows) == len(PLACES) * len(VARIABLES)
+
+
+def test_columnar_result_pages_as_a_matrix(client):
+    full = agent.get_observations(PLACES, VARIABLES)
+    set_output_policy(OutputPolicy(mode="data", max_tokens=80, store=ResultStore("")))
+    pages = _read_all(agent.get_observations(PLACES, VARIABLES, columnar=True))
+
+    assert len(pages) > 1
+    cells = {}
+    for page in pages:
+        data = page["data"]
+        for i, place in enumerate(data["entities"]):
+            for j, variable in enumerate(data["variables"]):
+                if data["values"][i][j] is not None:
+                    cells[(place, variable)] = data["values"][i][j]
+    assert cells == {(place, variable): cell["value"]
+                     for place, variables in full["data"].items() for variable, cell in variables.items()}
+
+
+def test_unknown_handle_is_an_error():
+    response = agent.get_more_output("0123456789abcdef", 0)
+    assert response["status"] == "error"
+
+
+def test_errors_are_never_shaped():
+    policy = OutputPolicy(mode="table", max_tokens=1, store=ResultStore(""))
+    error = {"status": "error", "error_message": "x" * 100}
+    assert policy.apply(error, OutputShape()) is error
+
+
+def test_shape_round_trips_rows():
+    shape = OutputShape(keys=("place", "variable"), fields=("dates", "values"), leaf="columns",
+                        columns=("date", "value"))
+    data = {"geoId/06": {"Count_Person": {"dates": ["2020", "2021"], "values": [1, 2]}}}
+    rows = shape.rows(data)
+    assert rows == [("geoId/06", "Count_Person", "2020", 1), ("geoId/06", "Count_Person", "2021", 2)]
+    assert shape.nest(rows) == data
+    assert OutputShape.from_dict(shape.to_dict()).header == ("place", "variable", "date", "value")
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from datcom_agent import agent
+
+PLACE = "geoId/00001"
+VARIABLES = ["Count_Person", "Synthetic_1", "Synthetic_2", "Synthetic_3", "Synthetic_4"]
+
+
+@pytest.mark.parametrize("api_page_size", [0, 5])
+def test_listing_ending_on_a_page_boundary_has_no_cursor(client, server, api_page_size):
+    server.page_size = api_page_size
+    response = agent.get_available_variables_page(PLACE, page_size=len(VARIABLES))
+
+    assert response["data"] == {PLACE: VARIABLES}
+    assert response["next_cursor"] is None
+    assert response["report"].endswith("This is the end of the listing.")
+
+
+def test_async_listing_ending_on_a_page_boundary_has_no_cursor(server):
+    response = asyncio.run(agent.get_available_variables_page_async(PLACE, page_size=len(VARIABLES)))
+    assert response["data"] == {PLACE: VARIABLES}
+    assert response["next_cursor"] is None
+
+
+def test_cursor_at_the_end_of_a_page_resumes_from_the_next_page(client, server):
+    server.page_size = 2
+    first = agent.get_available_variables_page(PLACE, page_size=2)
+    second = agent.get_available_variables_page("", page_size=2, cursor=first["next_cursor"])
+
+    assert first["data"][PLACE] + second["data"][PLACE] == VARIABLES[:4]
+    # The cursor carries the API's nextToken, so the first page is not fetched again
+    assert server.requests_by_path["/v2/observation"] == 2
+
+
+def _read_pages(read_page, page_size: int) -> tuple[dict, int]:
+    """Follows next_cursor to the end, returning the merged listing and the call count."""
+    merged = {}
+    cursor = ""
+    calls = 0
+    while True:
+        response = read_page(cursor, page_size)
+        calls += 1
+        assert response["status"] == "success"
+        for place, variables in response["data"].items():
+            merged.setdefault(place, []).extend(variables)
+        cursor = response["next_cursor"]
+        if cursor is None:
+            return merged, calls
+
+
+@pytest.mark.parametrize("api_page_size,page_size", [(0, 2), (2, 2), (2, 3), (3, 2), (4, 1)])
+def test_cursor_round_trips_cover_the_listing_once(client, server, api_page_size, page_size):
+    server.page_size = api_page_size
+    places = "geoId/00001,geoId/00002"
+    merged, calls = _read_pages(
+        lambda cursor, size: agent.get_available_variables_page(places, size, cursor), page_size)
+
+    assert merged == {"geoId/00001": VARIABLES, "geoId/00002": VARIABLES}
+    # No call past the end returns an empty page
+    assert calls == -(-2 * len(VARIABLES) // page_size)
+
+
+def test_async_cursor_round_trips_cover_the_listing_once(server):
+    server.page_size = 2
+
+    def read_page(cursor, size):
+        return asyncio.run(agent.get_available_variables_page_async(PLACE, size, cursor))
+
+    merged, calls = _read_pages(read_page, 3)
+    assert merged == {PLACE: VARIABLES}
+    assert calls == 2
+
+
+def test_cursor_works_across_sync_and_async_calls(client, server):
+    first = agent.get_available_variables_page(PLACE, page_size=2)
+    rest = asyncio.run(agent.get_available_variables_page_async("", 10, first["next_cursor"]))
+    assert first["data"][PLACE] + rest["data"][PLACE] == VARIABLES
+    assert rest["next_cursor"] is None
+
+
+def test_malformed_cursor_is_an_error():
+    response = agent.get_available_variables_page("", cursor="not a cursor")
+    assert response["status"] == "error"
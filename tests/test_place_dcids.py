@@ -0,0 +1,17 @@
+from datcom_agent import agent
+
+
+def test_long_name_lists_are_resolved_in_url_sized_batches(client, server, monkeypatch):
+    monkeypatch.setenv("DATCOM_MAX_URL_LENGTH", "400")
+    names = [f"Place {i}" for i in range(50)]
+    response = agent.get_place_dcids(names)
+
+    assert response["status"] == "success"
+    assert response["data"] == {f"Place {i}": f"geoId/{i:05d}" for i in range(50)}
+    assert server.requests_by_path["/v2/resolve"] > 1
+
+
+def test_resolved_names_are_cached(client, server):
+    agent.get_place_dcids(["Place 1", "Place 2"])
+    agent.get_place_dcids(["Place 2", "Place 1"])
+    assert server.requests_by_path["/v2/resolve"] == 1
@@ -0,0 +1,87 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from datcom_agent import agent
+from datcom_agent.client import DataCommonsClient, set_client
+from datcom_agent.search import get_statvar_index
+from datcom_agent.standin import StandInData, StandInServer
+
+CENSUS_CSV = Path(__file__).resolve().parent.parent / "data" / "test_census_data.csv"
+
+
+@pytest.fixture
+def census(monkeypatch):
+    """Serves the bundled census CSV plus California and Texas, with the CSV indexed."""
+    data = StandInData().load_csv(str(CENSUS_CSV))
+    for dcid, name, population in (("geoId/06", "California", 39_000_000),
+                                   ("geoId/48", "Texas", 30_000_000)):
+        data.add_name(name, dcid)
+        data.add(dcid, "Count_Person", "2023", population)
+        data.add(dcid, "Median_Age_Person", "2023", 38)
+    server = StandInServer(data).start()
+    monkeypatch.setenv("DATCOM_BASE_URL", server.base_url)
+    client = DataCommonsClient(base_url=server.base_url, api_key="test")
+    set_client(client)
+    get_statvar_index().load_csv(str(CENSUS_CSV))
+    yield server
+    client.close()
+    server.stop()
+
+
+def _populations(response: dict) -> dict:
+    observations = response["data"]["observations"]
+    return {dcid: cells["Count_Person"]["value"] for dcid, cells in observations.items()}
+
+
+def test_match_without_data_falls_back_to_the_listings(census):
+    # The CSV-only index ranks a Count_Person breakdown first for "population"
+    assert get_statvar_index().search("population", 1)[0]["dcid"] != "Count_Person"
+
+    response = agent.get_place_observations(["California", "Texas"], ["population"])
+    assert response["status"] == "success"
+    assert response["data"]["variables"] == {"population": "Count_Person"}
+    assert _populations(response) == {"geoId/06": 39_000_000, "geoId/48": 30_000_000}
+
+
+def test_async_match_without_data_falls_back_to_the_listings(census):
+    response = asyncio.run(agent.get_place_observations_async(["California", "Texas"], ["population"]))
+    assert response["data"]["variables"] == {"population": "Count_Person"}
+    assert _populations(response) == {"geoId/06": 39_000_000, "geoId/48": 30_000_000}
+
+
+def test_names_dcids_and_descriptions_in_one_call(client, server):
+    get_statvar_index().add_many(["Count_Person", "Synthetic_1"])
+    response = agent.get_place_observations(["Place 1", "geoId/00002"], ["population", "Synthetic_1"])
+
+    data = response["data"]
+    assert data["places"] == {"Place 1": "geoId/00001", "geoId/00002": "geoId/00002"}
+    assert data["variables"] == {"population": "Count_Person", "Synthetic_1": "Synthetic_1"}
+    assert data["observations"] == agent.get_observations(["geoId/00001", "geoId/00002"],
+                                                          ["Count_Person", "Synthetic_1"])["data"]
+    assert "population: Count_Person" in response["report"]
+
+
+def test_descriptions_the_index_lacks_are_matched_from_the_listings(client, server):
+    response = agent.get_place_observations(["Place 3"], ["synthetic 2"])
+    assert response["data"]["variables"] == {"synthetic 2": "Synthetic_2"}
+    assert list(response["data"]["observations"]["geoId/00003"]) == ["Synthetic_2"]
+    # Listed variables were indexed, so the next call needs no listing
+    listings = server.requests_by_path["/v2/observation"]
+    agent.get_place_observations(["Place 4"], ["synthetic 2"])
+    assert server.requests_by_path["/v2/observation"] == listings + 1
+
+
+def test_unknown_places_and_unmatched_descriptions_are_errors(client, server):
+    assert agent.get_place_observations(["Nowhere"], ["Count_Person"])["status"] == "error"
+    response = agent.get_place_observations(["Place 1"], ["zzzzqx"])
+    assert response["status"] == "error"
+    assert "get_available_variables" in response["error_message"]
+
+
+def test_async_known_and_listed_variables_are_both_fetched(server):
+    get_statvar_index().add_many(["Count_Person"])
+    response = asyncio.run(agent.get_place_observations_async(["Place 5"], ["population", "synthetic 3"]))
+    assert response["data"]["variables"] == {"population": "Count_Person", "synthetic 3": "Synthetic_3"}
+    assert set(response["data"]["observations"]["geoId/00005"]) == {"Count_Person", "Synthetic_3"}
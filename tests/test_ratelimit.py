@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from datcom_agent.client import AsyncDataCommonsClient
+from datcom_agent.ratelimit import RateLimiter, TokenBucket, parse_limits, set_rate_limiter
+from datcom_agent.resilience import CircuitBreaker, ResiliencePolicy
+
+
+def _resolve(client, i):
+    # Distinct nodes so concurrent calls are not coalesced into one request
+    return client.get("resolve", {"nodes": [f"Place {i}"], "property": "<-description->dcid"})
+
+
+def test_parse_limits():
+    assert parse_limits("observation=10:20, resolve=5,*=0.5") == {
+        "observation": (10.0, 20.0), "resolve": (5.0, 5.0), "*": (0.5, 1.0)}
+
+
+def test_bucket_queues_callers_in_arrival_order():
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(5)]
+    assert delays[:2] == [0.0, 0.0]
+    # Each caller past the burst waits one refill longer than the one before
+    assert delays[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+
+def test_concurrent_requests_are_spaced_by_the_rate(client, server):
+    limiter = RateLimiter({"resolve": (20, 1)})
+    set_rate_limiter(limiter)
+    threads = [threading.Thread(target=_resolve, args=(client, i)) for i in range(10)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert server.requests_by_path["/v2/resolve"] == 10
+    assert elapsed >= 9 / 20 - 0.02
+    stats = limiter.stats()["resolve"]
+    assert stats["acquired"] == 10
+    assert stats["waited"] == 9
+    assert stats["max_wait_s"] == pytest.approx(9 / 20, abs=0.05)
+
+
+def test_unlimited_endpoints_are_not_throttled(client):
+    limiter = RateLimiter({"observation": (1, 1)})
+    set_rate_limiter(limiter)
+    start = time.perf_counter()
+    for i in range(5):
+        _resolve(client, i)
+    assert time.perf_counter() - start < 0.5
+    assert "resolve" not in limiter.stats()
+
+
+def test_queueing_does_not_count_against_deadline_or_breaker(client):
+    # Two requests a second: the last of six callers queues for 2.5s, far
+    # beyond the 0.4s per-attempt deadline and the breaker's 0.3s slow mark
+    set_rate_limiter(RateLimiter({"resolve": (2, 1)}))
+    client.timeouts["resolve"] = (0.2, 0.2)
+    client.resilience = ResiliencePolicy(max_attempts=1, hedge=False)
+    client.breaker = CircuitBreaker(min_calls=2, error_rate=0.5, slow_seconds=0.3)
+    errors = []
+
+    def call(i):
+        try:
+            _resolve(client, i)
+        except requests.exceptions.RequestException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert client.breaker.state("resolve") == "closed"
+    assert client.resilience.stats()["retries"] == 0
+
+
+def test_retries_do_not_take_another_token(client, server):
+    limiter = RateLimiter({"resolve": (100, 1)})
+    set_rate_limiter(limiter)
+    client.resilience = ResiliencePolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, hedge=False)
+    server.failure_rate = 1.0
+    with pytest.raises(requests.exceptions.HTTPError):
+        _resolve(client, 1)
+
+    assert server.requests_by_path["/v2/resolve"] == 3
+    assert limiter.stats()["resolve"]["acquired"] == 1
+
+
+def test_async_requests_queue_without_blocking_the_loop(server):
+    limiter = RateLimiter({"resolve": (20, 1)})
+    set_rate_limiter(limiter)
+
+    async def main():
+        client = AsyncDataCommonsClient(base_url=server.base_url, api_key="test")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick_task = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(client.get("resolve", {"nodes": [f"Place {i}"],
+                                                      "property": "<-description->dcid"})
+                               for i in range(8)))
+        elapsed = time.perf_counter() - start
+        tick_task.cancel()
+        await client.aclose()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    assert elapsed >= 7 / 20 - 0.02
+    # The loop kept running while callers waited for tokens
+    assert ticks >= 10
+    assert limiter.stats()["resolve"]["waited"] == 7
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from datcom_agent import agent
+from datcom_agent.cache import ObservationCache, PlaceCache, set_observation_cache, set_place_cache
+from datcom_agent.client import AsyncDataCommonsClient, DataCommonsClient
+from datcom_agent.resilience import (HEDGE_MIN_SAMPLES, CircuitBreaker, CircuitOpenError,
+                                     ResiliencePolicy, is_retryable)
+
+
+class _Trickle(BaseHTTPRequestHandler):
+    """Sends a small JSON body one byte every 0.2s, so no single read times out."""
+
+    def do_GET(self):
+        body = json.dumps({"entities": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for byte in body:
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(0.2)
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def trickle_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Trickle)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v2"
+    server.shutdown()
+    server.server_close()
+
+
+def _scripted(*outcomes):
+    """Returns an attempt function that raises or returns each outcome in turn."""
+    calls = iter(outcomes)
+
+    def attempt():
+        outcome = next(calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return attempt
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(requests.exceptions.ConnectionError())
+    assert is_retryable(requests.exceptions.Timeout())
+    response = requests.Response()
+    response.status_code = 503
+    assert is_retryable(requests.exceptions.HTTPError(response=response))
+    response.status_code = 400
+    assert not is_retryable(requests.exceptions.HTTPError(response=response))
+
+
+def test_transient_errors_are_retried_until_success():
+    policy = ResiliencePolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, hedge=False)
+    attempt = _scripted(requests.exceptions.ConnectionError(), requests.exceptions.Timeout(), "ok")
+    assert policy.call("resolve", attempt, deadline=1.0) == "ok"
+    stats = policy.stats()
+    assert stats["attempts"] == 3
+    assert stats["retries"] == 2
+
+
+def test_server_errors_fail_after_max_attempts(client, server):
+    client.resilience = ResiliencePolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, hedge=False)
+    server.failure_rate = 1.0
+    with pytest.raises(requests.exceptions.HTTPError) as raised:
+        client.get("resolve", {"nodes": ["Place 1"], "property": "<-description->dcid"})
+    assert raised.value.response.status_code == 503
+    assert server.requests_by_path["/v2/resolve"] == 3
+
+
+def test_client_errors_are_not_retried(client, server):
+    with pytest.raises(requests.exceptions.HTTPError) as raised:
+        client.get("unknown", {})
+    assert raised.value.response.status_code == 404
+    assert server.requests_by_path["/v2/unknown"] == 1
+
+
+def test_slow_attempt_is_hedged_and_the_hedge_wins():
+    policy = ResiliencePolicy(max_attempts=1, hedge=True, hedge_min_delay=0.05, hedge_budget=1.0)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy._tracker("observation").add(0.01)
+    calls = []
+
+    def attempt():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    start = time.perf_counter()
+    assert policy.call("observation", attempt, deadline=2.0) == "fast"
+    assert time.perf_counter() - start < 0.5
+    stats = policy.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_hedges_stay_within_budget():
+    policy = ResiliencePolicy(max_attempts=1, hedge=True, hedge_min_delay=0.01, hedge_budget=0.0)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy._tracker("observation").add(0.001)
+    assert policy.hedge_delay("observation") is None
+
+
+def _slow_calls(policy: ResiliencePolicy, n: int, seconds: float, deadline: float) -> list:
+    """Makes n concurrent calls to an attempt taking `seconds`, returning results or errors."""
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy._tracker("observation").add(0.01)
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def attempt():
+        time.sleep(seconds)
+        return "ok"
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = policy.call("observation", attempt, deadline=deadline)
+        except requests.exceptions.RequestException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_stay_within_the_hedge_budget():
+    policy = ResiliencePolicy(max_attempts=1, hedge=True, hedge_min_delay=0.05, hedge_budget=0.1)
+    results = _slow_calls(policy, 80, seconds=0.3, deadline=1.0)
+    assert results == ["ok"] * 80
+    assert 0 < policy.stats()["hedges"] <= 8
+
+
+def test_hedging_does_not_queue_attempts_past_their_deadline():
+    policy = ResiliencePolicy(max_attempts=1, hedge=True, hedge_min_delay=0.05, hedge_budget=1.0,
+                              max_concurrent_hedges=4)
+    results = _slow_calls(policy, 80, seconds=0.3, deadline=1.0)
+    assert results == ["ok"] * 80
+
+
+def test_attempt_gives_up_at_the_deadline():
+    policy = ResiliencePolicy(max_attempts=1, hedge=False)
+    discarded = []
+
+    def attempt():
+        time.sleep(0.5)
+        return "late"
+
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        policy.call("observation", attempt, deadline=0.1, discard=discarded.append)
+    assert time.perf_counter() - start < 0.4
+    # A result arriving after the deadline is handed to discard, e.g. to close it
+    time.sleep(0.6)
+    assert discarded == ["late"]
+
+
+def test_trickling_response_times_out_at_the_deadline(trickle_url):
+    client = DataCommonsClient(base_url=trickle_url, api_key="test", timeouts={"resolve": (0.5, 0.5)})
+    client.resilience = ResiliencePolicy(max_attempts=2, base_delay=0.01, max_delay=0.02, hedge=False)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.get("resolve", {"nodes": ["x"]})
+    # Two attempts of a 1s deadline each, although every read arrives in 0.2s
+    assert time.perf_counter() - start < 3.0
+    client.close()
+
+
+def test_async_trickling_response_times_out_at_the_deadline(trickle_url):
+    async def main():
+        client = AsyncDataCommonsClient(base_url=trickle_url, api_key="test",
+                                        timeouts={"resolve": (0.5, 0.5)})
+        client.resilience = ResiliencePolicy(max_attempts=1, hedge=False)
+        try:
+            await client.get("resolve", {"nodes": ["x"]})
+        finally:
+            await client.aclose()
+
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        asyncio.run(main())
+    assert time.perf_counter() - start < 2.0
+
+
+def test_breaker_opens_on_failures_and_fails_fast(client, server):
+    client.resilience = ResiliencePolicy(max_attempts=1, hedge=False)
+    client.breaker = CircuitBreaker(min_calls=4, error_rate=0.5, cooldown=60)
+    server.failure_rate = 1.0
+    for i in range(4):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get("resolve", {"nodes": [f"Place {i}"]})
+    assert client.breaker.state("resolve") == "open"
+
+    with pytest.raises(CircuitOpenError):
+        client.get("resolve", {"nodes": ["Place 9"]})
+    assert server.requests_by_path["/v2/resolve"] == 4
+
+
+def _trip(breaker: CircuitBreaker, endpoint: str):
+    for _ in range(breaker.min_calls):
+        breaker.before(endpoint)
+        breaker.record(endpoint, False, 0.01)
+
+
+def test_breaker_probes_after_the_cooldown_and_closes_on_success():
+    breaker = CircuitBreaker(min_calls=2, error_rate=0.5, cooldown=0.05)
+    _trip(breaker, "observation")
+    assert breaker.state("observation") == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before("observation")
+    # Other endpoints have their own circuit
+    breaker.before("resolve")
+
+    time.sleep(0.06)
+    breaker.before("observation")
+    assert breaker.state("observation") == "half_open"
+    # Only one probe is let through at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before("observation")
+
+    breaker.record("observation", True, 0.01)
+    assert breaker.state("observation") == "closed"
+    breaker.before("observation")
+    stats = breaker.stats()["observation"]
+    assert stats["trips"] == 1
+    assert stats["rejected"] == 2
+    assert stats["recent_failure_rate"] == 0.0
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker(min_calls=2, error_rate=0.5, cooldown=0.05)
+    _trip(breaker, "observation")
+    time.sleep(0.06)
+    breaker.before("observation")
+    breaker.record("observation", False, 0.01)
+    assert breaker.state("observation") == "open"
+    assert breaker.stats()["observation"]["trips"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before("observation")
+
+
+def test_slow_successes_trip_the_breaker_but_client_errors_do_not():
+    breaker = CircuitBreaker(min_calls=2, error_rate=0.5, slow_seconds=0.01, cooldown=60)
+    response = requests.Response()
+    response.status_code = 404
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            breaker.call("resolve", _scripted(requests.exceptions.HTTPError(response=response)))
+    assert breaker.state("resolve") == "closed"
+
+    for _ in range(2):
+        breaker.call("observation", lambda: time.sleep(0.02))
+    assert breaker.state("observation") == "open"
+
+
+def test_disabled_breaker_never_opens():
+    breaker = CircuitBreaker(min_calls=1, enabled=False)
+    _trip(breaker, "observation")
+    breaker.before("observation")
+    assert breaker.state("observation") == "closed"
+
+
+@pytest.fixture
+def expired(client):
+    """Makes every cached entry expire at once and gives the client a breaker to trip."""
+    set_place_cache(PlaceCache(":memory:", ttl=-1, negative_ttl=-1))
+    set_observation_cache(ObservationCache(ttl=-1))
+    client.breaker = CircuitBreaker(min_calls=1, cooldown=60)
+    return client.breaker
+
+
+def test_open_breaker_serves_expired_observations_as_stale(expired, server):
+    places, variables = ["geoId/00001", "geoId/00002"], ["Count_Person", "Synthetic_1"]
+    fresh = agent.get_observations(places, variables)
+    assert "stale" not in fresh
+
+    _trip(expired, "observation")
+    stale = agent.get_observations(places, variables)
+    assert stale["status"] == "success"
+    assert stale["stale"] is True
+    assert stale["data"] == fresh["data"]
+    assert stale["report"].startswith("Note: Data Commons is currently unavailable")
+    assert server.requests_by_path["/v2/observation"] == 1
+
+
+def test_open_breaker_serves_expired_place_dcids_as_stale(expired, server):
+    fresh = agent.get_place_dcids(["Place 1", "Place 2"])
+    _trip(expired, "resolve")
+    stale = agent.get_place_dcids(["Place 1", "Place 2"])
+    assert stale["stale"] is True
+    assert stale["data"] == fresh["data"]
+    assert server.requests_by_path["/v2/resolve"] == 1
+
+
+def test_open_breaker_without_cached_data_is_an_error(expired, server):
+    _trip(expired, "observation")
+    response = agent.get_observations(["geoId/00003"], ["Count_Person"])
+    assert response["status"] == "error"
+    assert "unavailable" in response["error_message"]
+    assert "/v2/observation" not in server.requests_by_path
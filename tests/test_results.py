@@ -0,0 +1,115 @@
+import pytest
+
+from datcom_agent import agent
+from datcom_agent.output import OutputPolicy, set_output_policy
+from datcom_agent.results import ResultSet, ResultStore
+
+PLACES = [f"geoId/{i:05d}" for i in range(1, 21)]
+VARIABLES = ["Synthetic_1", "Synthetic_2"]
+
+
+@pytest.fixture
+def stored(client):
+    """Fetches 40 observations with handles on, returning (full data, handle)."""
+    full = agent.get_observations(PLACES, VARIABLES)["data"]
+    set_output_policy(OutputPolicy(mode="full", handle_rows=10, store=ResultStore("")))
+    summary = agent.get_observations(PLACES, VARIABLES)
+    return full, summary["data"]["handle"]
+
+
+def _values(full: dict, variable: str) -> list:
+    return [full[place][variable]["value"] for place in PLACES]
+
+
+def test_large_result_is_summarized_under_a_handle(stored):
+    full, handle = stored
+    summary = agent.get_observations(PLACES, VARIABLES)
+    data = summary["data"]
+    assert data["handle"] == handle
+    assert data["total_rows"] == 40
+    assert data["distinct"] == {"place": 20, "variable": 2, "date": 1}
+    values = _values(full, "Synthetic_1") + _values(full, "Synthetic_2")
+    assert data["numeric"]["value"]["min"] == min(values)
+    assert data["numeric"]["value"]["max"] == max(values)
+    assert len(data["rows"]) == 5
+    assert "query_result" in summary["report"]
+
+
+def test_query_filters_sorts_and_pages(stored):
+    full, handle = stored
+    response = agent.query_result(handle, filters="variable=Synthetic_2", sort_by="value",
+                                  descending=True, limit=3)
+    data = response["data"]
+    assert data["total"] == 20
+    assert data["next_offset"] == 3
+    assert [row[2] for row in data["rows"]] == sorted(_values(full, "Synthetic_2"), reverse=True)[:3]
+
+    rest = agent.query_result(handle, filters="variable=Synthetic_2", sort_by="value",
+                              descending=True, offset=18, limit=3)
+    assert rest["data"]["next_offset"] is None
+    assert len(rest["data"]["rows"]) == 2
+
+
+def test_query_numeric_and_contains_filters(stored):
+    full, handle = stored
+    threshold = sorted(_values(full, "Synthetic_1"))[10]
+    response = agent.query_result(handle, filters=f"variable=Synthetic_1; value>={threshold}")
+    assert len(response["data"]["rows"]) == 10
+    response = agent.query_result(handle, filters="place~00001")
+    assert {row[0] for row in response["data"]["rows"]} == {"geoId/00001"}
+
+
+def test_negative_offset_is_clamped_in_rows_and_report(stored):
+    _, handle = stored
+    response = agent.query_result(handle, offset=-5, limit=2)
+    assert response["data"]["next_offset"] == 2
+    assert response["report"].startswith("Rows 1-2 of 40")
+
+
+def test_aggregate_per_group(stored):
+    full, handle = stored
+    response = agent.aggregate_result(handle, function="sum", group_by="variable")
+    data = response["data"]
+    assert data["columns"] == ["variable", "sum_value"]
+    assert dict(map(tuple, data["rows"])) == {variable: sum(_values(full, variable))
+                                              for variable in VARIABLES}
+
+    response = agent.aggregate_result(handle, function="count", filters="variable=Synthetic_1")
+    assert response["data"]["rows"] == [[20]]
+
+
+@pytest.mark.parametrize("call", [
+    lambda handle: agent.query_result(handle, filters="value>abc"),
+    lambda handle: agent.query_result(handle, filters="nonsense"),
+    lambda handle: agent.query_result(handle, sort_by="missing"),
+    lambda handle: agent.aggregate_result(handle, function="median"),
+])
+def test_bad_queries_are_errors(stored, call):
+    _, handle = stored
+    assert call(handle)["status"] == "error"
+
+
+def test_unknown_handle_is_an_error():
+    assert agent.query_result("0123456789abcdef")["status"] == "error"
+    assert agent.aggregate_result("not a handle")["status"] == "error"
+
+
+def test_sort_puts_numbers_before_text_and_empty_cells_last():
+    result = ResultSet(["cell"], [[3], ["x"], [None], [1.5], ["b"]])
+    assert result.sort("cell").rows == [[1.5], [3], ["b"], ["x"], [None]]
+    assert result.sort("cell", descending=True).rows == [[3], [1.5], ["x"], ["b"], [None]]
+
+
+def test_store_keeps_results_across_instances(tmp_path):
+    entry = {"response": {"status": "success", "data": [1, 2, 3]}}
+    handle = ResultStore(str(tmp_path)).put(entry)
+    assert ResultStore(str(tmp_path)).get(handle) == entry
+    # Storing the same content again yields the same handle
+    assert ResultStore(str(tmp_path)).put(entry) == handle
+
+
+def test_store_sweeps_expired_files(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=-1)
+    store.put({"response": {}})
+    assert store.sweep() == 1
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,81 @@
+import pytest
+
+from datcom_agent import agent
+from datcom_agent.observations import fetch_variable_names
+from datcom_agent.search import StatVarIndex, get_statvar_index, tokenize
+
+VARIABLES = [
+    "Count_Person",
+    "Count_Person_Female",
+    "Count_Person_Widowed",
+    "Count_Person_BelowPovertyLevelInThePast12Months",
+    "Median_Income_Person",
+    "UnemploymentRate_Person",
+    "Count_Person_MovedFromDifferentHouseAbroad",
+]
+
+
+@pytest.fixture
+def index():
+    index = StatVarIndex()
+    index.add_many(VARIABLES)
+    return index
+
+
+def _top(index: StatVarIndex, query: str) -> str:
+    return index.search(query, 1)[0]["dcid"]
+
+
+def test_tokenize_splits_camel_case_and_drops_stopwords():
+    assert tokenize("Count_Person_IncomeOf10000To14999USDollar") == [
+        "count", "person", "income", "10000", "14999", "us", "dollar"]
+    assert tokenize("How many people are unemployed?") == ["people", "unemployed"]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("population", "Count_Person"),
+    ("female population", "Count_Person_Female"),
+    ("median salary", "Median_Income_Person"),
+    ("people who moved from abroad", "Count_Person_MovedFromDifferentHouseAbroad"),
+    # Plural synonyms are stemmed like every other query term
+    ("residents", "Count_Person"),
+    ("median earnings", "Median_Income_Person"),
+])
+def test_synonyms_map_everyday_words_to_dcid_terms(index, query, expected):
+    assert _top(index, query) == expected
+
+
+def test_prefixes_and_typos_match(index):
+    assert _top(index, "pov") == "Count_Person_BelowPovertyLevelInThePast12Months"
+    assert _top(index, "unemploymnt rate") == "UnemploymentRate_Person"
+
+
+def test_names_are_searchable_once_added(index):
+    assert index.search("marital status") == []
+    assert index.name("Count_Person_Widowed") is None
+
+    index.add("Count_Person_Widowed", "Marital status: widowed, total")
+    assert index.name("Count_Person_Widowed") == "Marital status: widowed, total"
+    assert _top(index, "marital status") == "Count_Person_Widowed"
+    # Adding the variable again keeps it a single entry
+    index.add("Count_Person_Widowed")
+    assert len(index) == len(VARIABLES)
+
+
+def test_dcid_prefixes_are_stripped_and_unknown_queries_match_nothing(index):
+    index.add("dcid:Median_Age_Person")
+    assert "Median_Age_Person" in index
+    assert index.search("zzzzqx") == []
+    assert StatVarIndex().search("population") == []
+
+
+def test_search_tool_finds_variables_by_fetched_name(client):
+    get_statvar_index().add_many(["Count_Person", "Synthetic_1", "Synthetic_2", "Synthetic_3"])
+    fetch_variable_names(["Synthetic_1", "Synthetic_2", "Synthetic_3"])
+    response = agent.search_statistical_variables("synthetic variable 2", limit=1)
+    assert response["status"] == "success"
+    assert [match["dcid"] for match in response["data"]] == ["Synthetic_2"]
+
+
+def test_search_tool_without_matches_is_an_error():
+    assert agent.search_statistical_variables("population")["status"] == "error"
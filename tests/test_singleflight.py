@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import requests
+
+from datcom_agent import agent
+from datcom_agent.client import AsyncDataCommonsClient
+from datcom_agent.singleflight import SingleFlight, request_key
+
+RESOLVE = {"nodes": ["Place 3"], "property": "<-description->dcid"}
+
+
+def _together(n: int, fn) -> list:
+    """Calls fn from n threads at once and returns their results."""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_request_key_ignores_parameter_and_dcid_order():
+    assert (request_key("get", "observation", [("a", "1"), ("b", "2")], None)
+            == request_key("GET", "observation", [("b", "2"), ("a", "1")], None))
+    assert (request_key("POST", "observation", None, {"entity": {"dcids": ["x", "y"]}})
+            == request_key("POST", "observation", None, {"entity": {"dcids": ["y", "x"]}}))
+    assert (request_key("GET", "observation", {"date": "2020"}, None)
+            != request_key("GET", "observation", {"date": "2021"}, None))
+
+
+def test_concurrent_identical_requests_share_one_call(client, server):
+    server.latency = 0.2
+    results = _together(10, lambda: client.get("resolve", RESOLVE))
+
+    assert server.requests_by_path["/v2/resolve"] == 1
+    assert all(result is results[0] for result in results)
+    assert client.stats()["coalesced_requests"] == 9
+
+
+def test_different_requests_are_not_coalesced(client, server):
+    server.latency = 0.1
+    counter = iter(range(10))
+    _together(4, lambda: client.get("resolve", {"nodes": [f"Place {next(counter)}"]}))
+    assert server.requests_by_path["/v2/resolve"] == 4
+
+
+def test_waiters_receive_the_leader_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise requests.exceptions.ConnectionError("down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except requests.exceptions.ConnectionError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while flight.stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_concurrent_tool_calls_share_requests(client, server):
+    server.latency = 0.2
+    results = _together(8, lambda: agent.get_population_count("geoId/00001,geoId/00002"))
+    assert all(result == results[0] for result in results)
+    assert results[0]["status"] == "success"
+    assert server.requests_by_path["/v2/observation"] == 1
+
+
+def test_async_identical_requests_share_one_call(server):
+    server.latency = 0.2
+
+    async def main():
+        client = AsyncDataCommonsClient(base_url=server.base_url, api_key="test")
+        results = await asyncio.gather(*(client.get("resolve", RESOLVE) for _ in range(10)))
+        stats = client.stats()
+        await client.aclose()
+        return results, stats
+
+    results, stats = asyncio.run(main())
+    assert server.requests_by_path["/v2/resolve"] == 1
+    assert all(result is results[0] for result in results)
+    assert stats["coalesced_requests"] == 9
+
+
+def test_cancelling_one_async_caller_does_not_cancel_the_others(server):
+    server.latency = 0.2
+
+    async def main():
+        client = AsyncDataCommonsClient(base_url=server.base_url, api_key="test")
+        first = asyncio.ensure_future(client.get("resolve", RESOLVE))
+        second = asyncio.ensure_future(client.get("resolve", RESOLVE))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        result = await second
+        await client.aclose()
+        return first, result
+
+    first, result = asyncio.run(main())
+    assert first.cancelled()
+    assert result["entities"][0]["candidates"] == [{"dcid": "geoId/00003"}]
+    assert server.requests_by_path["/v2/resolve"] == 1
+
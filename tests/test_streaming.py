@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+from datcom_agent.observations import fetch_available_variables, fetch_available_variables_async
+from datcom_agent.streaming import VariableListingScanner, stream_stats
+
+ENTITIES = ["geoId/06", "geoId/48"]
+# Keys and values that look like structure, escapes and multi-byte characters
+# must not confuse the scanner however the body is split
+BODY = json.dumps({
+    "byVariable": {
+        "Count_Person": {"byEntity": {"geoId/06": {"note": "a \"quoted\" {brace} [x]"},
+                                      "geoId/48": {}}},
+        "Median_Age_Person": {"byEntity": {"geoId/48": {"unit": "年 ü"}}},
+        "Unemployment_Rate": {"byEntity": {"geoId/06": {}, "geoId/48": {}}},
+    },
+    "facets": {"1": {"byEntity": {"geoId/06": "not a listing"}}},
+}, ensure_ascii=False).encode("utf-8")
+EXPECTED = {
+    "geoId/06": ["Count_Person", "Unemployment_Rate"],
+    "geoId/48": ["Count_Person", "Median_Age_Person", "Unemployment_Rate"],
+}
+
+
+def _scan(body: bytes, chunk_size: int, limit: int = None) -> VariableListingScanner:
+    scanner = VariableListingScanner(ENTITIES, limit)
+    for start in range(0, len(body), chunk_size):
+        if scanner.feed(body[start:start + chunk_size]):
+            break
+    return scanner
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, len(BODY)])
+def test_chunks_split_anywhere_give_the_same_pairs(chunk_size):
+    scanner = _scan(BODY, chunk_size)
+    assert scanner.result == EXPECTED
+    assert not scanner.done
+    assert scanner.bytes_read == len(BODY)
+
+
+def test_scanning_stops_once_every_entity_has_its_limit():
+    scanner = _scan(BODY, 5, limit=1)
+    assert scanner.done
+    assert scanner.result == {"geoId/06": ["Count_Person"], "geoId/48": ["Count_Person"]}
+    # Only the body up to the last key needed was read
+    assert scanner.bytes_read < len(BODY)
+    assert scanner.bytes_needed <= scanner.bytes_read
+    assert BODY[:scanner.bytes_needed].endswith(b'"geoId/48"')
+
+
+def test_an_entity_short_of_its_limit_reads_the_whole_body():
+    scanner = _scan(BODY, 16, limit=3)
+    assert not scanner.done
+    assert scanner.result == {"geoId/06": EXPECTED["geoId/06"], "geoId/48": EXPECTED["geoId/48"]}
+    assert scanner.bytes_read == len(BODY)
+
+
+def test_streamed_listing_matches_the_stand_in(client):
+    variables = ["Count_Person"] + [f"Synthetic_{i}" for i in range(1, 5)]
+    assert fetch_available_variables(["geoId/00001", "geoId/00002"]) == {
+        "geoId/00001": variables, "geoId/00002": variables}
+
+
+def test_streamed_listing_stops_early_at_the_limit(client):
+    before = stream_stats.snapshot()
+    assert fetch_available_variables(["geoId/00001"], limit=2) == {
+        "geoId/00001": ["Count_Person", "Synthetic_1"]}
+    after = stream_stats.snapshot()
+    assert after["early_stops"] == before["early_stops"] + 1
+    assert after["bytes_needed"] - before["bytes_needed"] <= after["bytes_read"] - before["bytes_read"]
+
+
+def test_async_streamed_listing_stops_early_at_the_limit(server):
+    result = asyncio.run(fetch_available_variables_async(["geoId/00001"], limit=2))
+    assert result == {"geoId/00001": ["Count_Person", "Synthetic_1"]}